@@ -0,0 +1,701 @@
+#!/usr/bin/env python3
+
+"""
+Runs of the AMES test: their parameters, workflows, SOLO protocols and
+incubations, without the MADSci experiment application.
+
+Nothing here imports madsci.experiment_application or the MADSci clients, so
+plans can be checked from the command line in a fraction of a second:
+
+    python ames_runs.py --plan --runs 3       # print the stages of 3 pipelined runs
+    python ames_runs.py --dry-run --runs 3    # also generate and check every SOLO protocol
+    python ames_runs.py --simulate --runs 3   # estimate the run time (see simulation.yaml)
+    python ames_runs.py --simulate --read-plates 2 3 4   # estimate the time to read 3 incubated plates
+    python ames_runs.py --plan --read-plates 2 3 --campaign library.csv --batch 2   # plates of a campaign batch
+    python ames_runs.py --simulate --campaign library.csv   # estimate the time to screen a compound library
+    python ames_runs.py --plan --campaign library.csv --replicates 1 --samples-per-plate 3   # 3 compounds per run and per 384-well plate
+"""
+
+import argparse
+import datetime
+from pathlib import Path
+from typing import Optional
+
+from helper_functions.compound_library import (
+    DILUTION_COLUMNS,
+    format_batches,
+    load_library,
+    pack_library,
+)
+from helper_functions.hso_cache import HsoCache
+from helper_functions.plate_layout import EXPOSURE_GROUPS, microplates, pack_samples
+from helper_functions.run_pipeline import (
+    PRIORITY_TIME_CRITICAL,
+    Acquire,
+    Admit,
+    Await,
+    Incubate,
+    Join,
+    Prompt,
+    Release,
+    RunPipeline,
+    RunPlan,
+    Submit,
+    format_plan,
+)
+from helper_functions.tip_inventory import TipInventory
+from helper_functions.workcell_simulator import (
+    ActionDurations,
+    WorkcellSimulator,
+    workflow_steps,
+)
+from protocols import (
+    dispense_cells_then_compound,
+    dispense_control_and_test,
+    dispense_DMSO,
+    dispense_into_384_plate,
+    exposure_to_indicator,
+    serial_dilute_test_compound,
+)
+
+from rapid350.hso_functions import write_hso
+
+
+class AmesRuns:
+    """Builds, prints and simulates the runs of the AMES test. Base of DionExperimentApplication."""
+
+    workflow_directory = Path("./workflows").resolve()
+    protocol_directory = Path("./protocols").resolve()
+    simulation_durations = Path("./simulation.yaml")
+
+    exposure_incubation_time = 5400 # 5400 seconds = 90 min
+    micoplate_incubation_time = 172800 # 172800 seconds = 48 hours
+    admission_margin = 300 # seconds added to the time a run is expected to hold the deck after its exposure, for workflows of other runs and slower actions
+    max_incubation_overrun = 300 # seconds an incubation may last longer than planned in a simulation or a dry run
+
+    _action_durations = None  # simulation_durations, loaded on first use
+
+    # SOLO protocols are only regenerated when the protocol code or the payload values it reads change
+    hso_cache = HsoCache(Path("~/.cache/rapid350_applications/hso").expanduser())
+
+    def run_parameters(self, run_index, overrides=None):
+        """
+        Builds the payload of one run. Every run gets its own dilution column
+        and its own Liconic plate IDs, so that several runs can be in flight.
+
+        Args:
+            run_index (int): 0 for the first run of the experiment, 1 for the second...
+            overrides (dict): values replacing the defaults, e.g. the stock well of the test compound
+        """
+        parameters = {
+            "temp": 37.0, # a float value setting the temperature of the Liconic Incubator (in Celsius)
+            "humidity": 95.0, # a float value setting the humidity of the Liconic Incubator
+            "shaker_speed": 20, # an integer value setting the shaker speed of the Liconic Incubator
+            "stacker": 1, # an integer value specifying which stacker a well plate should be used in (Preferable to use "incubation_plate_id" : plate_id, where plate_id is an integer 1-88 - stacker and slot will be autocalculated)
+            "slot": 2, # an integer value specifying which slot a well plate should be used in (Preferable to use "incubation_plate_id" : plate_id, where plate_id is an integer 1-88 - stacker and slot will be autocalculated)
+            "seal_time": 3, # an integer value setting the time in seconds for the sealer to seal a plate
+            "run_id": f"run_{run_index + 1}",
+            "dilution_column": run_index + 1, # column of the dilution plate used for this run's serial dilution
+            "deepwell_id": str(4 * run_index + 1), # Liconic plate ID of the exposure/indicator deepwell
+            "microplate_ids": [str(4 * run_index + 2 + i) for i in range(3)], # Liconic plate IDs of the 384-well plates
+        }
+        parameters.update(overrides or {})
+        return parameters
+
+    def run_stages(self, parameters, load_deepwell=False):
+        """
+        Steps 1-7: runs the dilution and exposure SOLO protocols, then seals
+        the exposure/indicator deepwell and incubates it. The run continues
+        with assay_plate_stages once the incubation is over.
+
+        Only one deepwell fits on SOLO Position1, and no workflow fetches a new
+        one: with load_deepwell, the operator is prompted to replace the
+        deepwell left there by the previous run once the run holds Position1.
+
+        The dilution steps only hold the dilution and stock plates, so the next
+        run can dilute its compound while this run's deepwell is incubating.
+        The run only starts once the SOLO Position1 and 2 are expected to be
+        free while it fills its deepwell, and from the end of its exposure until
+        its 384-well plates are filled (see Admit), so no exposure lasts longer
+        than 90 min because another run holds the deck.
+        """
+        run_solo_wf = self.workflow_directory / "run_solo_wf.yaml"
+        transfer_deepwell_to_incubator_wf = self.workflow_directory / "transfer_deepwell_to_incubator_wf.yaml"
+        exposure_deadline = f"{parameters['run_id']}_exposure_deepwell"
+
+        stages = [
+            Acquire(["Solo.Position3", "Solo.Position4"]),
+
+            # 1. Tips are refilled by the pipeline, only when the next protocols need it (see tip_inventory).
+
+            # 2. Run SOLO protocol: Dispense DMSO into dilution column wells.
+            Submit("solo_temp1", run_solo_wf, protocol=dispense_DMSO.generate_hso_file, payload=dict(parameters)),
+
+            # 3. Run SOLO protocol: Dispense control and test compounds into dilution column wells.
+            Submit("solo_temp2", run_solo_wf, protocol=dispense_control_and_test.generate_hso_file, payload=dict(parameters)),
+
+            # 4. Run SOLO protocol: Serial dilute test compound.
+            Submit("solo_temp3", run_solo_wf, protocol=serial_dilute_test_compound.generate_hso_file, payload=dict(parameters)),
+
+            Release(["Solo.Position4"]),
+            Acquire(["Solo.Position1"]),
+            *(
+                [
+                    Prompt(
+                        f"replace the deepwell on SOLO Position1 by the exposure/indicator deepwell of "
+                        f"{parameters['run_id']} (columns 4-6 filled with reversion indicator)"
+                    )
+                ]
+                if load_deepwell
+                else []
+            ),
+
+            # 5. Run SOLO protocol: Dispense cells then diluted compound into exposure wells (col 1,2,3 by default)
+            Submit("solo_temp4", run_solo_wf, protocol=dispense_cells_then_compound.generate_hso_file, payload=dict(parameters)),
+
+            Release(["Solo.Position3"]),
+
+            # 6. Seal the exposure/indicator deepwell and transfer into incubator.
+            Submit(
+                "transfer_deepwell_to_incubator",
+                transfer_deepwell_to_incubator_wf,
+                json_inputs={
+                    "shaker_speed": parameters["shaker_speed"],
+                    "deepwell_id": parameters["deepwell_id"],
+                },
+            ),
+
+            Release(["Solo.Position1"]),
+
+            # 7. Incubate at 37C for 90 min, with gentle shaking.
+            Incubate(
+                exposure_deadline,
+                self.exposure_incubation_time,
+                payload={**parameters, "action": "assay_plates"},
+            ),
+            Await(exposure_deadline),
+        ]
+        assay_stages = self.assay_plate_stages(parameters)
+        filled = self.expected_duration(stages[stages.index(Acquire(["Solo.Position1"])):])
+        plates_filled = self.expected_duration(
+            assay_stages[:assay_stages.index(Release(["Solo.Position1", "Solo.Position2"]))]
+        )
+        admit = Admit(
+            exposure_deadline,
+            ["Solo.Position1", "Solo.Position2"],
+            lead=self.expected_duration(stages) + self.exposure_incubation_time,
+            holds=[
+                (-self.exposure_incubation_time - filled, -self.exposure_incubation_time),
+                (0.0, plates_filled + self.admission_margin),
+            ],
+        )
+        return [admit, *stages, *assay_stages]
+
+    def assay_plate_stages(self, parameters):
+        """
+        Steps 8-14: returns the exposure/indicator deepwell to the SOLO, moves
+        the exposure wells into the indicator wells and dispenses each indicator
+        column into a new 384-well plate, or into its columns of a plate shared
+        with other samples (see plate_layout). Every 384-well plate gets its own
+        48 hour incubation deadline as soon as it is loaded into the incubator,
+        and is read as soon as that deadline is over.
+        """
+        run_solo_wf = self.workflow_directory / "run_solo_wf.yaml"
+        transfer_deepwell_to_SOLO_wf = self.workflow_directory / "transfer_deepwell_to_SOLO_wf.yaml"
+        get_new_384_well_plate_wf = self.workflow_directory / "get_new_384_well_plate_wf.yaml"
+        transfer_384_to_incubator_wf = self.workflow_directory / "transfer_384_to_incubator_wf.yaml"
+
+        stages = [
+            Acquire(["Solo.Position1", "Solo.Position2"], priority=PRIORITY_TIME_CRITICAL),
+
+            # 8. Unload exposure/indicator deepwell from incubator and return to SOLO deck 1.
+            Submit(
+                "transfer_deepwell_to_SOLO",
+                transfer_deepwell_to_SOLO_wf,
+                json_inputs={"deepwell_id": parameters["deepwell_id"]},
+            ),
+
+            # 9. Run SOLO protocol: Transfer all contents of exposure wells to indicator wells.
+            Submit("solo_temp5", run_solo_wf, protocol=exposure_to_indicator.generate_hso_file, payload=dict(parameters)),
+        ]
+
+        # BEGIN LOOP: Loop once per 384-well assay plate (3 by default, one per indicator column 4, 5, and 6).
+        plate_parameters = microplates(parameters)
+        for current_plate in plate_parameters:
+            microplate_id = current_plate["microplate_id"]
+            fills = [
+                {
+                    **current_plate,
+                    "current_indicator_column": sample["indicator_column"],
+                    "plate_columns": sample["plate_columns"],
+                }
+                for sample in current_plate["plate_samples"]
+            ]
+            chunks = [(fill, chunk) for fill in fills for chunk in range(dispense_into_384_plate.count_chunks(fill))]
+            stages += [
+                # 10. Transfer a new 384 well plate to the SOLO deck.
+                Submit(f"get_new_384_well_plate_{microplate_id}", get_new_384_well_plate_wf),
+
+                # 11. Run SOLO protocol: Transfer 50uL from each indicator column of the plate into its
+                # columns of the 384-well plate, split into as few SOLO protocol files as the SOLO step limit allows.
+                *(
+                    Submit(
+                        f"solo_temp_384_{microplate_id}_{number + 1}",
+                        run_solo_wf,
+                        protocol=dispense_into_384_plate.generate_hso_file,
+                        payload={**fill, "chunk": chunk},
+                    )
+                    for number, (fill, chunk) in enumerate(chunks)
+                ),
+
+                # 12. Replace lid on 384-well plate and transfer into incubator
+                Submit(
+                    f"transfer_384_to_incubator_{microplate_id}",
+                    transfer_384_to_incubator_wf,
+                    json_inputs={"microplate_id": microplate_id},
+                ),
+
+                # 13. Incubate the 384-well plate overnight (48 hours, no shaking, 37C).
+                Incubate(
+                    f"{parameters['run_id']}_microplate_{microplate_id}",
+                    self.micoplate_incubation_time,
+                    payload={**current_plate, "action": "read_microplate"},
+                ),
+            ]
+        # END LOOP.
+        # NOTE: At this point, all the 384-well assay plates of the run are in the incubator.
+        stages.append(Release(["Solo.Position1", "Solo.Position2"]))
+
+        for current_plate in plate_parameters:
+            stages += self.read_microplate_stages(current_plate)
+        return stages
+
+    def read_microplate_stages(self, parameters):
+        """
+        Step 14: once its incubation is over, removes a 384-plate from the
+        incubator, removes the lid, reads it in the Hidex Sense, replaces the
+        lid and moves it to the trash stack.
+        """
+        read_then_trash_384_well_plate_wf = self.workflow_directory / "read_then_trash_384_well_plate_wf.yaml"
+        microplate_id = parameters["microplate_id"]
+
+        return [
+            Await(f"{parameters['run_id']}_microplate_{microplate_id}"),
+            Acquire(["Solo.Position2"], priority=PRIORITY_TIME_CRITICAL),
+            Submit(
+                f"read_then_trash_384_well_plate_{microplate_id}",
+                read_then_trash_384_well_plate_wf,
+                json_inputs={"microplate_id": microplate_id},
+                on_complete=lambda workflow: self.collect_hidex_data(workflow, parameters),
+            ),
+            Release(["Solo.Position2"]),
+        ]
+
+    def expected_duration(self, stages):
+        """
+        Seconds the workflows and operator prompts of the stages take one after
+        the other, with the action durations of simulation_durations and no
+        wait on the workcell.
+
+        Args:
+            stages (list of Stage): stages of a run
+        """
+        if self._action_durations is None:
+            self._action_durations = ActionDurations.from_yaml(self.simulation_durations)
+        return sum(
+            self._action_durations.duration(node, action, stage)
+            for stage in stages
+            if isinstance(stage, Submit)
+            for _, node, action in workflow_steps(stage.workflow)
+        ) + sum(self._action_durations.duration("operator", "prompt") for stage in stages if isinstance(stage, Prompt))
+
+    def refill_tips(self, position):
+        """
+        The workflow resetting the tip count of the SOLO once the tip box at a
+        deck position has been replaced by a full one.
+
+        Args:
+            position (str): deck position of the tip box, e.g. "Position5"
+        """
+        return Submit(
+            "refill_tips",
+            self.workflow_directory / "refill_tips_wf.yaml",
+            json_inputs={"tip_box_position": position.replace("Position", "")},
+        )
+
+    def read_microplates_stages(self, plates, deadlines=()):
+        """
+        Step 14, batched: reads incubated 384-well plates one after the other
+        in a single Hidex session. The Hidex door is opened once, while the
+        first plate is unloaded, and closed after the last plate. Plate N+1 is
+        unloaded from the Liconic while plate N is read, and waits on
+        Liconic.Nest until plate N is in the trash stack: the lid of plate N
+        holds LidNest1 until then.
+
+        Args:
+            plates (list of dict): parameters of each plate read (run_id, microplate_id,
+                plate_samples), in read order
+            deadlines (set of str): pending incubation deadlines of the plates; the read
+                of a plate waits for its deadline, which is completed once the plate is read
+        """
+        unload_384_well_plate_wf = self.workflow_directory / "unload_384_well_plate_wf.yaml"
+        load_384_well_plate_into_hidex_wf = self.workflow_directory / "load_384_well_plate_into_hidex_wf.yaml"
+        read_384_well_plate_wf = self.workflow_directory / "read_384_well_plate_wf.yaml"
+        trash_384_well_plate_wf = self.workflow_directory / "trash_384_well_plate_wf.yaml"
+
+        first_unload = f"unload_384_well_plate_{plates[0]['microplate_id']}"
+        stages = [
+            Submit(
+                first_unload,
+                unload_384_well_plate_wf,
+                json_inputs={"microplate_id": plates[0]["microplate_id"]},
+                background=True,
+            ),
+            Submit("open_hidex", self.workflow_directory / "open_hidex_wf.yaml"),
+            Join(first_unload),
+        ]
+        for plate, next_plate in zip(plates, [*plates[1:], None]):
+            microplate_id = plate["microplate_id"]
+            stages += [
+                Acquire(["Solo.Position2"], priority=PRIORITY_TIME_CRITICAL),
+                Submit(f"load_384_well_plate_into_hidex_{microplate_id}", load_384_well_plate_into_hidex_wf),
+            ]
+            if next_plate is not None:
+                # Liconic.Nest is free again, unload the next plate while this one is read
+                stages.append(
+                    Submit(
+                        f"unload_384_well_plate_{next_plate['microplate_id']}",
+                        unload_384_well_plate_wf,
+                        json_inputs={"microplate_id": next_plate["microplate_id"]},
+                        background=True,
+                    )
+                )
+            deadline = f"{plate['run_id']}_microplate_{microplate_id}"
+            if deadline in deadlines:
+                # after the background unload, which would otherwise complete the deadline
+                stages.append(Await(deadline))
+            stages += [
+                Submit(
+                    f"read_384_well_plate_{microplate_id}",
+                    read_384_well_plate_wf,
+                    on_complete=lambda workflow, plate=plate: self.collect_hidex_data(workflow, plate),
+                ),
+                Submit(f"trash_384_well_plate_{microplate_id}", trash_384_well_plate_wf),
+                Release(["Solo.Position2"]),
+            ]
+            if next_plate is not None:
+                stages.append(Join(f"unload_384_well_plate_{next_plate['microplate_id']}"))
+        stages.append(Submit("close_hidex", self.workflow_directory / "close_hidex_wf.yaml"))
+        return stages
+
+    def microplate_parameters(self, microplate_id, runs=None, scheduled=()):
+        """
+        The parameters of the read of a 384-well plate, as planned by the run
+        that filled it. A plate still incubating is read with the parameters
+        persisted with its incubation deadline. Any other plate is looked up
+        by its Liconic plate ID in the runs, which must be the runs that
+        filled it: plate IDs are reused by every batch of a campaign, and
+        packed runs spread their samples differently over their plates.
+
+        Args:
+            microplate_id (str): Liconic plate ID of the 384-well plate
+            runs (list of dict): per-run parameter overrides of the runs that filled the plate, as
+                for run_app (default: 22 default runs, whose plates fill the 88 Liconic slots)
+            scheduled (list of Deadline): pending incubation deadlines, e.g. of an interrupted run
+
+        Raises:
+            ValueError: if no run uses this plate ID
+        """
+        for deadline in scheduled:
+            if deadline.payload.get("action") == "read_microplate" and deadline.payload["microplate_id"] == microplate_id:
+                return {key: value for key, value in deadline.payload.items() if key != "action"}
+        for run_index, overrides in enumerate(runs or [{}] * 22):
+            for plate in microplates(self.run_parameters(run_index, overrides)):
+                if plate["microplate_id"] == microplate_id:
+                    return plate
+        raise ValueError(f"No run uses 384-well plate {microplate_id}")
+
+    def plan_plate_reads(self, microplate_ids, runs=None, scheduled=()):
+        """
+        Builds the RunPlan reading incubated 384-well plates in one Hidex
+        session, e.g. plates left in the incubator by an interrupted run.
+        The read of a plate with a pending incubation deadline waits for it,
+        and completes it once the plate is read, so only the plates not read
+        yet are read again on resume.
+
+        Args:
+            microplate_ids (list of str): Liconic plate IDs of the plates, in read order
+            runs (list of dict): per-run parameter overrides of the runs that filled the plates,
+                as for microplate_parameters
+            scheduled (list of Deadline): pending incubation deadlines, as for microplate_parameters
+        """
+        plates = [self.microplate_parameters(str(microplate_id), runs, scheduled) for microplate_id in microplate_ids]
+        pending = {deadline.name for deadline in scheduled}
+        return RunPlan("read_plates", self.read_microplates_stages(plates, pending))
+
+    def campaign_batch(self, library, batch, runs_per_batch=None, replicates: Optional[int] = None, samples_per_plate=1):
+        """
+        The per-run parameter overrides of one batch of a campaign, packed as
+        campaign_app packs it, e.g. to read the plates the batch left in the
+        incubator.
+
+        Args:
+            library (str | Path): CSV or Parquet file with a "compound" column
+            batch (int): number of the batch, from 1
+            runs_per_batch (int): as for campaign_app
+            replicates (int): as for campaign_app (default: one compound per run)
+            samples_per_plate (int): as for campaign_app
+
+        Raises:
+            ValueError: if the campaign has no such batch
+        """
+        if replicates is None:
+            replicates = len(EXPOSURE_GROUPS)
+        library = Path(library)
+        batches = pack_library(load_library(library), runs_per_batch, replicates)
+        if not 1 <= batch <= len(batches):
+            raise ValueError(f"Campaign {library.stem} has batches 1-{len(batches)}, not {batch}")
+        return self.campaign_runs(batches, library.stem, samples_per_plate)[batch - 1]
+
+    def collect_hidex_data(self, workflow, parameters):
+        """Called with every finished read_then_trash_384_well_plate workflow, the experiment application analyzes its reading."""
+
+    def plan_runs(self, runs=None):
+        """
+        Builds the RunPlan of every run. The first run uses the deepwell of
+        the starting deck, the operator loads the deepwell of each next run.
+
+        Args:
+            runs (list of dict): per-run parameter overrides (default: a single run)
+
+        Returns:
+            list of RunPlan: one plan per run
+        """
+        plans = []
+        for run_index, overrides in enumerate(runs or [{}]):
+            parameters = self.run_parameters(run_index, overrides)
+            plans.append(RunPlan(parameters["run_id"], self.run_stages(parameters, load_deepwell=run_index > 0)))
+        return plans
+
+    def microplate_count(self, runs=None):
+        """
+        Number of new 384-well plates the runs take from Stack1.
+
+        Args:
+            runs (list of dict): per-run parameter overrides, as for plan_runs
+        """
+        return sum(
+            len(microplates(self.run_parameters(run_index, overrides)))
+            for run_index, overrides in enumerate(runs or [{}])
+        )
+
+    def campaign_runs(self, batches, campaign, samples_per_plate=1):
+        """
+        The per-run parameter overrides of each batch of a packed compound
+        library: the samples of each run (see plate_layout), with the stock
+        plate well, dilution plate column and exposure/indicator groups of
+        each of its compounds.
+
+        Args:
+            batches (list of list of CompoundAssignment): the library, as packed by pack_library
+            campaign (str): name of the campaign, run IDs are <campaign>_<batch>_<run>
+            samples_per_plate (int): samples sharing a 384-well plate, 1-3
+
+        Returns:
+            list of list of dict: the runs of each batch, as for run_app
+        """
+        campaign_runs = []
+        for batch in batches:
+            runs = {}
+            for assignment in batch:
+                runs.setdefault(assignment.run_index, []).append(assignment)
+            campaign_runs.append(
+                [
+                    {
+                        "run_id": f"{campaign}_{assignments[0].batch}_{run_index + 1}",
+                        "samples": pack_samples(
+                            [
+                                {
+                                    "test_stock_row": assignment.stock_row,
+                                    "test_stock_column": assignment.stock_column,
+                                    "dilution_column": assignment.dilution_column,
+                                }
+                                for assignment in assignments
+                            ],
+                            replicates=len(assignments[0].indicator_columns),
+                            samples_per_plate=samples_per_plate,
+                        ),
+                    }
+                    for run_index, assignments in runs.items()
+                ]
+            )
+        return campaign_runs
+
+    def simulate_app(self, runs=None, plans=None):
+        """
+        Replays run_app on a simulated workcell, with the action durations of
+        simulation_durations, and prints the makespan, the utilization of each
+        instrument and the critical path. Nothing is sent to the workcell.
+
+        Args:
+            runs (list of dict): per-run parameter overrides, as for run_app
+            plans (list of RunPlan): plans to simulate instead of the runs, e.g. plan_plate_reads
+
+        Returns:
+            SimulationReport: the outcome of the simulation
+
+        Raises:
+            RuntimeError: if an incubation is acted on more than max_incubation_overrun
+                seconds after it is due
+        """
+        report = WorkcellSimulator(
+            ActionDurations.from_yaml(self.simulation_durations), tips=TipInventory(), refill=self.refill_tips
+        ).simulate(plans or self.plan_runs(runs))
+        print(report)
+        self.check_overruns(report)
+        return report
+
+    def check_overruns(self, report):
+        """
+        Fails if a simulation acts on an incubation more than
+        max_incubation_overrun seconds after it is due, e.g. a deepwell left
+        exposed because the SOLO deck is still held by another run.
+
+        Args:
+            report (SimulationReport): the outcome of a simulation
+
+        Raises:
+            RuntimeError: listing the overrun incubations
+        """
+        overrun = {name: seconds for name, seconds in report.overruns.items() if seconds > self.max_incubation_overrun}
+        if overrun:
+            raise RuntimeError(
+                f"Incubations overrun by more than {datetime.timedelta(seconds=self.max_incubation_overrun)}: "
+                + ", ".join(f"{name} by {datetime.timedelta(seconds=round(seconds))}" for name, seconds in overrun.items())
+            )
+
+    def plan_app(self, runs=None, generate=False, hso_output=None, plans=None):
+        """
+        Prints the stages of every run, without contacting the workcell. With
+        generate, also generates and checks every SOLO protocol of the runs,
+        as run_app does before submitting the first workflow, and checks on a
+        simulated workcell that no incubation overruns (see simulate_app).
+
+        Args:
+            runs (list of dict): per-run parameter overrides, as for run_app
+            generate (bool): generate the SOLO protocols of the runs
+            hso_output (str | Path): directory the generated protocols are written to,
+                as <run_id>_<submission>.hso (default: not written)
+            plans (list of RunPlan): plans to print instead of the runs, e.g. plan_plate_reads
+
+        Returns:
+            list of RunPlan: one plan per run
+
+        Raises:
+            ValueError: if any protocol could not be generated from its payload
+            RuntimeError: if an incubation overruns on the simulated workcell
+        """
+        plans = plans or self.plan_runs(runs)
+        for plan in plans:
+            print(format_plan(plan))
+        if not generate:
+            return plans
+
+        protocols = RunPipeline(None, None, hso_cache=self.hso_cache).generate_protocols(plans)
+        print(f"Generated and checked {len(protocols)} SOLO protocols")
+        if hso_output is not None:
+            hso_output = Path(hso_output)
+            hso_output.mkdir(parents=True, exist_ok=True)
+            for plan in plans:
+                for stage in plan.stages:
+                    if id(stage) in protocols:
+                        write_hso(protocols[id(stage)], hso_output / f"{plan.run_id}_{stage.name}.hso")
+            print(f"SOLO protocols written to {hso_output}")
+        report = WorkcellSimulator(
+            ActionDurations.from_yaml(self.simulation_durations), tips=TipInventory(), refill=self.refill_tips
+        ).simulate(plans)
+        self.check_overruns(report)
+        print(f"No incubation overruns on the simulated workcell, makespan {datetime.timedelta(seconds=round(report.makespan))}")
+        return plans
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--plan", action="store_true", help="print the stages of the runs (default)")
+    mode.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="print the stages of the runs and generate every SOLO protocol, without running anything",
+    )
+    mode.add_argument(
+        "--simulate",
+        action="store_true",
+        help="estimate the run time on a simulated workcell (see simulation.yaml)",
+    )
+    parser.add_argument("--runs", type=int, default=1, help="number of pipelined runs (default: 1)")
+    parser.add_argument("--hso-output", type=Path, help="with --dry-run, directory to write the SOLO protocols to")
+    parser.add_argument(
+        "--read-plates",
+        nargs="+",
+        metavar="MICROPLATE_ID",
+        help="only read these incubated 384-well plates in one Hidex session, instead of the runs",
+    )
+    parser.add_argument(
+        "--campaign",
+        type=Path,
+        metavar="LIBRARY",
+        help="the runs of a compound library (CSV or Parquet file with a compound column), batch by batch",
+    )
+    parser.add_argument(
+        "--runs-per-batch",
+        type=int,
+        help=f"with --campaign, runs pipelined in each batch (default: as many as the {DILUTION_COLUMNS} dilution plate columns hold)",
+    )
+    parser.add_argument(
+        "--replicates",
+        type=int,
+        default=len(EXPOSURE_GROUPS),
+        help="with --campaign, exposure/indicator groups per compound: 3 tests one compound per run, "
+        "1 tests three (default: 3)",
+    )
+    parser.add_argument(
+        "--samples-per-plate",
+        type=int,
+        default=1,
+        help="with --campaign, indicator columns dispensed side by side into each 384-well plate, 1-3 (default: 1)",
+    )
+    parser.add_argument(
+        "--batch",
+        type=int,
+        help="with --campaign and --read-plates, the batch that filled the plates (plate IDs are reused by every batch)",
+    )
+    args = parser.parse_args()
+    if args.hso_output and not args.dry_run:
+        parser.error("--hso-output needs --dry-run")
+    if (args.batch is not None) != bool(args.campaign and args.read_plates):
+        parser.error("--batch is needed with --campaign and --read-plates, and only then")
+
+    ames_runs = AmesRuns()
+    batches = [[{} for _ in range(args.runs)]]
+    plans = None
+    if args.read_plates:
+        runs = None
+        if args.campaign:
+            runs = ames_runs.campaign_batch(
+                args.campaign, args.batch, args.runs_per_batch, args.replicates, args.samples_per_plate
+            )
+        plans = [ames_runs.plan_plate_reads(args.read_plates, runs)]
+    elif args.campaign:
+        packed = pack_library(load_library(args.campaign), args.runs_per_batch, args.replicates)
+        print(format_batches(packed))
+        batches = ames_runs.campaign_runs(packed, args.campaign.stem, args.samples_per_plate)
+    makespan = 0.0
+    for runs in batches:
+        if args.simulate:
+            makespan += ames_runs.simulate_app(runs, plans=plans).makespan
+        else:
+            ames_runs.plan_app(runs, generate=args.dry_run, hso_output=args.hso_output, plans=plans)
+    if args.simulate and len(batches) > 1:
+        print(f"Campaign of {len(batches)} batches, one after the other: {datetime.timedelta(seconds=round(makespan))}")
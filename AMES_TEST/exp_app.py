@@ -4,340 +4,432 @@
 Main MADSci Experiment Application for the AMES Test LDRD Project at Argonne National Laboratory.
 """
 
+import argparse
 import datetime
-import time
 from pathlib import Path
-
-from helper_functions.hso_functions import package_hso
-from madsci.common.types.step_types import StepDefinition
-from madsci.common.types.workflow_types import WorkflowDefinition
+from typing import Optional
+
+from ames_runs import AmesRuns
+from helper_functions.compound_library import (
+    DILUTION_COLUMNS,
+    load_library,
+    pack_library,
+    write_layout,
+)
+from helper_functions.incubation_scheduler import IncubationScheduler
+from helper_functions.plate_layout import EXPOSURE_GROUPS
+from helper_functions.run_pipeline import Await, RunPipeline, RunPlan, console_recovery
+from helper_functions.tip_inventory import TipInventory
 from madsci.experiment_application import (
     ExperimentApplication,
     ExperimentApplicationConfig,
 )
-from madsci.common.types.resource_types import Slot, Stack, Resource, Collection, Grid
-
-from madsci.client import (
-    ExperimentClient,
-    LocationClient,
-    ResourceClient,
-    WorkcellClient,
-)
-from protocols import (
-    dispense_cells_then_compound,
-    dispense_control_and_test,
-    dispense_DMSO,
-    dispense_into_384_plate,
-    exposure_to_indicator,
-    serial_dilute_test_compound,
-)
 from pydantic import AnyUrl
 
+from rapid350.clock import VirtualClock, WallClock
+
 """
 TODO:
-- add incubation count downs
 - fix sealer
 - water run
 - overnight/long test
 """
 
 
-class DionExperimentApplication(ExperimentApplication):
-    """Experiment application AMES Test LDRD experiment"""
-
-    workflow_directory = Path("./workflows").resolve()
-    protocol_directory = Path("./protocols").resolve()
+class DionExperimentApplication(AmesRuns, ExperimentApplication):
+    """Experiment application AMES Test LDRD experiment, running the runs built by AmesRuns"""
 
     experiment_design = Path("./experiment_design.yaml")
+    deck_layout = Path("./deck_layout.yaml")
+    # the MADSci clients (experiment, workcell, ...) are created on first use
     config = ExperimentApplicationConfig(node_url=AnyUrl("http://localhost:6000"))
-    experiment_client = ExperimentClient()
 
 
     url = "http://hudson01:8000"
 
-    def define_starting_resources(self): 
+    # every wait of the app (incubations, retries) is counted and recorded on this clock
+    clock = WallClock()
+    # incubation deadlines survive a restart of the app (see resume_app)
+    scheduler = IncubationScheduler(Path("./incubation_schedule.json").resolve(), clock=clock)
+    hso_directory = Path("/home/rpl/workspace/madsci_temp")
+    # per-plate positive well counts, stored as soon as each 384-well plate is read
+    results_directory = Path("./results/plate_results").resolve()
+    # raw readings of every plate, shared with the other applications for cross-run comparisons
+    readings_directory = Path("~/.local/share/rapid350_applications/hidex_readings").expanduser()
+    # datapoint values fetched from the data server, kept for re-analysis without network
+    datapoint_cache_directory = Path("~/.cache/rapid350_applications/datapoints").expanduser()
+    # Chrome trace timelines of the workflows, steps and incubations of each run_pipeline call
+    timeline_directory = Path("./timelines").resolve()
+    timeline = None
+    hidex_ingestor = None
+    # tips left on the SOLO deck, unknown at startup: the tip box is refilled before the first protocol
+    tips = TipInventory()
+    # seconds between two status queries of the running workflows
+    poll_interval = 2.0
+    # the app waits for the operator to load the deepwell of every run after the first,
+    # to reload the SOLO deck between the batches of campaign_app and to retry failed workflows
+    pause_for_operator = True
+
+    def define_starting_resources(self, microplates=3):
         """
-        Creates and places MADSci labware resources at the correct locations 
-        at the start of the experiment application.
+        Creates and places MADSci labware resources at the correct locations
+        at the start of the experiment application, as described in deck_layout.yaml.
+        Only labware missing from the resource server is created.
 
-        Starting resources layout: 
+        Starting resources layout:
             SOLO nest 1: deepwell plate
-            Stack1: 3 empty microplates with lid
+            Stack1: microplates empty microplates with lid (3 per run by default)
                 - Uses labware definition compatible with the PlateCrane module.
+
+        Args:
+            microplates (int): number of 384-well plates the runs take from Stack1
         """
+        from rapid350.deck_layout import DeckLayout  # loads the MADSci resource types
 
-        # Create and place deep well resource. 
-        deep_well_lid_resource = Resource(
-                resource_name = f"AMES_deep_well_lid",
-                resource_description="deep well lid",
-                attributes={
-                    "lid": True
-                }
-            )
-        deep_well_48_resource = Collection(
-            resource_name="AMES_deep_well_48",
-            resource_description="48-well deep well plate resource",
-            capacity=2,
-            children={
-                    "lid_slot": Slot(
-                        resource_name = "deep_well_lid_slot",
-                        children=[deep_well_lid_resource]
-                    )
-                }
+        changes = DeckLayout.from_yaml(self.deck_layout, {"microplates": microplates}).apply(
+            self.location_client, self.resource_client
         )
-        try: 
-            solo_nest_1_resource_id = self.location_client.get_location_by_name(location_name="Solo.Position1").resource_id
-            solo_nest_1_resource = self.resource_client.get_resource(solo_nest_1_resource_id)
-            self.resource_client.push(
-                resource=solo_nest_1_resource,
-                child=deep_well_48_resource,
-            )
-        except Exception as e: 
-            print(f"Solo.Position1 is already full. Cannot push new deep well resource.")
-            #raise e
-
-        # Create and place the three microplate resources.
-        microplates = []
-        for i in range(3): 
-            # Create microplate lid resource.
-            current_lid_resource = Resource(
-                resource_name = f"AMES_microplate_lid_{i+1}",
-                resource_description="microplate lid",
-                attributes={
-                    "lid": True
-                }
-            )
+        for change in changes:
+            print(f"Starting resources: {change}")
+
+    def wait_for_operator(self, message):
+        """Prompts the operator with message and waits for Enter, unless pause_for_operator is off."""
+        if self.pause_for_operator:
+            input(f"{message}, then press Enter to continue...")
+
+    def recover_workflow(self, message, workflow):
+        """Asks the operator the step to retry a failed workflow from; without pause_for_operator, its run stops."""
+        if not self.pause_for_operator:
+            print(message)
+            return None
+        return console_recovery(message, workflow)
+
+    def collect_hidex_data(self, workflow, parameters):
+        """
+        Hands the Hidex datapoint of a finished read_then_trash_384_well_plate
+        workflow to the ingestor, which fetches and analyzes it in the
+        background while the run moves on.
+
+        Args:
+            workflow (Workflow): the finished workflow
+            parameters (dict): parameters of the plate read (run_id, microplate_id, current_indicator_column)
+        """
+        hidex_datapoint_id = workflow.get_datapoint_id(step_key="hidex_data", label="json_result")
+        print(f"{hidex_datapoint_id=}")
+        self.hidex_ingestor.submit(hidex_datapoint_id, parameters)
 
-            # Create 384-well microplate resource.
-            current_microplate_resource = Collection(
-                resource_name = f"AMES_microplate_384well_{i+1}", 
-                resource_description="384-well microplate resource used in the AMES Test Experiment Application",
-                capacity=2,
-                children={
-                    "lid_slot": Slot(
-                        resource_name = "microplate_lid_slot",
-                        children=[current_lid_resource]
-                    )
-                }
+    def run_pipeline(self, plans):
+        """
+        Runs the plans on the workcell, then waits for the analysis of the
+        last plates read. Results are stored in results_directory. The timeline
+        of the workflows and incubations is written to timeline_directory,
+        and the node actions and workflows taking the most time are printed.
+        """
+        # only runs need these (pyarrow in particular), not --help, --simulate or the planning
+        from helper_functions.hidex_results import HidexIngestor, ResultsStore
+
+        from rapid350.datapoint_cache import CachedDataClient
+        from rapid350.hidex_readings import ReadingsStore
+        from rapid350.workflow_timeline import WorkflowTimeline
+
+        self.timeline = WorkflowTimeline()
+        self.hidex_ingestor = HidexIngestor(
+            CachedDataClient(self.data_client, self.datapoint_cache_directory),
+            ResultsStore(self.results_directory),
+            readings_store=ReadingsStore(self.readings_directory),
+            clock=self.clock,
+        )
+        try:
+            RunPipeline(
+                self.workcell_client,
+                self.scheduler,
+                self.hso_directory,
+                hso_cache=self.hso_cache,
+                poll_interval=self.poll_interval,
+                timeline=self.timeline,
+                tips=self.tips,
+                refill=self.refill_tips,
+                prompt=self.wait_for_operator,
+                recover=self.recover_workflow,
+            ).run(plans)
+        finally:
+            self.hidex_ingestor.close()
+            if self.timeline.spans:
+                trace = self.timeline.export(
+                    self.timeline_directory / f"{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+                )
+                print(f"Timeline written to {trace}, open it in https://ui.perfetto.dev")
+                print(self.timeline.format_summary("step", ("node", "action")))
+                print(self.timeline.format_summary("workflow", ("name",)))
+                print(self.timeline.format_summary("step", ("workflow",), action="run_protocol"))
+
+    def run_app(self, runs=None):
+        """
+        Runs the AMES test once per entry of runs, each entry holding the
+        parameter overrides of one run (e.g. "test_stock_row"/"test_stock_column"
+        of its compound). Runs are pipelined on the workcell: a run starts its
+        dilutions as soon as the SOLO dilution and stock plates are free, and
+        instruments are shared between runs one workflow at a time.
+
+        Args:
+            runs (list of dict): per-run parameter overrides (default: a single run)
+        """
+        if self.scheduler.pending():
+            raise RuntimeError(
+                f"Incubation deadlines from a previous run are still pending in {self.scheduler.state_file}, "
+                "run with --resume to finish them first."
             )
-            microplates.append(current_microplate_resource)
-
-        stack_1_resource_id = self.location_client.get_location_by_name(location_name="Stack1").resource_id
-        stack_1_resource = self.resource_client.get_resource(stack_1_resource_id)
-        
-        # FOR TESTING (remove from if block for real run!)
-        if not len(stack_1_resource.children) == 3: 
-            stack_1_resource.children = microplates   # NOTE: deletes any existing resource in the stack... a complete reset,
-            # TODO: it might work better to just push the plate resource onto the stack...
-            self.resource_client.update_resource(stack_1_resource)
-
-
-    def run_app(self):
-
-        # workflow path(s)
-        refill_tips_wf = self.workflow_directory / "refill_tips_wf.yaml"
-        run_solo_wf = self.workflow_directory / "run_solo_wf.yaml"
-        transfer_deepwell_to_incubator_wf = self.workflow_directory / "transfer_deepwell_to_incubator_wf.yaml"
-        transfer_deepwell_to_SOLO_wf = self.workflow_directory / "transfer_deepwell_to_SOLO_wf.yaml"
-        get_new_384_well_plate_wf = self.workflow_directory / "get_new_384_well_plate_wf.yaml"
-        transfer_384_to_incubator_wf = self.workflow_directory / "transfer_384_to_incubator_wf.yaml"
-        read_then_trash_384_well_plate_wf = self.workflow_directory / "read_then_trash_384_well_plate_wf.yaml"
-
-        # other variables
-        exposure_incubation_time = 5400 # 5400 seconds = 90 min
-        micoplate_incubation_time = 172800 # 172800 seconds = 48 hours
-
-        # initial payload
-        parameters = {
-            "temp": 37.0, # a float value setting the temperature of the Liconic Incubator (in Celsius)
-            "humidity": 95.0, # a float value setting the humidity of the Liconic Incubator
-            "shaker_speed": 20, # an integer value setting the shaker speed of the Liconic Incubator
-            "stacker": 1, # an integer value specifying which stacker a well plate should be used in (Preferable to use "incubation_plate_id" : plate_id, where plate_id is an integer 1-88 - stacker and slot will be autocalculated)
-            "slot": 2, # an integer value specifying which slot a well plate should be used in (Preferable to use "incubation_plate_id" : plate_id, where plate_id is an integer 1-88 - stacker and slot will be autocalculated)
-            "tip_box_position": "5", # string of an integer 1-8 that identifies the position of the tip box when it is being refilled
-            "seal_time": 3, # an integer value setting the time in seconds for the sealer to seal a plate
-            "protocol_file": "", # string file path to the hso protocol file to be run on SOLO
-        }
 
         # Create starting resources.
-        self.define_starting_resources()
+        self.define_starting_resources(self.microplate_count(runs))
 
         # NOTE: Cannot use lids! They do not fit in the incubator!
 
-        # 1. Refill the tips at beginning of experiment run
-        self.workcell_client.submit_workflow(
-            workflow_definition = refill_tips_wf,
-            json_inputs={
-                "tip_box_position": parameters["tip_box_position"],
-            }
-        )
-
-        # 2. Run SOLO protocol: Dispense DMSO into dilution column wells.
-        hso_1, hso_1_lines, hso_1_basename = package_hso(
-            dispense_DMSO.generate_hso_file, parameters, "/home/rpl/workspace/madsci_temp/solo_temp1.hso"
-        )
-        parameters["protocol_file"] = "/home/rpl/workspace/madsci_temp/solo_temp1.hso"
-        self.workcell_client.submit_workflow(
-            workflow_definition = run_solo_wf,
-            file_inputs={
-                "protocol_file": parameters["protocol_file"],
-            }
-        )
-
-        # 3. Run SOLO protocol: Dispense control and test compounds into dilution column wells.
-        hso_2, hso_2_lines, hso_2_basename = package_hso(
-            dispense_control_and_test.generate_hso_file, parameters, "/home/rpl/workspace/madsci_temp/solo_temp2.hso"
-        )
-        parameters["protocol_file"] = "/home/rpl/workspace/madsci_temp/solo_temp2.hso"
-        self.workcell_client.submit_workflow(
-            workflow_definition = run_solo_wf,
-            file_inputs={
-                "protocol_file": parameters["protocol_file"],
-            }
-        )
-
-        # 4. Run SOLO protocol: Serial dilute test compound.
-        hso_3, hso_3_lines, hso_3_basename = package_hso(
-            serial_dilute_test_compound.generate_hso_file, parameters, "/home/rpl/workspace/madsci_temp/solo_temp3.hso"
-        )
-        parameters["protocol_file"] = "/home/rpl/workspace/madsci_temp/solo_temp3.hso"
-        self.workcell_client.submit_workflow(
-            workflow_definition = run_solo_wf,
-            file_inputs={
-                "protocol_file": parameters["protocol_file"],
-            }
-        )
-
-        # 5. Run SOLO protocol: Dispense cells then diluted compound into exposure wells (col 1,2,3)
-        hso_4, hso_4_lines, hso_4_basename = package_hso(
-            dispense_cells_then_compound.generate_hso_file, parameters, "/home/rpl/workspace/madsci_temp/solo_temp4.hso"
-        )
-        parameters["protocol_file"] = "/home/rpl/workspace/madsci_temp/solo_temp4.hso"
-        self.workcell_client.submit_workflow(
-            workflow_definition = run_solo_wf,
-            file_inputs={
-                "protocol_file": parameters["protocol_file"],
-            }
-        )
+        self.run_pipeline(self.plan_runs(runs))
 
-        # 6. Seal the exposure/indicator deepwell and transfer into incubator.
-        self.workcell_client.submit_workflow(
-            workflow_definition = transfer_deepwell_to_incubator_wf,
-            json_inputs={
-                "shaker_speed": parameters["shaker_speed"],
-            }
-        )
-
-        # 7. Incubate at 37C for 90 min, with gentle shaking.
-        time.sleep(exposure_incubation_time)
+    def read_plates_app(self, microplate_ids, runs=None):
+        """
+        Reads incubated 384-well plates, e.g. plates left in the incubator by
+        an interrupted run, in a single Hidex session: the next plate is
+        unloaded while the current one is read, and the Hidex door is only
+        opened and closed once. Readings are analyzed as in run_app, with the
+        plate parameters persisted with their pending incubation deadlines,
+        or else with those of the runs that filled them.
+
+        Args:
+            microplate_ids (list of str): Liconic plate IDs of the plates, in read order
+            runs (list of dict): per-run parameter overrides of the runs that filled the plates,
+                e.g. campaign_batch (default: the default runs)
+        """
+        self.run_pipeline([self.plan_plate_reads(microplate_ids, runs, self.scheduler.pending())])
 
-        # 8. Unload exposure/indicator deepwell from incubator and return to SOLO deck 1.
-        self.workcell_client.submit_workflow(
-            workflow_definition = transfer_deepwell_to_SOLO_wf,
+    def campaign_app(self, library, runs_per_batch=None, replicates: Optional[int] = None, samples_per_plate=1):
+        """
+        Screens every compound of a library. Compounds are packed onto stock
+        plate wells, dilution plate columns and the exposure/indicator groups
+        of the runs (one compound per run in three replicates by default), and
+        run in batches of runs_per_batch pipelined runs. The layout of the
+        campaign (stock plate, well, dilution column, indicator columns and
+        run ID of every compound) is written next to results_directory before the
+        first batch.
+        Between batches the app waits for the operator to load the next stock
+        plate, a new dilution plate, the exposure/indicator deepwell of the
+        first run and the 384-well plates of the batch. The deepwells of the
+        other runs are loaded when each run prompts for it.
+
+        Args:
+            library (str | Path): CSV or Parquet file with a "compound" column
+            runs_per_batch (int): runs pipelined in each batch (default: as many as the 12 dilution columns hold)
+            replicates (int): exposure/indicator groups per compound, 1-3; with 1 a run tests three compounds
+                (default: 3, one compound per run)
+            samples_per_plate (int): indicator columns dispensed side by side into each 384-well plate, 1-3
+
+        Returns:
+            Path: the layout file
+        """
+        if replicates is None:
+            replicates = len(EXPOSURE_GROUPS)
+        library = Path(library)
+        batches = pack_library(load_library(library), runs_per_batch, replicates)
+        campaign_runs = self.campaign_runs(batches, library.stem, samples_per_plate)
+        layout_file = write_layout(
+            batches,
+            self.results_directory.parent / f"{library.stem}_layout.csv",
+            {
+                assignment.compound: runs[assignment.run_index]["run_id"]
+                for batch, runs in zip(batches, campaign_runs)
+                for assignment in batch
+            },
         )
-
-        # 9. Run SOLO protocol: Transfer all contents of exposure wells to indicator wells.
-        hso_5, hso_5_lines, hso_5_basename = package_hso(
-            exposure_to_indicator.generate_hso_file, parameters, "/home/rpl/workspace/madsci_temp/solo_temp5.hso"
+        print(f"{sum(map(len, batches))} compounds in {len(batches)} batches, layout written to {layout_file}")
+
+        for batch, runs in zip(batches, campaign_runs):
+            if batch[0].batch > 1:
+                self.wait_for_operator(
+                    f"Load batch {batch[0].batch} ({len(runs)} runs, stock plate {batch[0].stock_plate}, "
+                    f"see the layout file): a new dilution plate, the deepwell of its first run on SOLO Position1 "
+                    f"and {self.microplate_count(runs)} 384-well plates in Stack1"
+                )
+            print(f"Batch {batch[0].batch}: {', '.join(assignment.compound for assignment in batch)}")
+            self.run_app(runs)
+        return layout_file
+
+    def use_fake_workcell(self, time_compression=100000.0):
+        """
+        Replaces the MADSci workcell, location, resource and data services by
+        an in-process FakeWorkcell, whose actions take their simulation_durations
+        time. The app and the fake services share a VirtualClock running
+        time_compression times faster than real time. Incubation deadlines,
+        results and readings of the fake run go to a new fake_runs/ directory,
+        never to the files of real runs.
+
+        Args:
+            time_compression (float): simulated seconds per wall clock second
+
+        Returns:
+            FakeWorkcell: the fake services, e.g. to inspect the submitted workflows
+        """
+        from helper_functions.fake_workcell import FakeWorkcell
+        from helper_functions.well_maps import PLATE_384
+        from helper_functions.workcell_simulator import ActionDurations
+
+        from rapid350.deck_layout import DeckLayout
+
+        self.clock = VirtualClock(time_compression)
+        workcell = FakeWorkcell(
+            locations=[layout.location_name for layout in DeckLayout.from_yaml(self.deck_layout).locations],
+            durations=ActionDurations.from_yaml(self.simulation_durations),
+            clock=self.clock,
+            plate_shape=PLATE_384,
         )
-        parameters["protocol_file"] = "/home/rpl/workspace/madsci_temp/solo_temp5.hso"
-        self.workcell_client.submit_workflow(
-            workflow_definition = run_solo_wf,
-            file_inputs={
-                "protocol_file": parameters["protocol_file"],
-            }
+        self.workcell_client = workcell.workcell_client
+        self.location_client = workcell.location_client
+        self.resource_client = workcell.resource_client
+        self.data_client = workcell.data_client
+
+        run_directory = Path("./fake_runs").resolve() / datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        print(f"Running on a fake workcell, local files go to {run_directory}")
+        self.scheduler = IncubationScheduler(
+            run_directory / "incubation_schedule.json",
+            poll_interval=600,
+            clock=self.clock,
         )
-
-        # BEGIN LOOP: Loop 3 times to create 3 384-well assay plates.
-        for i in range(3):
-            microplate_id = i + 2  # 384 well plates will have plate IDs 2, 3, and 4
-            parameters["microplate_id"] = str(microplate_id)
-
-            # 10. Transfer a new 384 well plate to the SOLO deck.
-            self.workcell_client.submit_workflow(
-                workflow_definition = get_new_384_well_plate_wf,
-            )
-
-            # 11. Run SOLO protocol: Transfer 50uL from indicator wells into each well of a 384-well plate
-            parameters["current_indicator_column"] = i + 4  # indicator columns are 4, 5, and 6
-
-            # 11a. First half of 384-well plate.
-            parameters["half"] = 1
-            solo_temp_filename = f"/home/rpl/workspace/madsci_temp/solo_temp_384_{i+5}.hso"
-            hso_6, hso_6_lines, hso_6_basename = package_hso(
-                dispense_into_384_plate.generate_hso_file,
-                payload=parameters,
-                temp_file_path=solo_temp_filename,
-            )
-            parameters["protocol_file"] = solo_temp_filename
-            self.workcell_client.submit_workflow(
-                workflow_definition = run_solo_wf,
-                file_inputs={
-                    "protocol_file": parameters["protocol_file"],
-                }
-            )
-
-            # 11b. Second half of 384 well plate 
-            parameters["half"] = 2
-            solo_temp_filename = f"/home/rpl/workspace/madsci_temp/solo_temp_384_{i+6}.hso"
-            hso_7, hso_7_lines, hso_7_basename = package_hso(
-                dispense_into_384_plate.generate_hso_file,
-                payload=parameters,
-                temp_file_path=solo_temp_filename,
-            )
-            parameters["protocol_file"] = solo_temp_filename
-            self.workcell_client.submit_workflow(
-                workflow_definition = run_solo_wf,
-                file_inputs={
-                    "protocol_file": parameters["protocol_file"],
-                }
-            )
-
-            # 12. Replace lid on 384-well plate and transfer into incubator
-            self.workcell_client.submit_workflow(
-                workflow_definition = transfer_384_to_incubator_wf,
-                json_inputs={
-                    "microplate_id": parameters["microplate_id"],
-                }
-            )
-
-        # # END LOOP.
-        # # NOTE: At this point, all three 384-well assay plates are in the incubator and shaking.
-
-        # 13. Incubate all 3 384-well plates overnight (48 hours, no shaking, 37C).
-        time.sleep(micoplate_incubation_time)
-
-        # # BEGIN LOOP. Collect absorbance readings for each of the 3 384-well plates and transfer them to trash stack.
-        # for i in range(3):
-        for i in range(1): # TESTING
-            microplate_id = i + 2 # 384 well plates will have plate IDs 2, 3, and 4
-            parameters["microplate_id"] = str(microplate_id)
-
-            # 14. Remove a 384-plate from incubator, remove lid, read in Hidex Sense, replace lid, and move to trash stack.
-            workflow = self.workcell_client.submit_workflow(
-                workflow_definition=read_then_trash_384_well_plate_wf,
-                json_inputs={
-                    "microplate_id": parameters["microplate_id"],
-                }
-            )
-            # collect hidex data
-            hidex_datapoint_id = workflow.get_datapoint_id(step_key="hidex_data", label="json_result")
-            print(f"{hidex_datapoint_id=}")
-
-
-        # # END LOOP.
-        # # NOTE: At this point, all three 384-well plates are in the trash stack.
+        self.hso_directory = None
+        self.tips = TipInventory()
+        self.pause_for_operator = False
+        self.results_directory = run_directory / "plate_results"
+        self.readings_directory = run_directory / "hidex_readings"
+        self.datapoint_cache_directory = run_directory / "datapoints"
+        self.timeline_directory = run_directory
+        # poll about once per simulated minute
+        self.poll_interval = min(self.poll_interval, 60 / time_compression)
+        return workcell
+
+    def resume_app(self):
+        """
+        Finishes the runs of a previous (interrupted) process from their
+        persisted incubation deadlines, on the original due times.
+        """
+        plans = []
+        for deadline in self.scheduler.pending():
+            print(f"Resuming {deadline.name}, due at {datetime.datetime.fromtimestamp(deadline.due)}")
+            parameters = dict(deadline.payload)
+            action = parameters.pop("action")
+            if action == "assay_plates":
+                stages = [Await(deadline.name), *self.assay_plate_stages(parameters)]
+            elif action == "read_microplate":
+                stages = self.read_microplate_stages(parameters)
+            else:
+                raise ValueError(f"Unknown incubation action {action} for deadline {deadline.name}")
+            plans.append(RunPlan(deadline.name, stages))
+
+        self.run_pipeline(plans)
 
 
 if __name__ == "__main__":
 
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="only fire the incubation deadlines left pending by an interrupted run",
+    )
+    parser.add_argument(
+        "--simulate",
+        action="store_true",
+        help="estimate the run time on a simulated workcell (see simulation.yaml) instead of running",
+    )
+    parser.add_argument(
+        "--fake",
+        action="store_true",
+        help="run against an in-process fake workcell instead of the MADSci services",
+    )
+    parser.add_argument(
+        "--time-compression",
+        type=float,
+        default=100000.0,
+        help="simulated seconds per second with --fake (default: 100000, 48 hours in under 2 seconds)",
+    )
+    parser.add_argument("--runs", type=int, default=1, help="number of pipelined runs (default: 1)")
+    parser.add_argument(
+        "--read-plates",
+        nargs="+",
+        metavar="MICROPLATE_ID",
+        help="only read these incubated 384-well plates, in one Hidex session",
+    )
+    parser.add_argument(
+        "--campaign",
+        type=Path,
+        metavar="LIBRARY",
+        help="screen every compound of a library (CSV or Parquet file with a compound column), batch by batch",
+    )
+    parser.add_argument(
+        "--runs-per-batch",
+        type=int,
+        help=f"with --campaign, runs pipelined in each batch (default: as many as the {DILUTION_COLUMNS} dilution plate columns hold)",
+    )
+    parser.add_argument(
+        "--replicates",
+        type=int,
+        default=len(EXPOSURE_GROUPS),
+        help="with --campaign, exposure/indicator groups per compound: 3 tests one compound per run, "
+        "1 tests three (default: 3)",
+    )
+    parser.add_argument(
+        "--samples-per-plate",
+        type=int,
+        default=1,
+        help="with --campaign, indicator columns dispensed side by side into each 384-well plate, 1-3 (default: 1)",
+    )
+    parser.add_argument(
+        "--batch",
+        type=int,
+        help="with --campaign and --read-plates, the batch that filled the plates (plate IDs are reused by every batch)",
+    )
+    args = parser.parse_args()
+    if args.fake and args.resume:
+        parser.error("--resume finishes real runs, it cannot be used with --fake")
+    if args.read_plates and args.resume:
+        parser.error("--read-plates and --resume cannot be used together")
+    if args.campaign and (args.resume or args.simulate):
+        parser.error("--campaign cannot be used with --resume or --simulate (see ames_runs.py --simulate --campaign)")
+    if (args.batch is not None) != bool(args.campaign and args.read_plates):
+        parser.error("--batch is needed with --campaign and --read-plates, and only then")
+
     current_time = datetime.datetime.now()
 
     experiment_app = DionExperimentApplication()
+    runs = [{} for _ in range(args.runs)]
+    plate_runs = None  # the runs that filled the plates of --read-plates
+    if args.read_plates and args.campaign:
+        plate_runs = experiment_app.campaign_batch(
+            args.campaign, args.batch, args.runs_per_batch, args.replicates, args.samples_per_plate
+        )
 
-    with experiment_app.manage_experiment(
-        run_name=f"Dion's Experiment Run {current_time}",
-        run_description=f"Run for Dion's LDRD experiment, started at ~{current_time}",
-    ):
-
-        experiment_app.run_app()
\ No newline at end of file
+    if args.simulate:
+        plans = [experiment_app.plan_plate_reads(args.read_plates, plate_runs)] if args.read_plates else None
+        experiment_app.simulate_app(runs, plans=plans)
+    elif args.fake:
+        experiment_app.use_fake_workcell(args.time_compression)
+        if args.read_plates:
+            experiment_app.read_plates_app(args.read_plates, plate_runs)
+        elif args.campaign:
+            experiment_app.campaign_app(args.campaign, args.runs_per_batch, args.replicates, args.samples_per_plate)
+        else:
+            experiment_app.run_app(runs)
+        for wait in experiment_app.clock.waits:
+            print(f"Waited {datetime.timedelta(seconds=round(wait.seconds))} for {wait.reason}")
+    else:
+        with experiment_app.manage_experiment(
+            run_name=f"Dion's Experiment Run {current_time}",
+            run_description=f"Run for Dion's LDRD experiment, started at ~{current_time}",
+        ):
+
+            if args.resume:
+                experiment_app.resume_app()
+            elif args.read_plates:
+                experiment_app.read_plates_app(args.read_plates, plate_runs)
+            elif args.campaign:
+                experiment_app.campaign_app(args.campaign, args.runs_per_batch, args.replicates, args.samples_per_plate)
+            else:
+                experiment_app.run_app(runs)
@@ -0,0 +1,223 @@
+"""
+Compound libraries of AMES campaigns, and where each compound goes.
+
+A library is a CSV or Parquet table with one row per test compound and a
+"compound" column naming it; other columns (e.g. a concentration or a
+SMILES string) are kept with the compound. pack_library assigns every
+compound a well of a stock plate, a column of a dilution plate and the
+exposure/indicator groups of its run's deepwell (see plate_layout), and
+groups the compounds into batches of runs that are pipelined together:
+
+- a run tests one compound in three replicates, or up to three compounds
+  with fewer replicates, one per exposure/indicator group of its deepwell
+- every compound is diluted in its own column of the dilution plate, so a
+  batch holds at most 12 compounds
+- the stock plate wells are filled batch after batch, around the DMSO stock
+  (column 1) and the control compound (A2). A batch never spans two stock
+  plates, since the SOLO deck holds a single one (Position4).
+
+The layout of a campaign is written to a CSV file, for whoever prepares the
+stock plates and to match the run IDs of the results to the compounds.
+"""
+
+import csv
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from helper_functions.plate_layout import EXPOSURE_GROUPS, compound_groups
+from helper_functions.well_maps import DEEPWELL_96
+
+ROWS = "ABCDEFGH"
+# wells of the stock plate free for test compounds, in fill order: from A3, the
+# well of the single compound runs, column by column, then column 2 below the control
+STOCK_WELLS = [
+    (row, column) for column in range(3, DEEPWELL_96[1] + 1) for row in ROWS
+] + [(row, 2) for row in ROWS[1:]]
+DILUTION_COLUMNS = DEEPWELL_96[1]
+
+
+@dataclass
+class CompoundAssignment:
+    """Where a compound of the library goes, and the run that tests it."""
+
+    compound: str
+    batch: int  # from 1
+    run_index: int  # from 0 within the batch, see AmesRuns.run_parameters
+    stock_plate: int  # from 1, over the whole campaign
+    stock_row: str
+    stock_column: int
+    dilution_column: int
+    indicator_columns: List[int]  # deepwell indicator columns of the compound's samples, one per replicate
+    details: Dict[str, Any] = field(default_factory=dict)  # the other columns of the library
+
+    @property
+    def stock_well(self) -> str:
+        """The stock plate well, e.g. "A3"."""
+        return f"{self.stock_row}{self.stock_column}"
+
+
+def load_library(path) -> List[Dict[str, Any]]:
+    """load_library
+
+    Description: Reads a compound library, a CSV or Parquet (.parquet) table with a "compound" column
+
+    Args:
+        path (str | Path): the library file
+
+    Returns:
+        compounds: (list of dict) one dictionary per row of the library, in file order
+
+    Raises:
+        ValueError: if the "compound" column is missing, or a compound is listed twice
+    """
+    path = Path(path)
+    if path.suffix.lower() == ".parquet":
+        import pyarrow.parquet as pq  # only needed for Parquet libraries
+
+        rows = pq.read_table(path).to_pylist()
+    else:
+        with open(path, "r", newline="") as library_file:
+            rows = list(csv.DictReader(library_file))
+
+    compounds, seen = [], set()
+    for number, row in enumerate(rows, start=1):
+        if "compound" not in row:
+            raise ValueError(f"{path} has no compound column")
+        name = str(row["compound"] or "").strip()
+        if not name:
+            continue  # blank line
+        if name in seen:
+            raise ValueError(f"Compound {name} is listed twice in {path} (row {number})")
+        seen.add(name)
+        compounds.append({**row, "compound": name})
+    return compounds
+
+
+def pack_library(
+    compounds: List[Dict[str, Any]],
+    runs_per_batch: Optional[int] = None,
+    replicates: int = len(EXPOSURE_GROUPS),
+) -> List[List[CompoundAssignment]]:
+    """pack_library
+
+    Description:
+        Assigns each compound a stock plate well, a dilution plate column and
+        exposure/indicator groups, in library order, and groups them into
+        batches of at most runs_per_batch runs. A run tests as many compounds
+        as its deepwell holds groups of replicates (3 // replicates)
+
+    Args:
+        compounds (list of dict): the compounds, as returned by load_library
+        runs_per_batch (int): runs pipelined together (default: as many as the 12 dilution columns hold)
+        replicates (int): exposure/indicator groups per compound, 1-3
+
+    Returns:
+        batches: (list of list of CompoundAssignment) the compounds of each batch, in run order
+
+    Raises:
+        ValueError: if replicates is outside 1-3, or the compounds of runs_per_batch runs
+            need more than the 12 dilution columns
+    """
+    if replicates not in range(1, len(EXPOSURE_GROUPS) + 1):
+        raise ValueError(f"replicates must be in the range 1-{len(EXPOSURE_GROUPS)}, not {replicates}")
+    compounds_per_run = len(EXPOSURE_GROUPS) // replicates
+    max_runs = DILUTION_COLUMNS // compounds_per_run
+    runs_per_batch = max_runs if runs_per_batch is None else runs_per_batch
+    if runs_per_batch not in range(1, max_runs + 1):
+        raise ValueError(
+            f"runs_per_batch must be in the range 1-{max_runs} with {compounds_per_run} compounds per run, "
+            f"not {runs_per_batch}"
+        )
+
+    batch_size = runs_per_batch * compounds_per_run
+    batches: List[List[CompoundAssignment]] = []
+    stock_plate, next_well = 1, 0
+    for start in range(0, len(compounds), batch_size):
+        batch = compounds[start:start + batch_size]
+        if next_well + len(batch) > len(STOCK_WELLS):
+            stock_plate, next_well = stock_plate + 1, 0
+        assignments = []
+        for index, compound in enumerate(batch):
+            row, column = STOCK_WELLS[next_well]
+            next_well += 1
+            run_index, position = divmod(index, compounds_per_run)
+            assignments.append(
+                CompoundAssignment(
+                    compound=compound["compound"],
+                    batch=len(batches) + 1,
+                    run_index=run_index,
+                    stock_plate=stock_plate,
+                    stock_row=row,
+                    stock_column=column,
+                    dilution_column=index + 1,
+                    indicator_columns=[indicator for _, indicator in compound_groups(position, replicates)],
+                    details={key: value for key, value in compound.items() if key != "compound"},
+                )
+            )
+        batches.append(assignments)
+    return batches
+
+
+def format_batches(batches: List[List[CompoundAssignment]]) -> str:
+    """The batches of a campaign as text, one line per compound."""
+    lines = []
+    for batch in batches:
+        runs = batch[-1].run_index + 1
+        lines.append(
+            f"batch {batch[0].batch}: stock plate {batch[0].stock_plate}, {len(batch)} compounds in {runs} runs"
+        )
+        for assignment in batch:
+            lines.append(
+                f"  run {assignment.run_index + 1:>2}. {assignment.compound}: stock well {assignment.stock_well}, "
+                f"dilution column {assignment.dilution_column}, "
+                f"indicator columns {', '.join(map(str, assignment.indicator_columns))}"
+            )
+    return "\n".join(lines)
+
+
+def write_layout(batches: List[List[CompoundAssignment]], path, run_ids: Dict[str, str]) -> Path:
+    """write_layout
+
+    Description: Writes where every compound of a campaign goes to a CSV file
+
+    Args:
+        batches (list of list of CompoundAssignment): the packed campaign
+        path (str | Path): CSV file to write
+        run_ids (dict): run ID of each compound
+
+    Returns:
+        Path: the written file
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    assignments = [assignment for batch in batches for assignment in batch]
+    details = list(dict.fromkeys(key for assignment in assignments for key in assignment.details))
+    with open(path, "w", newline="") as layout_file:
+        writer = csv.writer(layout_file)
+        writer.writerow(
+            [
+                "compound",
+                "run_id",
+                "batch",
+                "stock_plate",
+                "stock_well",
+                "dilution_column",
+                "indicator_columns",
+                *details,
+            ]
+        )
+        for assignment in assignments:
+            writer.writerow(
+                [
+                    assignment.compound,
+                    run_ids[assignment.compound],
+                    assignment.batch,
+                    assignment.stock_plate,
+                    assignment.stock_well,
+                    assignment.dilution_column,
+                    " ".join(map(str, assignment.indicator_columns)),
+                    *(assignment.details.get(key, "") for key in details),
+                ]
+            )
+    return path
@@ -0,0 +1,278 @@
+"""
+In-process stand-in for the MADSci workcell, location, resource and data
+services, for end-to-end runs of the experiment applications without a live
+MADSci stack or any hardware.
+
+A FakeWorkcell accepts workflow submissions and completes their steps on a
+VirtualClock, each action taking its ActionDurations time (simulation.yaml)
+and waiting for its node like on the real workcell. Run assay steps leave a
+synthetic reading datapoint, served by the fake data client. Resources pushed
+to the fake resource server (e.g. by define_starting_resources) are recorded.
+On the default VirtualClock (100000 times faster than real time), the 48 hour incubation of the 384-well
+plates lasts under two seconds.
+"""
+
+import datetime
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+from helper_functions.workcell_simulator import ActionDurations
+from madsci.common.types.action_types import (
+    ActionDatapoints,
+    ActionStatus,
+    ActionSucceeded,
+)
+from madsci.common.types.datapoint_types import ValueDataPoint
+from madsci.common.types.location_types import Location
+from madsci.common.types.resource_types import Slot, Stack
+from madsci.common.types.workflow_types import Workflow, WorkflowDefinition
+
+from rapid350.clock import Clock, VirtualClock
+
+
+def synthetic_reading(shape=(16, 24), rng=None, mean=1000.0, stddev=50.0) -> Dict[str, float]:
+    """Random {well: reading} plate reading, as a Hidex run_assay datapoint value."""
+    rng = rng if rng is not None else np.random.default_rng()
+    readings = rng.normal(mean, stddev, shape)
+    return {
+        f"{chr(ord('A') + row)}{column + 1}": float(readings[row, column])
+        for row in range(shape[0])
+        for column in range(shape[1])
+    }
+
+
+def _datetime(epoch: float) -> datetime.datetime:
+    return datetime.datetime.fromtimestamp(epoch, tz=datetime.timezone.utc)
+
+
+class FakeWorkcellClient:
+    """Accepts workflow submissions and runs them on the FakeWorkcell clock."""
+
+    def __init__(self, workcell: "FakeWorkcell"):
+        """
+        Args:
+            workcell (FakeWorkcell): the fake services the client talks to
+        """
+        self.workcell = workcell
+        self.submitted: List[Workflow] = []  # every accepted workflow, in submission order
+        self.files: Dict[str, Dict[str, str]] = {}  # uploaded file inputs of each workflow, by input name
+        self._workflows: Dict[str, Workflow] = {}
+        self._step_times: Dict[str, List[tuple]] = {}  # workflow ID -> (start, end) of each step
+        self._node_free: Dict[str, float] = {}  # node -> time its last scheduled action ends
+        self._lock = threading.Lock()
+
+    def submit_workflow(
+        self,
+        workflow_definition,
+        json_inputs: Optional[Dict[str, Any]] = None,
+        file_inputs: Optional[Dict[str, Any]] = None,
+        await_completion: bool = True,
+        **kwargs,
+    ) -> Workflow:
+        """submit_workflow
+
+        Description: Same as WorkcellClient.submit_workflow. Each step starts once the
+            previous step is done and its node is free of the steps submitted before.
+
+        Args:
+            workflow_definition (str | Path | WorkflowDefinition): workflow YAML path or definition
+            json_inputs (dict): json inputs of the workflow
+            file_inputs (dict): file inputs of the workflow, as paths (read on submission)
+            await_completion (bool): block until the workflow has finished
+
+        Returns:
+            Workflow: the submitted workflow (the finished one if await_completion)
+        """
+        if not isinstance(workflow_definition, WorkflowDefinition):
+            workflow_definition = WorkflowDefinition.from_yaml(workflow_definition)
+        workflow = Workflow(
+            **workflow_definition.model_dump(exclude={"steps"}),
+            steps=[step.model_dump() for step in workflow_definition.steps],
+            parameter_values=dict(json_inputs or {}),
+        )
+        files = {name: Path(path).read_text() for name, path in (file_inputs or {}).items()}
+
+        with self._lock:
+            now = self.workcell.clock.time()
+            step_times = []
+            end = now
+            for step in workflow.steps:
+                start = max(end, self._node_free.get(step.node, now))
+                end = start + self.workcell.durations.duration(step.node, step.action)
+                self._node_free[step.node] = end
+                step_times.append((start, end))
+            self._workflows[workflow.workflow_id] = workflow
+            self._step_times[workflow.workflow_id] = step_times
+            self.files[workflow.workflow_id] = files
+            self.submitted.append(workflow)
+
+        if await_completion:
+            while not self.query_workflow(workflow.workflow_id).status.terminal:
+                self.workcell.clock.sleep(60, f"workflow {workflow.name}")
+        return self.query_workflow(workflow.workflow_id)
+
+    def query_workflow(self, workflow_id: str) -> Workflow:
+        """Current state of a workflow, every step whose end time has passed is completed."""
+        with self._lock:
+            workflow = self._workflows[workflow_id]
+            if not workflow.status.terminal:
+                now = self.workcell.clock.time()
+                for index, (step, (start, end)) in enumerate(zip(workflow.steps, self._step_times[workflow_id])):
+                    if step.status == ActionStatus.SUCCEEDED:
+                        continue
+                    workflow.status.current_step_index = index
+                    if start > now:
+                        break  # waiting for its node
+                    if workflow.start_time is None:
+                        workflow.start_time = _datetime(start)
+                    step.start_time = _datetime(start)
+                    if end > now:
+                        workflow.status.running = workflow.status.has_started = True
+                        step.status = ActionStatus.RUNNING
+                        break
+                    step.status = ActionStatus.SUCCEEDED
+                    step.end_time = _datetime(end)
+                    step.result = ActionSucceeded(datapoints=self.workcell.datapoints_of(workflow, step))
+                else:
+                    workflow.status.current_step_index = len(workflow.steps)
+                    workflow.status.running = False
+                    workflow.status.completed = workflow.status.has_started = True
+                    workflow.end_time = workflow.steps[-1].end_time if workflow.steps else _datetime(now)
+            return workflow.model_copy(deep=True)
+
+    def cancel_workflow(self, workflow_id: str) -> Workflow:
+        """Stops a workflow at its current step."""
+        with self._lock:
+            workflow = self._workflows[workflow_id]
+            if not workflow.status.terminal:
+                workflow.status.cancelled = True
+                workflow.status.running = False
+            return workflow.model_copy(deep=True)
+
+
+class FakeLocationClient:
+    """Serves the locations of the FakeWorkcell."""
+
+    def __init__(self, workcell: "FakeWorkcell"):
+        """
+        Args:
+            workcell (FakeWorkcell): the fake services the client talks to
+        """
+        self.workcell = workcell
+
+    def get_locations(self, timeout=None) -> List[Location]:
+        """Every location, each with the ID of the resource holding its labware."""
+        return list(self.workcell.locations.values())
+
+
+class FakeResourceClient:
+    """Keeps resources in memory and records every update pushed to them."""
+
+    def __init__(self, workcell: "FakeWorkcell"):
+        """
+        Args:
+            workcell (FakeWorkcell): the fake services the client talks to
+        """
+        self.workcell = workcell
+        self.resources: Dict[str, Any] = {}
+        self.pushes: List[Any] = []  # copy of every resource passed to update_resource, in order
+        self._lock = threading.Lock()
+
+    def add_resource(self, resource, timeout=None):
+        """Stores a new resource."""
+        with self._lock:
+            self.resources[resource.resource_id] = resource.model_copy(deep=True)
+        return resource
+
+    def get_resource(self, resource=None, timeout=None):
+        """A copy of a stored resource, by ID or by resource."""
+        resource_id = getattr(resource, "resource_id", resource)
+        with self._lock:
+            if resource_id not in self.resources:
+                raise KeyError(f"Unknown resource {resource_id}")
+            return self.resources[resource_id].model_copy(deep=True)
+
+    def update_resource(self, resource, timeout=None):
+        """Replaces a stored resource, including its children."""
+        with self._lock:
+            self.resources[resource.resource_id] = resource.model_copy(deep=True)
+            self.pushes.append(resource.model_copy(deep=True))
+        return resource
+
+
+class FakeDataClient:
+    """Serves the values of the datapoints left by FakeWorkcell steps."""
+
+    def __init__(self, workcell: "FakeWorkcell"):
+        """
+        Args:
+            workcell (FakeWorkcell): the fake services the client talks to
+        """
+        self.workcell = workcell
+        self.values: Dict[str, Any] = {}
+
+    def get_datapoint_value(self, datapoint_id, timeout=None) -> Any:
+        """Value of a datapoint."""
+        if str(datapoint_id) not in self.values:
+            raise KeyError(f"Unknown datapoint {datapoint_id}")
+        return self.values[str(datapoint_id)]
+
+
+class FakeWorkcell:
+    """The fake workcell, location, resource and data services, sharing one clock."""
+
+    def __init__(
+        self,
+        locations: Iterable[str] = (),
+        durations: Optional[ActionDurations] = None,
+        clock: Optional[Clock] = None,
+        plate_shape=(16, 24),
+        reading: Optional[Callable[[Workflow, Any], Any]] = None,
+        seed: Optional[int] = None,
+    ):
+        """
+        Args:
+            locations (list of str): names of the locations holding labware, e.g. "Solo.Position1".
+                Those starting with "Stack" hold a stack of plates, the others a single plate.
+            durations (ActionDurations): time taken by each node action (default: 60 s each)
+            clock (Clock): clock the actions take their time on (default: a VirtualClock
+                running 100000 times faster than the wall clock)
+            plate_shape (tuple): (rows, columns) of the synthetic plate readings
+            reading (callable): called with the workflow and the step to make the value of a
+                run_assay datapoint (default: synthetic_reading of plate_shape)
+            seed (int): seed of the synthetic readings
+        """
+        self.clock = clock or VirtualClock()
+        self.durations = durations or ActionDurations()
+        self.plate_shape = plate_shape
+        self.reading = reading
+        self.rng = np.random.default_rng(seed)
+        self.workcell_client = FakeWorkcellClient(self)
+        self.location_client = FakeLocationClient(self)
+        self.resource_client = FakeResourceClient(self)
+        self.data_client = FakeDataClient(self)
+        self.locations: Dict[str, Location] = {}
+        for name in locations:
+            self.add_location(name)
+
+    def add_location(self, name: str) -> Location:
+        """Creates a location with an empty slot or stack resource."""
+        container = Stack(resource_name=name) if name.startswith("Stack") else Slot(resource_name=name)
+        self.resource_client.add_resource(container)
+        self.locations[name] = Location(location_name=name, resource_id=container.resource_id)
+        return self.locations[name]
+
+    def datapoints_of(self, workflow: Workflow, step) -> Optional[ActionDatapoints]:
+        """Datapoints left by a finished step: a json_result reading for run_assay actions."""
+        if step.action != "run_assay":
+            return None
+        value = (
+            self.reading(workflow, step)
+            if self.reading is not None
+            else synthetic_reading(self.plate_shape, self.rng)
+        )
+        datapoint = ValueDataPoint(label="json_result", value=value)
+        self.data_client.values[str(datapoint.datapoint_id)] = value
+        return ActionDatapoints(json_result=datapoint.datapoint_id)
@@ -0,0 +1,299 @@
+"""
+Streaming ingestion and analysis of the Hidex readings of the 384-well plates.
+
+Each read_then_trash_384_well_plate workflow leaves one hidex_data datapoint.
+As soon as the workflow has finished, its datapoint is handed to a
+HidexIngestor, which fetches and analyzes it on a background thread (so runs
+do not wait on the data server) and appends the plate's results to a
+ResultsStore, a dataset partitioned by run like the readings. The results of
+a plate are on disk while the next plates are still being read. The raw
+readings also go to the ReadingsStore shared with the other applications.
+
+Plate layout: every row of the exposure/indicator deepwell is dispensed into
+two rows of the 384-well plate (deepwell row A into rows A and B, row B into
+rows C and D...), over the columns filled by dispense_into_384_plate. Deepwell
+row A holds the positive control, rows B-G the test compound dilutions
+(highest dose first) and row H DMSO only, the negative control. A plate packed
+with several samples (see plate_layout) is analyzed sample by sample, each
+over its own columns and against its own negative control.
+"""
+
+import queue
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pyarrow as pa
+from helper_functions.plate_layout import plate_samples
+from helper_functions.well_maps import PLATE_384
+from protocols.dispense_into_384_plate import FILLED_COLUMNS
+
+from rapid350.clock import Clock, WallClock
+from rapid350.hidex_readings import (
+    ReadingsStore,
+    RunPartitionedStore,
+    parse_hidex_reading,
+)
+
+# condition of each deepwell row, in row order
+CONDITIONS = [
+    "positive_control",
+    "dose_1",
+    "dose_2",
+    "dose_3",
+    "dose_4",
+    "dose_5",
+    "dose_6",
+    "negative_control",
+]
+
+
+def condition_mask(condition: int, shape=PLATE_384, columns=FILLED_COLUMNS) -> np.ndarray:
+    """Wells of the 384-well plate filled from one deepwell row (0 for row A), over the filled columns."""
+    mask = np.zeros(shape, dtype=bool)
+    mask[2 * condition:2 * condition + 2, [column - 1 for column in columns]] = True
+    return mask
+
+
+@dataclass
+class PlateResult:
+    """Analysis of the reading of one 384-well plate."""
+
+    run_id: str
+    microplate_id: str
+    indicator_column: int
+    datapoint_id: str
+    read_time: float  # epoch seconds
+    readings: np.ndarray
+    threshold: float  # readings beyond it are positive (revertant) wells
+    conditions: List[Dict[str, Any]] = field(default_factory=list)  # one summary per deepwell row
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """One flat record per condition, as written to a ResultsStore."""
+        return [
+            {
+                "run_id": self.run_id,
+                "microplate_id": self.microplate_id,
+                "indicator_column": self.indicator_column,
+                "datapoint_id": self.datapoint_id,
+                "read_time": self.read_time,
+                "threshold": self.threshold,
+                **condition,
+            }
+            for condition in self.conditions
+        ]
+
+
+def analyze_plate(readings: np.ndarray, sigmas=3.0, increase=True, columns=FILLED_COLUMNS) -> tuple:
+    """analyze_plate
+
+    Description:
+        Counts the positive (revertant) wells of every condition. A well is
+        positive when its reading is more than sigmas standard deviations
+        beyond the mean of the negative control wells.
+
+    Args:
+        readings (np.ndarray): 16x24 readings, as returned by parse_hidex_reading
+        sigmas (float): distance of the threshold from the negative control mean
+        increase (bool): True if revertant wells read higher than the negative control
+        columns (list of int): 384-well plate columns filled from the indicator column analyzed
+
+    Returns:
+        threshold: (float) the positive well threshold
+        conditions: (list of dict) condition, wells, positive_wells, positive_fraction,
+            fold_over_negative and mean_reading of each deepwell row
+    """
+    negative = readings[condition_mask(CONDITIONS.index("negative_control"), readings.shape, columns)]
+    negative = negative[~np.isnan(negative)]
+    if negative.size == 0:
+        raise ValueError("No negative control readings, cannot set a positive well threshold")
+    spread = sigmas * float(np.std(negative))
+    threshold = float(np.mean(negative)) + (spread if increase else -spread)
+
+    counts = []
+    for index, condition in enumerate(CONDITIONS):
+        values = readings[condition_mask(index, readings.shape, columns)]
+        values = values[~np.isnan(values)]
+        positive = values > threshold if increase else values < threshold
+        counts.append(
+            {
+                "condition": condition,
+                "wells": int(values.size),
+                "positive_wells": int(np.count_nonzero(positive)),
+                "positive_fraction": float(np.mean(positive)) if values.size else float("nan"),
+                "mean_reading": float(np.mean(values)) if values.size else float("nan"),
+            }
+        )
+    baseline = max(counts[-1]["positive_wells"], 1)
+    for count in counts:
+        count["fold_over_negative"] = count["positive_wells"] / baseline
+    return threshold, counts
+
+
+class ResultsStore(RunPartitionedStore):
+    """Append only columnar store of plate results, one row per plate, indicator column and
+    condition, stored and queried like the readings (see rapid350.hidex_readings)."""
+
+    schema = pa.schema(
+        [
+            ("run_id", pa.string()),
+            ("microplate_id", pa.string()),
+            ("indicator_column", pa.int16()),
+            ("datapoint_id", pa.string()),
+            ("read_time", pa.timestamp("ms", tz="UTC")),
+            ("threshold", pa.float64()),
+            ("condition", pa.string()),
+            ("wells", pa.int32()),
+            ("positive_wells", pa.int32()),
+            ("positive_fraction", pa.float64()),
+            ("fold_over_negative", pa.float64()),
+            ("mean_reading", pa.float64()),
+        ]
+    )
+
+    def append(self, result: PlateResult) -> Path:
+        """Stores the rows of a plate in a new file, returned."""
+        rows = [
+            {**row, "read_time": datetime.fromtimestamp(row["read_time"], tz=timezone.utc)}
+            for row in result.rows()
+        ]
+        return self._write(
+            pa.Table.from_pylist(rows, schema=self.schema),
+            result.run_id,
+            f"{int(result.read_time * 1000)}-{result.microplate_id}-{result.indicator_column}",
+        )
+
+    def query(
+        self,
+        run_ids: Optional[Iterable[str]] = None,
+        microplate_ids: Optional[Iterable[str]] = None,
+        conditions: Optional[Iterable[str]] = None,
+        columns: Optional[List[str]] = None,
+    ) -> pa.Table:
+        """query
+
+        Description: Selects results, every filter left to None matches everything
+
+        Args:
+            run_ids (list of str): runs to select
+            microplate_ids (list of str): plates to select
+            conditions (list of str): conditions to select, e.g. ["negative_control"]
+            columns (list of str): columns to return (default: all)
+
+        Returns:
+            results: (pyarrow.Table) the selected results
+        """
+        return self._select(
+            {"run_id": run_ids, "microplate_id": microplate_ids, "condition": conditions}, columns=columns
+        )
+
+    def read(self) -> List[Dict[str, Any]]:
+        """All rows appended so far, in read order."""
+        return self.query().sort_by([("read_time", "ascending")]).to_pylist()
+
+
+class HidexIngestor:
+    """Fetches, analyzes and stores Hidex datapoints on a background thread, in the order they are submitted."""
+
+    def __init__(
+        self,
+        data_client,
+        store: ResultsStore,
+        readings_store: Optional[ReadingsStore] = None,
+        sigmas=3.0,
+        increase=True,
+        retries=3,
+        clock: Optional[Clock] = None,
+    ):
+        """
+        Args:
+            data_client (DataClient): client of the data server holding the hidex_data datapoints
+            store (ResultsStore): where plate results are stored
+            readings_store (ReadingsStore): optional store of the raw readings of every well
+            sigmas (float): positive well threshold, in negative control standard deviations
+            increase (bool): True if revertant wells read higher than the negative control
+            retries (int): attempts at fetching a datapoint before giving up on it
+            clock (Clock): clock of the read times and retry delays (default: the wall clock)
+        """
+        self.data_client = data_client
+        self.store = store
+        self.readings_store = readings_store
+        self.sigmas = sigmas
+        self.increase = increase
+        self.retries = retries
+        self.clock = clock or WallClock()
+        self.results: List[PlateResult] = []
+        self.failures: List[str] = []
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, datapoint_id: str, parameters: Dict[str, Any]) -> None:
+        """Queues the datapoint of a plate, read with the given plate parameters
+        (run_id, microplate_id, and plate_samples or current_indicator_column)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._work, name="hidex_ingestor", daemon=True)
+            self._thread.start()
+        self._queue.put((datapoint_id, dict(parameters), self.clock.time()))
+
+    def close(self) -> None:
+        """Waits for every queued datapoint to be processed."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _fetch(self, datapoint_id):
+        for attempt in range(self.retries):
+            try:
+                return self.data_client.get_datapoint_value(datapoint_id)
+            except Exception:
+                if attempt == self.retries - 1:
+                    raise
+                self.clock.sleep(2**attempt, f"retry of datapoint {datapoint_id}")
+
+    def _work(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            datapoint_id, parameters, read_time = item
+            try:
+                readings = parse_hidex_reading(self._fetch(datapoint_id), PLATE_384)
+                if self.readings_store is not None:
+                    self.readings_store.append(
+                        readings,
+                        parameters["run_id"],
+                        parameters["microplate_id"],
+                        read_time=read_time,
+                        datapoint_id=datapoint_id,
+                        label="hidex_data",
+                        source="ames_test",
+                    )
+                for sample in plate_samples(parameters):
+                    threshold, conditions = analyze_plate(
+                        readings, self.sigmas, self.increase, sample["plate_columns"]
+                    )
+                    result = PlateResult(
+                        run_id=parameters["run_id"],
+                        microplate_id=parameters["microplate_id"],
+                        indicator_column=sample["indicator_column"],
+                        datapoint_id=datapoint_id,
+                        read_time=read_time,
+                        readings=readings,
+                        threshold=threshold,
+                        conditions=conditions,
+                    )
+                    self.store.append(result)
+                    self.results.append(result)
+                    positives = {c["condition"]: c["positive_wells"] for c in conditions}
+                    print(
+                        f"Plate {result.microplate_id} of {result.run_id}, indicator column "
+                        f"{result.indicator_column}: positive wells {positives}"
+                    )
+            except Exception as error_msg:
+                # a plate that cannot be analyzed must not stop the reads of the others
+                self.failures.append(datapoint_id)
+                print(f"Could not analyze Hidex datapoint {datapoint_id}: {error_msg!r}")
@@ -0,0 +1,90 @@
+"""
+Up front generation of every SOLO protocol of an experiment.
+
+The liquidhandling library is pure Python, so generating a protocol is CPU
+bound. All the protocols of the runs are generated at once in a process pool
+before the first workflow is submitted: generation no longer sits between
+two robot moves, and a payload a protocol cannot handle fails the experiment
+before any plate is touched instead of hours into it.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from helper_functions.hso_cache import TrackingPayload
+
+from rapid350.hso_functions import render_hso
+
+
+@dataclass
+class HsoJob:
+    """One protocol to generate."""
+
+    name: str  # shown in error messages, e.g. "run_1 solo_temp1"
+    protocol: Callable[..., Any]  # a protocols.*.generate_hso_file
+    payload: Dict[str, Any]
+
+
+def _generate(protocol, payload):
+    """Runs in a worker process. Returns the .hso contents and the payload keys the protocol read."""
+    tracked = TrackingPayload(payload)
+    hso_contents = render_hso(protocol(payload=tracked, temp_file_path=None))
+    return hso_contents, sorted(tracked.read_keys, key=str), tracked.read_all
+
+
+def generate_hso_files(jobs: List[HsoJob], cache=None, max_workers: Optional[int] = None) -> List[str]:
+    """generate_hso_files
+
+    Description:
+        Generates the .hso contents of every job, the ones missing from the cache
+        concurrently in a process pool. Every job is attempted, and all the
+        failures are reported together.
+
+    Args:
+        jobs (list of HsoJob): protocols and payloads to generate
+        cache (HsoCache): optional cache of previously generated protocols, also
+            filled with the new ones
+        max_workers (int): number of worker processes (default: number of CPUs)
+
+    Returns:
+        hso_contents: (list of str) contents of each job's hso file, in the order of jobs
+
+    Raises:
+        ValueError: if any protocol could not be generated from its payload
+    """
+    # 1. Reuse cached protocols
+    contents: List[Optional[str]] = [
+        cache.get(job.protocol, job.payload) if cache is not None else None for job in jobs
+    ]
+    missing = [index for index, hso_contents in enumerate(contents) if hso_contents is None]
+
+    # 2. Generate the others in parallel
+    failures = []
+    if missing:
+        with ProcessPoolExecutor(max_workers=min(len(missing), max_workers or os.cpu_count() or 1)) as executor:
+            futures = {
+                index: executor.submit(_generate, jobs[index].protocol, dict(jobs[index].payload))
+                for index in missing
+            }
+            for index, future in futures.items():
+                job = jobs[index]
+                try:
+                    hso_contents, read_keys, read_all = future.result()
+                except Exception as error_msg:
+                    failures.append(f"{job.name} ({job.protocol.__module__}): {error_msg!r}")
+                    continue
+                contents[index] = hso_contents
+                if cache is not None:
+                    tracked = TrackingPayload(job.payload)
+                    tracked.read_keys, tracked.read_all = set(read_keys), read_all
+                    cache.put(job.protocol, tracked, hso_contents)
+
+    # 3. Validate: nothing is submitted unless every protocol could be generated
+    if failures:
+        raise ValueError(
+            f"Could not create {len(failures)} of {len(jobs)} hso files:\n" + "\n".join(failures)
+        )
+    print(f"Generated {len(jobs)} hso files ({len(jobs) - len(missing)} from cache)")
+    return contents
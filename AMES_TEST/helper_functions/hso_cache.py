@@ -0,0 +1,156 @@
+"""
+Persistent cache of generated SOLO protocols.
+
+Entries are keyed by a hash of the protocol module source and of the payload
+values the protocol actually reads. Run specific values it ignores (run IDs,
+Liconic plate IDs...) therefore do not cause a regeneration.
+"""
+
+import hashlib
+import inspect
+import json
+import sys
+from pathlib import Path
+
+from rapid350 import hso_functions
+from rapid350.disk_cache import DiskCache
+
+_MISSING = "<missing>"
+
+
+class TrackingPayload(dict):
+    """Payload dict that records which keys a protocol reads from it."""
+
+    def __init__(self, *args, **kwargs):
+        """Same arguments as dict."""
+        super().__init__(*args, **kwargs)
+        self.read_keys = set()
+        self.read_all = False
+
+    def __getitem__(self, key):
+        """Records key, then looks it up."""
+        self.read_keys.add(key)
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        """Records key, then looks it up."""
+        self.read_keys.add(key)
+        return super().get(key, default)
+
+    def __contains__(self, key):
+        """Records key, then checks for it."""
+        self.read_keys.add(key)
+        return super().__contains__(key)
+
+    def __iter__(self):
+        """Iterating exposes every key, so all of them count as read."""
+        self.read_all = True
+        return super().__iter__()
+
+    def keys(self):
+        """All keys count as read."""
+        self.read_all = True
+        return super().keys()
+
+    def values(self):
+        """All keys count as read."""
+        self.read_all = True
+        return super().values()
+
+    def items(self):
+        """All keys count as read."""
+        self.read_all = True
+        return super().items()
+
+
+def _source_modules(protocol_module):
+    """The protocol module, hso_functions, and the helper_functions and rapid350 modules the protocol uses."""
+    helpers = {hso_functions.__name__}
+    for value in vars(protocol_module).values():
+        name = value.__name__ if inspect.ismodule(value) else getattr(value, "__module__", None)
+        if isinstance(name, str) and name.startswith(("helper_functions.", "rapid350.")):
+            helpers.add(name)
+    return [protocol_module] + [sys.modules[name] for name in sorted(helpers)]
+
+
+def _sha256(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class HsoCache:
+    """Content-addressed, LRU evicted cache of .hso contents."""
+
+    def __init__(self, directory, max_bytes=256 * 2**20, max_entries=4096):
+        """
+        Args:
+            directory (str | Path): where cached protocols are stored
+            max_bytes (int): total size the cache is evicted down to
+            max_entries (int): number of cached protocols the cache is evicted down to
+        """
+        self.store = DiskCache(Path(directory), max_bytes=max_bytes, max_entries=max_entries)
+        self._fingerprints = {}
+
+    def fingerprint(self, create_hso_method):
+        """Hash of the protocol module source, of the helper modules it uses, and of what it
+        is rendered with."""
+        module_name = create_hso_method.__module__
+        if module_name not in self._fingerprints:
+            from importlib.metadata import (  # slow to import, rarely needed
+                PackageNotFoundError,
+                version,
+            )
+
+            try:
+                liquidhandling_version = version("liquidhandling")
+            except PackageNotFoundError:
+                liquidhandling_version = "unknown"
+            self._fingerprints[module_name] = _sha256(
+                *(inspect.getsource(module) for module in _source_modules(sys.modules[module_name])),
+                create_hso_method.__qualname__,
+                liquidhandling_version,
+            )
+        return self._fingerprints[module_name]
+
+    def _read_keys(self, fingerprint):
+        keys = self.store.get(f"keys-{fingerprint}")
+        return None if keys is None else json.loads(keys)
+
+    def _key(self, fingerprint, payload, read_keys):
+        if read_keys == "*":
+            selected = dict(payload)
+        else:
+            selected = {key: payload.get(key, _MISSING) for key in read_keys}
+        normalized = json.dumps(selected, sort_keys=True, default=str)
+        return f"hso-{_sha256(fingerprint, json.dumps(read_keys), normalized)}"
+
+    def get(self, create_hso_method, payload):
+        """Returns the cached .hso contents for the protocol and payload, or None."""
+        fingerprint = self.fingerprint(create_hso_method)
+        read_keys = self._read_keys(fingerprint)
+        if read_keys is None:
+            return None
+        hso_contents = self.store.get(self._key(fingerprint, payload, read_keys))
+        return None if hso_contents is None else hso_contents.decode()
+
+    def track(self, payload):
+        """Wraps a payload so the keys read while generating a protocol are recorded."""
+        return TrackingPayload(payload)
+
+    def put(self, create_hso_method, tracked_payload, hso_contents):
+        """Stores .hso contents generated from a payload wrapped with track."""
+        fingerprint = self.fingerprint(create_hso_method)
+        known_keys = self._read_keys(fingerprint)
+        if tracked_payload.read_all or known_keys == "*":
+            read_keys = "*"
+        else:
+            # a protocol may read different keys for different payloads, keep the union
+            read_keys = sorted(set(known_keys or []) | tracked_payload.read_keys)
+        if read_keys != known_keys:
+            self.store.put(f"keys-{fingerprint}", json.dumps(read_keys).encode())
+        self.store.put(
+            self._key(fingerprint, tracked_payload, read_keys), hso_contents.encode()
+        )
@@ -0,0 +1,187 @@
+"""
+Timer-driven incubation deadlines for the experiment applications.
+
+Deadlines are persisted to a small JSON state file so that an experiment
+application restarted in the middle of an incubation keeps the original due
+times (and can fire them on time) instead of restarting the count down.
+"""
+
+import json
+import os
+import threading
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from rapid350.clock import Clock, WallClock
+
+
+@dataclass
+class Deadline:
+    """An incubation deadline for a single plate."""
+
+    name: str
+    due: float  # epoch seconds
+    payload: Dict[str, Any] = field(default_factory=dict)
+
+    def remaining(self, now: float) -> float:
+        """Seconds left until the deadline is due (never negative)."""
+        return max(0.0, self.due - now)
+
+
+class IncubationScheduler:
+    """Records incubation deadlines and runs deferred work while they count down.
+
+    Safe to share between threads, e.g. one per run in a RunPipeline.
+    """
+
+    def __init__(
+        self,
+        state_file,
+        poll_interval: float = 30.0,
+        clock: Optional[Clock] = None,
+    ):
+        """
+        Args:
+            state_file (str | Path): JSON file the deadlines are persisted to
+            poll_interval (float): longest single sleep while waiting on a deadline, in seconds
+            clock (Clock): clock the deadlines are counted on, which records every wait
+                (default: the wall clock)
+        """
+        self.state_file = Path(state_file)
+        self.poll_interval = poll_interval
+        self.clock = clock or WallClock()
+        self._lock = threading.RLock()
+        self._idle_tasks: Deque[Tuple[Callable[[], Any], float]] = deque()
+        self._deadlines: Dict[str, Deadline] = self._load()
+
+    def _load(self) -> Dict[str, Deadline]:
+        if not self.state_file.exists():
+            return {}
+        with open(self.state_file, "r") as state:
+            records = json.load(state)
+        return {record["name"]: Deadline(**record) for record in records}
+
+    def _save(self) -> None:
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.state_file.with_suffix(self.state_file.suffix + ".tmp")
+        with open(temp_path, "w") as state:
+            json.dump([asdict(deadline) for deadline in self.pending()], state, indent=2)
+        os.replace(temp_path, self.state_file)  # atomic, a crash never leaves half a file
+
+    def schedule(
+        self, name: str, duration: float, payload: Optional[Dict[str, Any]] = None
+    ) -> Deadline:
+        """schedule
+
+        Description:
+            Starts an incubation count down. If a deadline with the same name is
+            already persisted (e.g. the app was restarted), its original due time is kept.
+
+        Args:
+            name (str): unique name of the deadline, e.g. "microplate_2"
+            duration (float): incubation time in seconds, counted from now
+            payload (dict): JSON serializable data needed to act on the deadline when it fires
+
+        Returns:
+            Deadline: the (possibly pre-existing) deadline
+        """
+        with self._lock:
+            if name not in self._deadlines:
+                self._deadlines[name] = Deadline(
+                    name=name, due=self.clock.deadline(duration), payload=dict(payload or {})
+                )
+                self._save()
+            return self._deadlines[name]
+
+    def pending(self, names: Optional[Iterable[str]] = None) -> List[Deadline]:
+        """Pending deadlines ordered by due time, optionally restricted to the given names."""
+        with self._lock:
+            deadlines = list(self._deadlines.values())
+        if names is not None:
+            names = set(names)
+            deadlines = [d for d in deadlines if d.name in names]
+        return sorted(deadlines, key=lambda d: d.due)
+
+    def is_due(self, name: str) -> bool:
+        """True if the named deadline has passed."""
+        return self.clock.remaining(self._deadlines[name].due) <= 0
+
+    def complete(self, name: str) -> None:
+        """Removes a deadline once the work it was waiting on has been done."""
+        with self._lock:
+            if self._deadlines.pop(name, None) is not None:
+                self._save()
+
+    def defer(self, task: Callable[[], Any], estimated_duration: float = 0.0) -> None:
+        """defer
+
+        Description:
+            Queues work to be run while waiting on a deadline. A task is only started
+            if it is expected to finish before the next deadline is due. A task that
+            cannot do its work yet, e.g. because its instruments are busy, returns
+            False (and may defer itself again): the wait then sleeps before the next try.
+
+        Args:
+            task (callable): function taking no arguments
+            estimated_duration (float): expected run time of the task in seconds
+        """
+        with self._lock:
+            self._idle_tasks.append((task, estimated_duration))
+
+    def _run_idle_task(self, remaining: float) -> bool:
+        with self._lock:
+            for _ in range(len(self._idle_tasks)):
+                task, estimated_duration = self._idle_tasks.popleft()
+                if estimated_duration <= remaining:
+                    break
+                self._idle_tasks.append((task, estimated_duration))
+            else:
+                return False
+        return task() is not False
+
+    def wait_for(self, name: str, stop: Optional[threading.Event] = None) -> Deadline:
+        """wait_for
+
+        Description:
+            Blocks until the named deadline is due, running deferred work in the meantime.
+
+        Args:
+            name (str): name of a scheduled deadline
+            stop (threading.Event): ends the wait early once set, e.g. when the app is interrupted
+
+        Returns:
+            Deadline: the deadline, due unless stop was set
+        """
+        deadline = self._deadlines[name]
+        self.clock.wait_until(deadline.due, name, self.poll_interval, idle=self._run_idle_task, stop=stop)
+        return deadline
+
+    def run_due(
+        self,
+        handler: Callable[[Deadline], Any],
+        names: Optional[Iterable[str]] = None,
+    ) -> None:
+        """run_due
+
+        Description:
+            Fires deadlines in due order until none are pending. The handler may
+            schedule further deadlines, which are picked up by the same loop. A
+            deadline is only completed once its handler returns, so a restart during
+            the handler fires it again.
+
+        Args:
+            handler (callable): called with each Deadline once it is due
+            names (iterable of str): only fire these deadlines (default: all)
+        """
+        names = None if names is None else set(names)
+        while True:
+            upcoming = [
+                d for d in self.pending() if names is None or d.name in names
+            ]
+            if not upcoming:
+                return
+            deadline = self.wait_for(upcoming[0].name)
+            handler(deadline)
+            self.complete(deadline.name)
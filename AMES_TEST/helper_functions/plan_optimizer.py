@@ -0,0 +1,196 @@
+"""
+Optimizer pass over TransferPlans, run before SoloSoft steps are emitted.
+
+The passes only change a plan where the liquid handled cannot differ:
+
+- drop_redundant_tip_swaps: a shuckTip/getTip pair is removed when the tips
+  have only held the liquid the next transfer aspirates, and never touched
+  destination liquid (no mixing at dispense).
+- merge_dispenses: consecutive transfers aspirating the same wells with the
+  same settings, each dispensing exactly what it aspirated without mixing,
+  are pooled and their dispenses regrouped under as few aspirates as the tip
+  capacity allows, ordered by destination to keep head travel short.
+
+Every well receives the same volumes as in the hand written plan.
+"""
+
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from helper_functions.transfer_plan import Step, TransferPlan
+
+# Volume of the TipBox.180uL.Axygen-EVF-180-R-S tips used by the AMES protocols (uL per tip)
+TIP_CAPACITY = 180
+
+Wells = FrozenSet[Tuple[int, int]]
+
+
+def _volumes(step: Step) -> Optional[List[list]]:
+    return step.kwargs.get("aspirate_volumes" if step.method == "aspirate" else "dispense_volumes")
+
+
+def _wells(volumes) -> Wells:
+    return frozenset(
+        (row, column)
+        for row, values in enumerate(volumes)
+        for column, value in enumerate(values)
+        if value
+    )
+
+
+def _per_tip_volume(volumes):
+    """Volume each tip handles, or None if the wells do not all get the same volume."""
+    values = {value for row in volumes for value in row if value}
+    return values.pop() if len(values) == 1 else None
+
+
+def _source(step: Step) -> Tuple[str, Wells]:
+    return step.kwargs.get("position", "Position1"), _wells(_volumes(step))
+
+
+def _settings(step: Step) -> Dict[str, Any]:
+    """Everything about a step except its volumes."""
+    return {
+        key: value
+        for key, value in step.kwargs.items()
+        if key not in ("aspirate_volumes", "dispense_volumes")
+    }
+
+
+def _mixes(step: Step) -> bool:
+    return step.method == "dispense" and bool(step.kwargs.get("mix_at_finish"))
+
+
+def _sum(volumes):
+    total = sum(volumes)
+    return round(total, 6) if isinstance(total, float) else total
+
+
+def drop_redundant_tip_swaps(plan: TransferPlan) -> TransferPlan:
+    """Removes tip swaps between transfers of a single liquid."""
+    steps = plan.steps
+    kept: List[Step] = []
+    sources = set()  # sources aspirated with the current tips
+    contacted = False  # the current tips touched another liquid
+    tip: Optional[Step] = None
+    index = 0
+    while index < len(steps):
+        step = steps[index]
+        if (
+            step.method == "shuckTip"
+            and tip is not None
+            and not contacted
+            and index + 1 < len(steps)
+            and steps[index + 1].method == "getTip"
+            and steps[index + 1].args == tip.args
+            and steps[index + 1].kwargs == tip.kwargs
+        ):
+            following = next(
+                (s for s in steps[index + 2:] if s.method in ("aspirate", "getTip", "shuckTip")), None
+            )
+            if following is not None and following.method == "aspirate" and sources == {_source(following)}:
+                index += 2  # keep the tips
+                continue
+        if step.method == "getTip":
+            tip, sources, contacted = step, set(), False
+        elif step.method == "shuckTip":
+            tip = None
+        elif step.method == "aspirate":
+            sources.add(_source(step))
+        elif _mixes(step):
+            contacted = True
+        kept.append(step)
+        index += 1
+    return TransferPlan(kept)
+
+
+def _mergeable(group: List[Step]) -> bool:
+    aspirate, dispenses = group[0], group[1:]
+    if aspirate.method != "aspirate" or not dispenses or aspirate.args:
+        return False
+    volume = _per_tip_volume(_volumes(aspirate))
+    dispensed = [_per_tip_volume(_volumes(step)) for step in dispenses]
+    if volume is None or None in dispensed or _sum(dispensed) != volume:
+        return False
+    position = aspirate.kwargs.get("position", "Position1")
+    return not any(
+        _mixes(step) or step.args or step.kwargs.get("position", "Position1") == position
+        for step in dispenses
+    )
+
+
+def _same_aspirate(first: Step, second: Step) -> bool:
+    return _source(first) == _source(second) and _settings(first) == _settings(second)
+
+
+def _destination_order(step: Step):
+    wells = _wells(_volumes(step))
+    return (
+        step.kwargs.get("position", "Position1"),
+        min(column for _, column in wells),
+        min(row for row, _ in wells),
+    )
+
+
+def _regroup(run: List[List[Step]], tip_capacity) -> List[List[Step]]:
+    aspirate = run[0][0]
+    dispenses = sorted(
+        (step for group in run for step in group[1:]), key=_destination_order
+    )
+    groups: List[List[Step]] = []
+    volumes: List[Any] = []
+    for dispense in dispenses:
+        volume = _per_tip_volume(_volumes(dispense))
+        if groups and _sum(volumes[-1] + [volume]) <= tip_capacity:
+            groups[-1].append(dispense)
+            volumes[-1].append(volume)
+        else:
+            groups.append([dispense])
+            volumes.append([volume])
+    regrouped = []
+    for group, group_volumes in zip(groups, volumes):
+        total = _sum(group_volumes)
+        aspirate_volumes = [[total if value else 0 for value in row] for row in _volumes(aspirate)]
+        regrouped.append([Step("aspirate", (), {**aspirate.kwargs, "aspirate_volumes": aspirate_volumes}), *group])
+    return regrouped
+
+
+def merge_dispenses(plan: TransferPlan, tip_capacity=TIP_CAPACITY) -> TransferPlan:
+    """Pools runs of identical transfers into as few aspirates as the tips can hold."""
+    steps: List[Step] = []
+    run: List[List[Step]] = []
+
+    def flush():
+        if len(run) > 1:
+            for group in _regroup(run, tip_capacity):
+                steps.extend(group)
+        else:
+            for group in run:
+                steps.extend(group)
+        run.clear()
+
+    for group in plan.transfers():
+        if _mergeable(group) and (not run or _same_aspirate(run[0][0], group[0])):
+            run.append(group)
+            continue
+        flush()
+        if _mergeable(group):
+            run.append(group)
+        else:
+            steps.extend(group)
+    flush()
+    return TransferPlan(steps)
+
+
+def optimize(plan: TransferPlan, tip_capacity=TIP_CAPACITY) -> TransferPlan:
+    """optimize
+
+    Description: Runs all the optimizer passes over a plan
+
+    Args:
+        plan (TransferPlan): steps as written by a protocol
+        tip_capacity (float): volume a tip holds, in uL
+
+    Returns:
+        TransferPlan: equivalent plan with fewer steps, tips and head moves
+    """
+    return merge_dispenses(drop_redundant_tip_swaps(plan), tip_capacity)
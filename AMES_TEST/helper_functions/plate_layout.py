@@ -0,0 +1,184 @@
+"""
+Samples of a run and where they go on its plates.
+
+A sample is one test compound taken through one exposure/indicator group: it
+is diluted in a column of the dilution plate (Position3), exposed to the
+cells in an exposure column of the 48-well deepwell (Position1), moved into
+the indicator column of the same group, then dispensed into columns of a
+384-well plate. The deepwell holds three groups: exposure columns 1-3 and
+indicator columns 4-6.
+
+By default a run tests a single compound in three replicates, one per group,
+and each replicate fills a 384-well plate of its own (FILLED_COLUMNS, 36
+wells per condition). pack_samples fits more compounds in the same deepwell,
+384-well plates and Liconic slots:
+
+- a run can test up to three compounds with fewer replicates, each compound
+  diluted in its own column of the dilution plate
+- a 384-well plate can hold the indicator columns of two or three samples
+  side by side (12 or 8 columns each, 24 or 16 wells per condition)
+
+The samples of a run are given in its "samples" parameter, a list of dicts
+(test_stock_row, test_stock_column, dilution_column, exposure_column,
+indicator_column, microplate, plate_columns), read by the SOLO protocols
+through the functions below and by the plate analysis.
+"""
+
+from typing import Any, Dict, List, Tuple
+
+from helper_functions.well_maps import PLATE_384
+from protocols.dispense_into_384_plate import FILLED_COLUMNS
+
+# (exposure column, indicator column) of each group of the 48-well deepwell
+EXPOSURE_GROUPS = [(1, 4), (2, 5), (3, 6)]
+
+
+def compound_groups(index: int, replicates: int) -> List[Tuple[int, int]]:
+    """The exposure/indicator groups of the index-th compound of a run (from 0)."""
+    return EXPOSURE_GROUPS[index * replicates:(index + 1) * replicates]
+
+
+def sample_plate_columns(samples_per_plate: int, index: int) -> List[int]:
+    """Columns of a 384-well plate filled by the index-th of the samples_per_plate samples it holds."""
+    if samples_per_plate == 1:
+        return list(FILLED_COLUMNS)
+    width = PLATE_384[1] // samples_per_plate
+    return list(range(index * width + 1, (index + 1) * width + 1))
+
+
+def pack_samples(compounds: List[Dict[str, Any]], replicates: int = len(EXPOSURE_GROUPS), samples_per_plate: int = 1) -> List[Dict[str, Any]]:
+    """pack_samples
+
+    Description:
+        Assigns the compounds of a run to the exposure/indicator groups of the
+        deepwell, in order, and the samples to 384-well plate columns
+
+    Args:
+        compounds (list of dict): test_stock_row, test_stock_column and dilution_column of each
+            compound of the run, each compound in its own dilution column
+        replicates (int): groups, and 384-well plate fills, per compound
+        samples_per_plate (int): samples sharing a 384-well plate, 1-3
+
+    Returns:
+        samples: (list of dict) the samples of the run, as its "samples" parameter
+
+    Raises:
+        ValueError: if the compounds need more groups than the deepwell holds, or
+            samples_per_plate is outside 1-3
+    """
+    if samples_per_plate not in range(1, len(EXPOSURE_GROUPS) + 1):
+        raise ValueError(f"samples_per_plate must be in the range 1-{len(EXPOSURE_GROUPS)}, not {samples_per_plate}")
+    if replicates < 1 or len(compounds) * replicates > len(EXPOSURE_GROUPS):
+        raise ValueError(
+            f"{len(compounds)} compounds of {replicates} replicates do not fit in the "
+            f"{len(EXPOSURE_GROUPS)} exposure/indicator groups of the deepwell"
+        )
+
+    samples = []
+    for index, compound in enumerate(compounds):
+        for exposure_column, indicator_column in compound_groups(index, replicates):
+            microplate, position = divmod(len(samples), samples_per_plate)
+            samples.append(
+                {
+                    **compound,
+                    "exposure_column": exposure_column,
+                    "indicator_column": indicator_column,
+                    "microplate": microplate,  # index in the run's microplate_ids
+                    "plate_columns": sample_plate_columns(samples_per_plate, position),
+                }
+            )
+    return samples
+
+
+def run_samples(parameters) -> List[Dict[str, Any]]:
+    """The samples of a run: its "samples" parameter, by default its compound in every group."""
+    samples = parameters.get("samples")
+    if samples:
+        return samples
+    return pack_samples([{"dilution_column": parameters.get("dilution_column", 1)}])
+
+
+def dilution_columns(parameters) -> List[int]:
+    """The dilution plate columns used by a run, in order."""
+    samples = parameters.get("samples")
+    if samples:
+        return list(dict.fromkeys(sample["dilution_column"] for sample in samples))
+    return [parameters.get("dilution_column", 1)]
+
+
+def dilutions(parameters) -> List[Dict[str, Any]]:
+    """The test compound stock well (test_stock_row, test_stock_column) of every dilution column of a run."""
+    samples = parameters.get("samples")
+    if not samples:
+        samples = [
+            {
+                "test_stock_row": parameters.get("test_stock_row", "A"),
+                "test_stock_column": parameters.get("test_stock_column", 3),
+                "dilution_column": parameters.get("dilution_column", 1),
+            }
+        ]
+    by_column = {}
+    for sample in samples:
+        by_column.setdefault(sample["dilution_column"], sample)
+    return [
+        {key: sample[key] for key in ("test_stock_row", "test_stock_column", "dilution_column")}
+        for sample in by_column.values()
+    ]
+
+
+def exposure_groups(parameters) -> List[Tuple[int, int]]:
+    """The (exposure column, indicator column) of every sample of a run."""
+    samples = parameters.get("samples")
+    if samples:
+        return [(sample["exposure_column"], sample["indicator_column"]) for sample in samples]
+    return list(EXPOSURE_GROUPS)
+
+
+def microplates(parameters) -> List[Dict[str, Any]]:
+    """microplates
+
+    Description:
+        The parameters of every 384-well plate of a run: its microplate_id,
+        the samples it holds (plate_samples) and the indicator column of its
+        first sample (current_indicator_column)
+
+    Args:
+        parameters (dict): parameters of the run, as built by AmesRuns.run_parameters
+
+    Returns:
+        plates: (list of dict) run parameters of each plate, in fill order
+
+    Raises:
+        ValueError: if the samples need more plates than the run's microplate_ids
+    """
+    samples = run_samples(parameters)
+    count = max(sample["microplate"] for sample in samples) + 1
+    if count > len(parameters["microplate_ids"]):
+        raise ValueError(
+            f"The samples of {parameters['run_id']} fill {count} 384-well plates, "
+            f"but the run only has {len(parameters['microplate_ids'])} microplate_ids"
+        )
+    plates = []
+    for index, microplate_id in enumerate(parameters["microplate_ids"][:count]):
+        plate_samples = [
+            {"indicator_column": sample["indicator_column"], "plate_columns": sample["plate_columns"]}
+            for sample in samples
+            if sample["microplate"] == index
+        ]
+        plates.append(
+            {
+                **parameters,
+                "microplate_id": microplate_id,
+                "current_indicator_column": plate_samples[0]["indicator_column"],
+                "plate_samples": plate_samples,
+            }
+        )
+    return plates
+
+
+def plate_samples(parameters) -> List[Dict[str, Any]]:
+    """The indicator_column and plate_columns of every sample of a 384-well plate, from its parameters.
+    Plates without plate_samples (e.g. deadlines saved by older versions) hold their current_indicator_column."""
+    return parameters.get("plate_samples") or [
+        {"indicator_column": parameters["current_indicator_column"], "plate_columns": list(FILLED_COLUMNS)}
+    ]
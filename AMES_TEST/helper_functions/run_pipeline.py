@@ -0,0 +1,789 @@
+"""
+Pipelines several experiment runs on one workcell.
+
+Each run is a list of stages executed in order on its own thread. Workflow
+submissions lock the workcell nodes used by their workflow YAML, so two runs
+never interleave steps on the same instrument, and runs can hold deck
+positions (e.g. "Solo.Position1") across several submissions. Incubations
+hold nothing, which lets the next run use the SOLO while a plate sits in the
+Liconic. A Submit can also run in the background of its run, e.g. to unload
+the next plate from the Liconic while the current plate is read; the run
+goes on with its next stages and a Join waits for the background workflow.
+A Prompt waits for the operator, e.g. to load labware no workflow fetches;
+one run at a time prompts the operator.
+
+When a workflow fails or is cancelled, the operator is asked whether to retry
+it from one of its steps, as WorkcellClient.submit_workflow does with
+prompt_on_error. If they do not, only the run owning the workflow stops and
+gives back its resources; the other runs go on, and the error is raised once
+they are done.
+
+The work that follows an incubation is time critical. A run starting with an
+Admit reserves the deck positions it holds around its incubation, e.g. from
+the time the incubation is due until its plates are filled, and runs are
+admitted one after the other: a run only starts once none of its periods on
+the positions overlaps those of the runs admitted before it, so its
+incubation does not overrun while an earlier run holds the positions.
+
+Workflows are submitted through an AsyncWorkcell, so all runs share one
+status poller. Every SOLO protocol of the runs is generated (in a process
+pool) and validated before the first submission; with pregeneration turned
+off, a run generates the protocol of its next submission while the current
+workflow executes. Given a WorkflowTimeline, the pipeline records every
+workflow, step and incubation of the runs on it.
+
+Given a TipInventory, the pipeline counts the tips taken by every SOLO
+protocol and refills a tip box only when the next protocol would run out of
+tips. While a run waits on an incubation, the tips needed by its stages after
+the incubation are checked, and a missing refill is done in that idle time
+instead of delaying the time critical work that follows. Such a refill never
+waits on nodes held by other runs: it tries again later in the wait, and is
+left to the next protocol once the incubation no longer leaves it time.
+"""
+
+import asyncio
+import datetime
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from functools import lru_cache
+from itertools import count
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import yaml
+from helper_functions.hso_batch import HsoJob, generate_hso_files
+from helper_functions.tip_inventory import Pickup, tip_pickups
+from madsci.common.exceptions import WorkflowFailedError
+
+from rapid350.async_workcell import AsyncWorkcell
+from rapid350.hso_functions import package_hso, staged_hso
+
+# Lower numbers win when runs compete for the same resources. Work that follows
+# an incubation is time critical, new preparations can wait.
+PRIORITY_TIME_CRITICAL = 0
+PRIORITY_PREPARATION = 1
+
+# libyaml's loader when PyYAML was built with it, several times faster than the pure Python one
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+@lru_cache(maxsize=None)
+def workflow_nodes(workflow_path) -> FrozenSet[str]:
+    """Names of the workcell nodes used by the steps of a workflow YAML."""
+    with open(workflow_path, "r") as workflow_file:
+        workflow = yaml.load(workflow_file, Loader=YAML_LOADER)
+    return frozenset(step["node"] for step in workflow.get("steps") or [] if step.get("node"))
+
+
+@dataclass
+class Submit:
+    """Submit a workflow, optionally generating its SOLO protocol file first."""
+
+    name: str
+    workflow: Path
+    json_inputs: Dict[str, Any] = field(default_factory=dict)
+    protocol: Optional[Callable[..., Any]] = None  # a protocols.*.generate_hso_file
+    payload: Dict[str, Any] = field(default_factory=dict)
+    on_complete: Optional[Callable[[Any], Any]] = None  # called with the finished Workflow
+    background: bool = False  # the run goes on with its next stages, see Join
+
+
+@dataclass
+class Acquire:
+    """Hold resources (deck positions, plates) until a matching Release."""
+
+    resources: List[str]
+    priority: int = PRIORITY_PREPARATION
+
+
+@dataclass
+class Release:
+    """Give back resources taken by an Acquire."""
+
+    resources: List[str]
+
+
+@dataclass
+class Incubate:
+    """Start an incubation deadline without blocking the run."""
+
+    name: str
+    seconds: float
+    payload: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class Await:
+    """Block the run until an incubation deadline is due.
+
+    The deadline is completed once the next workflow submission of the run
+    (the one taking the plate out of the incubator) has finished.
+    """
+
+    name: str
+
+
+@dataclass
+class Join:
+    """Block the run until a Submit of the run running in the background has finished."""
+
+    name: str
+
+
+@dataclass
+class Admit:
+    """Hold back the start of a run until the resources are free when it needs them.
+
+    The run holds the resources in periods around the due time of its
+    incubation deadline, which is expected lead seconds after the Admit. A run
+    is admitted once the periods of the runs admitted before it are fixed by
+    their Incubate, and starts when none of its periods overlaps theirs.
+    """
+
+    deadline: str
+    resources: List[str]
+    lead: float  # expected seconds from the Admit to the due time of the deadline
+    holds: List[Tuple[float, float]]  # (start, end) of every period the resources are held, in seconds from the due time
+
+
+@dataclass
+class Prompt:
+    """Block the run until the operator has done something, e.g. loaded a plate."""
+
+    message: str
+
+
+Stage = Union[Submit, Acquire, Release, Incubate, Await, Join, Admit, Prompt]
+
+
+@dataclass
+class RunPlan:
+    """The ordered stages of one experiment run."""
+
+    run_id: str
+    stages: List[Stage]
+
+
+def _offset(seconds: float) -> str:
+    return f"{'-' if seconds < 0 else '+'}{datetime.timedelta(seconds=round(abs(seconds)))}"
+
+
+def format_plan(plan: RunPlan) -> str:
+    """The stages of a run as text, one numbered line per stage."""
+    lines = [f"{plan.run_id}:"]
+    for number, stage in enumerate(plan.stages, start=1):
+        if isinstance(stage, Submit):
+            nodes = ", ".join(sorted(workflow_nodes(stage.workflow)))
+            line = f"submit {stage.name}: {Path(stage.workflow).name} on {nodes or 'no node'}"
+            if stage.protocol is not None:
+                line += f", SOLO protocol {stage.protocol.__module__}"
+            if stage.background:
+                line += " (background)"
+        elif isinstance(stage, Acquire):
+            priority = " (time critical)" if stage.priority == PRIORITY_TIME_CRITICAL else ""
+            line = f"acquire {', '.join(stage.resources)}{priority}"
+        elif isinstance(stage, Release):
+            line = f"release {', '.join(stage.resources)}"
+        elif isinstance(stage, Incubate):
+            line = f"incubate {stage.name} for {datetime.timedelta(seconds=stage.seconds)}"
+        elif isinstance(stage, Join):
+            line = f"join {stage.name}"
+        elif isinstance(stage, Prompt):
+            line = f"prompt the operator: {stage.message}"
+        elif isinstance(stage, Admit):
+            periods = ", ".join(f"{_offset(start)} to {_offset(end)}" for start, end in stage.holds)
+            line = (
+                f"admit when {', '.join(stage.resources)} are free {periods} of {stage.deadline}, "
+                f"due in {datetime.timedelta(seconds=round(stage.lead))}"
+            )
+        else:
+            line = f"await {stage.name}"
+        lines.append(f"  {number:>3}. {line}")
+    return "\n".join(lines)
+
+
+class PipelineStopped(Exception):
+    """Ends a run blocked on the workcell when the pipeline is stopped, e.g. by Ctrl-C."""
+
+
+class ResourceManager:
+    """Grants exclusive holds on named resources, highest priority first.
+
+    A request is granted as soon as all its resources are free and no waiting
+    request with a better (priority, arrival) rank needs any of them, so
+    non-conflicting requests can overtake a blocked one.
+    """
+
+    def __init__(self):
+        """Creates a manager with no resources held."""
+        self._condition = threading.Condition()
+        self._held: Dict[str, str] = {}  # resource -> holder
+        self._waiting: List[tuple] = []
+        self._arrivals = count()
+
+    def acquire(
+        self,
+        resources: Iterable[str],
+        holder: str,
+        priority: int = PRIORITY_PREPARATION,
+        stop: Optional[threading.Event] = None,
+    ) -> bool:
+        """Blocks until all resources can be held by holder, or until stop is set (see wake),
+        returns whether they are held."""
+        resources = frozenset(resources)
+        request = (priority, next(self._arrivals), resources)
+        with self._condition:
+            self._waiting.append(request)
+            self._condition.wait_for(
+                lambda: (stop is not None and stop.is_set()) or self._grantable(request, holder)
+            )
+            self._waiting.remove(request)
+            if stop is not None and stop.is_set():
+                self._condition.notify_all()  # requests queued behind this one may be grantable now
+                return False
+            for resource in resources:
+                self._held[resource] = holder
+            return True
+
+    def wake(self) -> None:
+        """Wakes the blocked acquires, e.g. to check their stop event."""
+        with self._condition:
+            self._condition.notify_all()
+
+    def try_acquire(self, resources: Iterable[str], holder: str, priority: int = PRIORITY_PREPARATION) -> bool:
+        """Holds the resources for holder if they can be granted right away, returns False (holding nothing) otherwise."""
+        resources = frozenset(resources)
+        with self._condition:
+            if not self._grantable((priority, next(self._arrivals), resources), holder):
+                return False
+            for resource in resources:
+                self._held[resource] = holder
+            return True
+
+    def _grantable(self, request, holder) -> bool:
+        resources = request[2]
+        if any(self._held.get(r, holder) != holder for r in resources):
+            return False
+        return not any(
+            other[:2] < request[:2] and other[2] & resources for other in self._waiting
+        )
+
+    def release(self, resources: Iterable[str], holder: str) -> None:
+        """Gives back resources held by holder."""
+        with self._condition:
+            for resource in resources:
+                if self._held.get(resource) == holder:
+                    del self._held[resource]
+            self._condition.notify_all()
+
+    def release_all(self, holder: str) -> None:
+        """Gives back every resource held by holder."""
+        with self._condition:
+            self.release([r for r, h in self._held.items() if h == holder], holder)
+
+    @contextmanager
+    def hold(
+        self,
+        resources: Iterable[str],
+        holder: str,
+        priority: int = PRIORITY_PREPARATION,
+        stop: Optional[threading.Event] = None,
+    ):
+        """Holds the resources not already held by holder for the duration of the block.
+        Raises PipelineStopped if stop is set before they are held."""
+        with self._condition:
+            new = [r for r in resources if self._held.get(r) != holder]
+        if not self.acquire(new, holder, priority, stop):
+            raise PipelineStopped(f"{holder} stopped while waiting for {', '.join(new)}")
+        try:
+            yield
+        finally:
+            self.release(new, holder)
+
+
+class AdmissionControl:
+    """Reserves the periods the runs hold resources around their incubations, see Admit.
+
+    Not thread safe on its own, shared by the RunPipeline (under a lock) and
+    the workcell simulator.
+    """
+
+    def __init__(self):
+        """Creates an admission control with no period reserved."""
+        self._holds: List[tuple] = []  # (resources, start, end) of every fixed period, in epoch seconds
+        self._pending: Optional[tuple] = None  # (holder, Admit) of the run whose periods are not fixed yet
+
+    def reserve(self, stage: Admit, holder: Any, now: float) -> Optional[float]:
+        """reserve
+
+        Description:
+            Admits the run of holder at the earliest time none of its periods
+            overlaps the periods fixed on the same resources
+
+        Args:
+            stage (Admit): the Admit of the run
+            holder: the run, as passed to fix and cancel
+            now (float): current time, in epoch seconds
+
+        Returns:
+            wait: (float) seconds the run waits before starting, or None while the
+                periods of the run admitted before are not fixed (try again after they are)
+        """
+        if self._pending is not None:
+            return None
+        self._pending = (holder, stage)
+        resources = frozenset(stage.resources)
+        taken = [(start, end) for held, start, end in self._holds if held & resources]
+        due = now + stage.lead
+
+        def overlaps(wait):
+            return any(
+                due + wait + start < taken_end and taken_start < due + wait + end
+                for start, end in stage.holds
+                for taken_start, taken_end in taken
+            )
+
+        # a period can only start at the end of a taken one, the latest such start overlaps nothing
+        waits = {0.0} | {taken_end - due - start for start, _ in stage.holds for _, taken_end in taken}
+        return next(wait for wait in sorted(waits) if wait >= 0 and not overlaps(wait))
+
+    def fix(self, name: str, due: float, holder: Any) -> bool:
+        """Fixes the periods of holder once its incubation name is scheduled, returns True if the next run can be admitted."""
+        if self._pending is None or self._pending[0] != holder or self._pending[1].deadline != name:
+            return False
+        stage = self._pending[1]
+        resources = frozenset(stage.resources)
+        self._holds += [(resources, due + start, due + end) for start, end in stage.holds]
+        self._pending = None
+        return True
+
+    def cancel(self, holder: Any) -> bool:
+        """Drops the reservation of a run ending before its periods are fixed, returns True if the next run can be admitted."""
+        if self._pending is None or self._pending[0] != holder:
+            return False
+        self._pending = None
+        return True
+
+
+def console_prompt(message: str) -> None:
+    """Waits for the operator to press Enter on the console."""
+    input(f"{message}, then press Enter to continue...")
+
+
+def console_recovery(message: str, workflow) -> Optional[int]:
+    """console_recovery
+
+    Description: Asks the operator on the console whether to retry a failed workflow
+
+    Args:
+        message (str): what failed
+        workflow (Workflow): the failed or cancelled workflow
+
+    Returns:
+        index: (int) step to retry the workflow from, or None to give up on it
+    """
+    while True:
+        decision = input(
+            f"{message}\nRetry from a step (its index, 0 for the first step, -1 for the failed step), "
+            "or press Enter to stop this run: "
+        ).strip()
+        if not decision:
+            return None
+        try:
+            index = int(decision)
+        except ValueError:
+            index = len(workflow.steps)
+        if index in range(-1, len(workflow.steps)):
+            return workflow.status.current_step_index if index == -1 else index
+        print("Invalid input. Please try again.")
+
+
+class RunPipeline:
+    """Executes RunPlans concurrently against one workcell."""
+
+    def __init__(
+        self,
+        workcell_client,
+        scheduler,
+        hso_directory=None,
+        resources=None,
+        hso_cache=None,
+        poll_interval=2.0,
+        pregenerate=True,
+        max_workers=None,
+        timeline=None,
+        tips=None,
+        refill=None,
+        refill_duration=300.0,
+        prompt=None,
+        recover=None,
+    ):
+        """
+        Args:
+            workcell_client (WorkcellClient): client used to submit workflows
+            scheduler (IncubationScheduler): tracks the incubation deadlines of every run
+            hso_directory (str | Path): where SOLO protocol files are staged while they are
+                uploaded (default: system temp directory)
+            resources (ResourceManager): shared resource manager (default: a new one)
+            hso_cache (HsoCache): cache of generated SOLO protocols (default: no caching)
+            poll_interval (float): seconds between two status queries of the running workflows
+            pregenerate (bool): generate and validate every SOLO protocol before the first submission
+            max_workers (int): processes generating the protocols (default: number of CPUs)
+            timeline (WorkflowTimeline): records the workflows, steps and incubations (default: none)
+            tips (TipInventory): tips left on the SOLO deck, updated with every protocol run
+                (default: tips are not counted)
+            refill (callable): returns the Submit refilling the tip box at a deck position,
+                e.g. "Position5"; needed with tips
+            refill_duration (float): expected seconds taken by a refill, a refill is only done
+                during an incubation if it leaves that much time
+            prompt (callable): called with the message of every Prompt, returns once the operator
+                is done (default: console_prompt)
+            recover (callable): called with an error message and the failed Workflow, returns the
+                step to retry it from, or None to stop its run (default: console_recovery)
+        """
+        if tips is not None and refill is None:
+            raise ValueError("Counting tips needs a refill workflow")
+        self.workcell_client = workcell_client
+        self.scheduler = scheduler
+        self.hso_directory = hso_directory
+        self.resources = resources or ResourceManager()
+        self.hso_cache = hso_cache
+        self.poll_interval = poll_interval
+        self.pregenerate = pregenerate
+        self.max_workers = max_workers
+        self.timeline = timeline
+        self.tips = tips
+        self.refill = refill
+        self.refill_duration = refill_duration
+        self.prompt = prompt or console_prompt
+        self.recover = recover or console_recovery
+        self._prompting = threading.Lock()  # one operator, one prompt at a time
+        self._refills_queued = set()  # deck positions with a refill deferred to an idle window
+        self._generated: Dict[int, str] = {}  # id of a Submit -> its protocol, generated up front
+        self._admissions = AdmissionControl()
+        self._admitted = threading.Condition()  # notified when the next run can be admitted
+        self._abort = threading.Event()
+        self._loop = None
+        self._workcell = None
+
+    def run(self, plans: List[RunPlan]) -> None:
+        """run
+
+        Description:
+            Runs every plan on its own thread and returns once all are done. If a
+            workflow of a run fails and is not retried, that run stops; on any other
+            error the other runs stop at their next stage as well. The first error
+            is raised. Unless pregenerate is off, nothing is submitted before all
+            SOLO protocols of the plans are generated.
+
+        Args:
+            plans (list of RunPlan): the runs to execute
+        """
+        self._abort.clear()
+        self._admissions = AdmissionControl()
+        if self.pregenerate:
+            self._generated = self.generate_protocols(plans)
+        try:
+            asyncio.run(self._run_plans(plans))
+        finally:
+            self._generated = {}
+
+    def generate_protocols(self, plans: List[RunPlan]) -> Dict[int, str]:
+        """generate_protocols
+
+        Description:
+            Generates the SOLO protocol of every Submit of the plans in a process pool
+
+        Args:
+            plans (list of RunPlan): the runs to generate protocols for
+
+        Returns:
+            protocols: (dict) .hso contents by id of their Submit
+
+        Raises:
+            ValueError: if any protocol could not be generated from its payload
+        """
+        steps = [
+            (plan.run_id, stage)
+            for plan in plans
+            for stage in plan.stages
+            if isinstance(stage, Submit) and stage.protocol is not None
+        ]
+        contents = generate_hso_files(
+            [HsoJob(f"{run_id} {step.name}", step.protocol, step.payload) for run_id, step in steps],
+            cache=self.hso_cache,
+            max_workers=self.max_workers,
+        )
+        return {id(step): hso_contents for (_, step), hso_contents in zip(steps, contents)}
+
+    async def _run_plans(self, plans: List[RunPlan]) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._workcell = AsyncWorkcell(
+            self.workcell_client, self.poll_interval, timeline=self.timeline, clock=self.scheduler.clock
+        )
+        errors: List[BaseException] = []
+        # one thread per run, the stages of a run block on resources and deadlines
+        executor = ThreadPoolExecutor(max_workers=max(1, len(plans)), thread_name_prefix="run")
+        try:
+            await asyncio.gather(
+                *(self._loop.run_in_executor(executor, self._run_plan, plan, errors) for plan in plans)
+            )
+        except asyncio.CancelledError:
+            # interrupted: stop the runs and the workflows they have on the workcell
+            self._stop()
+            await self._workcell.cancel_all()
+            raise
+        finally:
+            executor.shutdown(wait=False)
+        if errors:
+            raise errors[0]
+
+    def _stop(self) -> None:
+        """Stops every run at its next stage, and the runs waiting on a deadline, a resource or their admission right away."""
+        self._abort.set()
+        self.resources.wake()
+        with self._admitted:
+            self._admitted.notify_all()
+
+    def _call(self, awaitable) -> Any:
+        """Runs an awaitable on the pipeline event loop from a run thread and returns its result."""
+
+        async def wait():
+            return await awaitable
+
+        return asyncio.run_coroutine_threadsafe(wait(), self._loop).result()
+
+    def _run_plan(self, plan: RunPlan, errors: List[BaseException]) -> None:
+        priority = PRIORITY_PREPARATION
+        awaited: List[str] = []
+        incubations: Dict[str, float] = {}  # deadline name -> start of the incubation
+        prepared: Dict[int, str] = {}  # id of a Submit -> its protocol, generated ahead of time
+        background: Dict[str, Future] = {}  # name of a background Submit -> its submission
+        background_executor = ThreadPoolExecutor(thread_name_prefix=f"{plan.run_id}_background")
+        try:
+            for index, stage in enumerate(plan.stages):
+                if self._abort.is_set():
+                    return
+                if isinstance(stage, Acquire):
+                    priority = stage.priority
+                    if not self.resources.acquire(stage.resources, plan.run_id, stage.priority, self._abort):
+                        return
+                elif isinstance(stage, Release):
+                    self.resources.release(stage.resources, plan.run_id)
+                elif isinstance(stage, Prompt):
+                    with self._prompting:
+                        self.prompt(f"{plan.run_id}: {stage.message}")
+                elif isinstance(stage, Admit):
+                    wait = self._admit(plan.run_id, stage)
+                    if wait > 0:
+                        self.scheduler.clock.sleep(wait, f"admission of {plan.run_id}", stop=self._abort)
+                elif isinstance(stage, Incubate):
+                    deadline = self.scheduler.schedule(stage.name, stage.seconds, stage.payload)
+                    incubations[stage.name] = deadline.due - stage.seconds
+                    with self._admitted:
+                        if self._admissions.fix(stage.name, deadline.due, plan.run_id):
+                            self._admitted.notify_all()
+                elif isinstance(stage, Await):
+                    if self.tips is not None:
+                        pickups = self._pickups_until_await(plan.stages[index + 1:], prepared)
+                        self._defer_refills(plan.run_id, pickups, self.scheduler.pending([stage.name])[0].due)
+                    deadline = self.scheduler.wait_for(stage.name, stop=self._abort)
+                    if self._abort.is_set():
+                        return  # the deadline stays in the schedule, for --resume
+                    if self.timeline is not None:
+                        self.timeline.record_incubation(
+                            plan.run_id,
+                            stage.name,
+                            incubations.get(stage.name, deadline.due),
+                            self.scheduler.clock.time(),
+                        )
+                    awaited.append(stage.name)
+                    priority = PRIORITY_TIME_CRITICAL
+                elif isinstance(stage, Join):
+                    background.pop(stage.name).result()
+                elif stage.background:
+                    background[stage.name] = background_executor.submit(
+                        self._submit_in_background, plan.run_id, stage, priority, awaited
+                    )
+                    awaited = []
+                else:
+                    upcoming = next(
+                        (s for s in plan.stages[index + 1:] if isinstance(s, Submit)), None
+                    )
+                    self._submit(plan.run_id, stage, priority, prepared, upcoming)
+                    for name in awaited:
+                        self.scheduler.complete(name)
+                    awaited = []
+            for submission in background.values():
+                submission.result()
+        except WorkflowFailedError as error:
+            # the operator gave up on a workflow of this run, the other runs go on
+            errors.append(error)
+        except PipelineStopped:
+            pass  # another run failed, or the app was interrupted: its error is reported
+        except BaseException as error:
+            errors.append(error)
+            self._stop()
+        finally:
+            background_executor.shutdown(wait=True)
+            self.resources.release_all(plan.run_id)
+            with self._admitted:
+                if self._admissions.cancel(plan.run_id):
+                    self._admitted.notify_all()
+
+    def _admit(self, run_id: str, stage: Admit) -> float:
+        """Blocks until the run can be admitted, returns the seconds it waits before starting
+        (0 if the pipeline is stopped first)."""
+        with self._admitted:
+            while not self._abort.is_set():
+                wait = self._admissions.reserve(stage, run_id, self.scheduler.clock.time())
+                if wait is not None:
+                    return wait
+                self._admitted.wait()
+            return 0.0
+
+    def _submit_in_background(self, run_id: str, step: Submit, priority: int, awaited: List[str]) -> Any:
+        """Submits a workflow next to the other stages of its run, holding its nodes under its own name."""
+        workflow = self._submit(run_id, step, priority, {}, holder=f"{run_id} {step.name}")
+        for name in awaited:
+            self.scheduler.complete(name)
+        return workflow
+
+    def _pickups_until_await(self, stages: List[Stage], prepared: Dict[int, str]) -> List[Pickup]:
+        """Tips taken by the protocols of the stages before the next Await, as far as they are generated."""
+        pickups: List[Pickup] = []
+        for stage in stages:
+            if isinstance(stage, Await):
+                break
+            if isinstance(stage, Submit) and stage.protocol is not None:
+                hso_contents = prepared.get(id(stage), self._generated.get(id(stage)))
+                if hso_contents is not None:
+                    pickups += tip_pickups(hso_contents)
+        return pickups
+
+    def _defer_refills(self, run_id: str, pickups: List[Pickup], due: float) -> None:
+        """Refills, while the runs wait on their incubations, the tip boxes that cannot supply the pickups
+        needed once the incubation is due."""
+        for position in self.tips.short(pickups):
+            if position in self._refills_queued:
+                continue
+            self._refills_queued.add(position)
+
+            def refill(position=position):
+                # the other runs may have refilled the box, or used its tips, since; and once the
+                # incubation leaves no time for it, the next protocol refills the box itself
+                if position not in self.tips.short(pickups) or self.scheduler.clock.remaining(due) < self.refill_duration:
+                    self._refills_queued.discard(position)
+                    return True
+                step = self.refill(position)
+                nodes = workflow_nodes(step.workflow)
+                holder = f"{run_id} refill_tips"
+                if not self.resources.try_acquire(nodes, holder):
+                    # held by other runs, waiting on them could go past the deadline: try again later
+                    self.scheduler.defer(refill, self.refill_duration)
+                    return False
+                self._refills_queued.discard(position)
+                try:
+                    self._run_refill(run_id, step)
+                finally:
+                    self.resources.release(nodes, holder)
+                self.tips.refill(position)
+                return True
+
+            self.scheduler.defer(refill, self.refill_duration)
+
+    def _refill(self, run_id: str, position: str, priority: int, holder: Optional[str] = None) -> None:
+        """Runs the refill workflow of the tip box at a deck position, holding its nodes as holder (default: run_id)."""
+        step = self.refill(position)
+        with self.resources.hold(workflow_nodes(step.workflow), holder or run_id, priority, self._abort):
+            self._run_refill(run_id, step)
+        self.tips.refill(position)
+
+    def _run_refill(self, run_id: str, step: Submit) -> None:
+        handle = self._call(
+            self._workcell.submit(step.workflow, json_inputs=step.json_inputs or None, run_id=run_id, label=step.name)
+        )
+        self._await(run_id, handle)
+
+    def _await(self, run_id: str, handle) -> Any:
+        """Waits for a workflow to finish, retrying it from the step chosen by the operator while it fails."""
+        while True:
+            try:
+                return self._call(handle)
+            except WorkflowFailedError as error:
+                if self._abort.is_set():
+                    raise  # cancelled by the shutdown, nothing to recover
+                with self._prompting:
+                    index = self.recover(f"{run_id}: {error}", handle.workflow)
+                if index is None:
+                    raise
+                handle = self._call(self._workcell.retry(handle, index))
+
+    def _protocol(self, step: Submit, prepared: Dict[int, str]) -> str:
+        if id(step) in prepared:
+            return prepared.pop(id(step))
+        if id(step) in self._generated:
+            return self._generated.pop(id(step))
+        hso_contents, _, _ = package_hso(step.protocol, step.payload, cache=self.hso_cache)
+        return hso_contents
+
+    def _submit(
+        self,
+        run_id: str,
+        step: Submit,
+        priority: int,
+        prepared: Dict[int, str],
+        upcoming: Optional[Submit] = None,
+        holder: Optional[str] = None,
+    ) -> Any:
+        with ExitStack() as stack:
+            file_inputs = None
+            pickups: List[Pickup] = []
+            if step.protocol is not None:
+                hso_contents = self._protocol(step, prepared)
+                if self.tips is not None:
+                    pickups = tip_pickups(hso_contents)
+                file_inputs = {
+                    "protocol_file": stack.enter_context(
+                        staged_hso(
+                            hso_contents,
+                            f"{run_id}_{step.name}.hso",
+                            self.hso_directory,
+                        )
+                    )
+                }
+            with self.resources.hold(workflow_nodes(step.workflow), holder or run_id, priority, self._abort):
+                # the SOLO is held, no other run takes tips until this protocol is submitted
+                if pickups:
+                    for position in self.tips.short(pickups):
+                        self._refill(run_id, position, priority, holder)
+                    self.tips.consume(pickups)
+                handle = self._call(
+                    self._workcell.submit(
+                        step.workflow,
+                        json_inputs=step.json_inputs or None,
+                        file_inputs=file_inputs,
+                        run_id=run_id,
+                        label=step.name,
+                    )
+                )
+                # the protocol file is uploaded, stage files can go
+                stack.close()
+                if upcoming is not None and upcoming.protocol is not None and id(upcoming) not in self._generated:
+                    prepared[id(upcoming)] = self._protocol(upcoming, prepared)
+                workflow = self._await(run_id, handle)
+        if step.on_complete is not None:
+            step.on_complete(workflow)
+        return workflow
@@ -0,0 +1,133 @@
+"""
+Tips left in the SOLO tip boxes, counted from the generated protocols.
+
+Every GetTip step of a SOLO protocol takes tips from a tip box of the deck:
+a pickup of 8 tips (the 8-channel head) takes a full column, single tip
+pickups take the tips of an opened column one by one. Tips left in an opened
+column cannot be used by an 8-channel pickup, and are given up when a single
+tip pickup needs more than the opened column holds. The TipInventory
+replays the GetTip steps of each protocol on this model, so the pipeline can
+refill a tip box only when a protocol would run out of tips, or ahead of
+time while the SOLO is otherwise idle.
+"""
+
+import threading
+from typing import Dict, Iterable, List, Tuple
+
+from liquidhandling.hudson.SoloSoft import STEP_DELIMITER
+
+TIPS_PER_COLUMN = 8
+TIP_BOX_COLUMNS = 12  # 96 tips, e.g. TipBox.180uL.Axygen-EVF-180-R-S.bluebox
+
+Pickup = Tuple[str, int]  # (deck position, number of tips), e.g. ("Position5", 8)
+
+
+def tip_pickups(hso_contents: str, deck_size: int = 8) -> List[Pickup]:
+    """tip_pickups
+
+    Description: The GetTip steps of a SOLO protocol, in order
+
+    Args:
+        hso_contents (str): contents of the hso file, as returned by package_hso
+        deck_size (int): number of plate lines at the top of the file (the SOLO deck positions)
+
+    Returns:
+        pickups: (list of tuple) deck position and number of tips of each GetTip step
+    """
+    pickups = []
+    step: List[str] = []
+    for line in hso_contents.splitlines()[deck_size:]:
+        if line != STEP_DELIMITER:
+            step.append(line)
+            continue
+        if step and step[0] == "GetTip":
+            pickups.append((step[1], int(step[3])))
+        step = []
+    return pickups
+
+
+def _take(box: Tuple[int, int], num_tips: int) -> Tuple[int, int]:
+    """The (full columns, tips left in the opened column) of a box once num_tips are taken.
+
+    Raises:
+        ValueError: if the box does not hold the tips
+    """
+    columns, loose = box
+    if num_tips >= TIPS_PER_COLUMN:
+        if columns == 0:
+            raise ValueError(f"no full column of tips left for a pickup of {num_tips} tips")
+        return columns - 1, loose
+    if loose >= num_tips:
+        return columns, loose - num_tips
+    if columns == 0:
+        raise ValueError(f"{loose} tips left in the opened column for a pickup of {num_tips} tips")
+    return columns - 1, TIPS_PER_COLUMN - num_tips
+
+
+class TipInventory:
+    """Tips left in the tip boxes of the SOLO deck. Safe to share between threads."""
+
+    def __init__(self, positions: Iterable[str] = ("Position5",), full: bool = False, columns: int = TIP_BOX_COLUMNS):
+        """
+        Args:
+            positions (list of str): deck positions holding a tip box, pickups from other
+                positions are not counted
+            full (bool): the boxes start full; by default their content is unknown and
+                they start empty, so the first pickup asks for a refill
+            columns (int): columns of tips of a full box
+        """
+        self.columns = columns
+        self._boxes: Dict[str, Tuple[int, int]] = {
+            position: (columns if full else 0, 0) for position in positions
+        }
+        self.refills: List[str] = []  # position of every refill, in order
+        self._lock = threading.Lock()
+
+    def remaining(self, position: str) -> int:
+        """Tips left in the box at a position."""
+        with self._lock:
+            columns, loose = self._boxes[position]
+        return columns * TIPS_PER_COLUMN + loose
+
+    def refill(self, position: str) -> None:
+        """Records that the box at a position was replaced by a full one."""
+        with self._lock:
+            self._boxes[position] = (self.columns, 0)
+            self.refills.append(position)
+
+    def short(self, pickups: Iterable[Pickup]) -> List[str]:
+        """Positions whose box cannot supply every pickup, in deck order."""
+        with self._lock:
+            return self._short(pickups)
+
+    def _short(self, pickups: Iterable[Pickup]) -> List[str]:
+        boxes = dict(self._boxes)
+        short = set()
+        for position, num_tips in pickups:
+            if position not in boxes or position in short:
+                continue
+            try:
+                boxes[position] = _take(boxes[position], num_tips)
+            except ValueError:
+                short.add(position)
+        return sorted(short)
+
+    def consume(self, pickups: Iterable[Pickup]) -> None:
+        """consume
+
+        Description: Takes the tips of the pickups from their boxes
+
+        Args:
+            pickups (list of tuple): deck position and number of tips of each pickup
+
+        Raises:
+            RuntimeError: if a box runs out of tips, nothing is taken then
+        """
+        pickups = list(pickups)
+        with self._lock:
+            short = self._short(pickups)
+            if short:
+                raise RuntimeError(f"Not enough tips left at {', '.join(short)}, refill the tip box first")
+            for position, num_tips in pickups:
+                if position in self._boxes:
+                    self._boxes[position] = _take(self._boxes[position], num_tips)
@@ -0,0 +1,121 @@
+"""
+Recorded SOLO liquid handling steps, split into SOLO-safe protocol files.
+
+SOLOSoft crashes when a protocol file holds too many steps, so long liquid
+transfers have to be spread over several files. A protocol records its steps
+on a TransferPlan with the SoloSoft method names, and the plan is cut into the
+smallest number of chunks that stay within the step limit. Cuts only happen
+between transfers (an aspirate and its dispenses), when the tips are empty:
+a chunk cut while tips are held ends by shucking them and the next chunk
+starts by getting new ones the same way.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+# Steps of the longest protocol known to load in SOLOSoft (one half of a 384-well plate fill)
+MAX_SOLO_STEPS = 38
+
+
+@dataclass
+class Step:
+    """One SoloSoft call."""
+
+    method: str  # SoloSoft method name, e.g. "aspirate"
+    args: Tuple[Any, ...] = ()
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+
+    def emit(self, solo_soft) -> None:
+        """Adds the step to a SoloSoft pipeline."""
+        getattr(solo_soft, self.method)(*self.args, **self.kwargs)
+
+
+class TransferPlan:
+    """Ordered SoloSoft steps, recorded with the SoloSoft method names."""
+
+    def __init__(self, steps: Optional[List[Step]] = None):
+        """
+        Args:
+            steps (list of Step): steps already recorded
+        """
+        self.steps = list(steps or [])
+
+    def __len__(self) -> int:
+        """Number of steps."""
+        return len(self.steps)
+
+    def _record(self, method, args, kwargs) -> None:
+        self.steps.append(Step(method, args, kwargs))
+
+    def getTip(self, *args, **kwargs) -> None:
+        """Records SoloSoft.getTip."""
+        self._record("getTip", args, kwargs)
+
+    def shuckTip(self, *args, **kwargs) -> None:
+        """Records SoloSoft.shuckTip."""
+        self._record("shuckTip", args, kwargs)
+
+    def aspirate(self, *args, **kwargs) -> None:
+        """Records SoloSoft.aspirate."""
+        self._record("aspirate", args, kwargs)
+
+    def dispense(self, *args, **kwargs) -> None:
+        """Records SoloSoft.dispense."""
+        self._record("dispense", args, kwargs)
+
+    def transfers(self) -> List[List[Step]]:
+        """The steps grouped into units that cannot be split: an aspirate with the
+        dispenses that follow it, or a single tip step."""
+        groups: List[List[Step]] = []
+        for step in self.steps:
+            if step.method == "dispense" and groups and groups[-1][0].method == "aspirate":
+                groups[-1].append(step)
+            else:
+                groups.append([step])
+        return groups
+
+    def chunks(self, max_steps: int = MAX_SOLO_STEPS) -> List[List[Step]]:
+        """chunks
+
+        Description:
+            Splits the plan into the smallest number of SOLO-safe protocols, filling
+            each one as far as the step limit allows.
+
+        Args:
+            max_steps (int): most steps a protocol file may hold
+
+        Returns:
+            list of list of Step: the steps of each protocol file
+        """
+        chunks: List[List[Step]] = []
+        chunk: List[Step] = []
+        tip: Optional[Step] = None  # getTip step of the tips currently held
+        for group in self.transfers():
+            tip_after = tip
+            for step in group:
+                if step.method == "getTip":
+                    tip_after = step
+                elif step.method == "shuckTip":
+                    tip_after = None
+            closing = 1 if tip_after is not None else 0
+            if len(chunk) + len(group) + closing > max_steps and any(
+                step.method != "getTip" for step in chunk
+            ):
+                if tip is not None:
+                    chunk.append(Step("shuckTip"))
+                chunks.append(chunk)
+                chunk = [tip] if tip is not None else []
+            if len(chunk) + len(group) + closing > max_steps:
+                raise ValueError(f"A transfer of {len(group)} steps does not fit in {max_steps} SOLO steps")
+            chunk.extend(group)
+            tip = tip_after
+        if chunk:
+            if tip is not None:
+                chunk.append(Step("shuckTip"))
+            chunks.append(chunk)
+        return chunks
+
+    def emit(self, solo_soft, steps: Optional[List[Step]] = None) -> None:
+        """Adds the steps (default: the whole plan) to a SoloSoft pipeline."""
+        for step in self.steps if steps is None else steps:
+            step.emit(solo_soft)
@@ -0,0 +1,114 @@
+"""
+NumPy backed well volume maps for SOLO protocols.
+
+liquidhandling builds a volume map by instantiating a PlateDefinition (a fresh
+nested list) and calling setColumn/setCell on it. Here the well selections are
+boolean masks computed once per plate shape and cached, a volume map is a
+single vectorized expression over a mask, and the nested list SoloSoft expects
+is only produced when the map is handed to a step (to_solo).
+
+The emitted lists are value for value what PlateDefinition produces: empty
+wells are int 0 and filled wells keep the type of the volume given (int or
+float), so the generated .hso files are unchanged.
+"""
+
+import string
+from functools import lru_cache
+from typing import List, Tuple, Union
+
+import numpy as np
+
+# (rows, columns) of the plates used by the protocols
+DEEPWELL_96 = (8, 12)  # DeepBlock.96.VWR-75870-792.sterile
+DEEPWELL_48 = (8, 6)  # 48well_deepwell exposure/indicator plate
+PLATE_384 = (16, 24)  # Plate_384_Corning_3540_BlackwClearBottomAssay
+
+Shape = Tuple[int, int]
+Row = Union[str, int]
+
+
+def _row_index(shape: Shape, row: Row) -> int:
+    index = string.ascii_uppercase.index(row.upper()) if isinstance(row, str) else row - 1
+    if not 0 <= index < shape[0]:
+        raise ValueError(f"row must be a letter A-{string.ascii_uppercase[shape[0] - 1]} or a number 1-{shape[0]}, not {row}")
+    return index
+
+
+def _column_index(shape: Shape, column: int) -> int:
+    if column not in range(1, shape[1] + 1):
+        raise ValueError(f"column must be a number in the range 1-{shape[1]} inclusive, not {column}")
+    return column - 1
+
+
+def _frozen(mask: np.ndarray) -> np.ndarray:
+    mask.flags.writeable = False  # masks are shared through the caches
+    return mask
+
+
+@lru_cache(maxsize=None)
+def column_mask(shape: Shape, column: int, first_row: Row = 1) -> np.ndarray:
+    """Wells of a column, from first_row down (e.g. first_row="B" skips row A)."""
+    mask = np.zeros(shape, dtype=bool)
+    mask[_row_index(shape, first_row):, _column_index(shape, column)] = True
+    return _frozen(mask)
+
+
+@lru_cache(maxsize=None)
+def row_mask(shape: Shape, row: Row) -> np.ndarray:
+    """Wells of a row."""
+    mask = np.zeros(shape, dtype=bool)
+    mask[_row_index(shape, row), :] = True
+    return _frozen(mask)
+
+
+@lru_cache(maxsize=None)
+def cell_mask(shape: Shape, row: Row, column: int) -> np.ndarray:
+    """A single well."""
+    mask = np.zeros(shape, dtype=bool)
+    mask[_row_index(shape, row), _column_index(shape, column)] = True
+    return _frozen(mask)
+
+
+@lru_cache(maxsize=None)
+def checkerboard_mask(shape: Shape, parity: int = 0) -> np.ndarray:
+    """Every other well, starting with A1 for parity 0 and with A2 for parity 1."""
+    rows, columns = np.indices(shape)
+    return _frozen((rows + columns) % 2 == parity)
+
+
+@lru_cache(maxsize=None)
+def quadrant_mask(quadrant: int, shape: Shape = PLATE_384) -> np.ndarray:
+    """Interleaved quadrant of a 384-well plate, i.e. the wells an 8 channel head
+    reaches from one 96-well position: 1 = A1, A3..., 2 = A2, A4..., 3 = B1, B3..., 4 = B2, B4...
+    """
+    if quadrant not in (1, 2, 3, 4):
+        raise ValueError(f"quadrant must be 1, 2, 3 or 4, not {quadrant}")
+    mask = np.zeros(shape, dtype=bool)
+    mask[(quadrant - 1) // 2::2, (quadrant - 1) % 2::2] = True
+    return _frozen(mask)
+
+
+def volume_map(mask: np.ndarray, volume) -> np.ndarray:
+    """Volume in every well of the mask, 0 elsewhere. Takes the dtype of volume,
+    which may also be an array of per-well volumes broadcastable to the mask."""
+    if float(np.min(volume)) < 0:
+        raise ValueError(f"volume must be a non-negative number, not {volume}")
+    return mask * np.asarray(volume)
+
+
+def to_solo(volumes: np.ndarray) -> List[list]:
+    """Nested list of a volume map, as passed to SoloSoft aspirate/dispense."""
+    if np.issubdtype(volumes.dtype, np.integer):
+        return volumes.tolist()
+    return [[value if value else 0 for value in row] for row in volumes.tolist()]
+
+
+def column_volumes(shape: Shape, column: int, volume, first_row: Row = 1) -> List[list]:
+    """SoloSoft volume map of one column, same as PlateDefinition.setColumn (with
+    first_row, the rows above it are left empty)."""
+    return to_solo(volume_map(column_mask(shape, column, first_row), volume))
+
+
+def cell_volumes(shape: Shape, row: Row, column: int, volume) -> List[list]:
+    """SoloSoft volume map of one well, same as PlateDefinition.setCell."""
+    return to_solo(volume_map(cell_mask(shape, row, column), volume))
@@ -0,0 +1,519 @@
+"""
+Discrete-event simulation of the RAPID350 workcell.
+
+RunPlans (or plain workflow YAMLs) are replayed against a model of the
+workcell in which every node action takes a configured time, without
+touching the robots or the MADSci servers. The model follows the rules of
+RunPipeline: a workflow holds all the nodes it uses while it runs, deck
+positions are held between Acquire and Release with the same priorities, and
+incubations run in the background until they are awaited. The result is the
+makespan of the runs, the utilization of every node and the critical path,
+the chain of workflows and incubations that sets the makespan, and how late
+each awaited incubation was acted on. Runs are admitted as RunPipeline admits
+them, and given a TipInventory, tip boxes are refilled as RunPipeline
+refills them.
+
+Action durations are read from a YAML file (see simulation.yaml):
+
+    default: 60  # seconds, for any action not listed
+    nodes:
+      solo_sam:
+        refill_tips: 120
+        run_protocol: {base: 60, per_step: 8}  # per step of the SOLO protocol run
+      operator:
+        prompt: 180  # a Prompt of a RunPlan, e.g. loading a plate
+
+Usage, for workflows outside of a RunPlan (e.g. the DEMO application):
+
+    python -m helper_functions.workcell_simulator ../DEMO/workflows/demo_wf.yaml
+"""
+
+import argparse
+import datetime
+import heapq
+import json
+from dataclasses import dataclass, field
+from functools import lru_cache
+from itertools import count
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+import yaml
+from helper_functions.run_pipeline import (
+    PRIORITY_PREPARATION,
+    PRIORITY_TIME_CRITICAL,
+    YAML_LOADER,
+    Acquire,
+    AdmissionControl,
+    Admit,
+    Await,
+    Incubate,
+    Join,
+    Prompt,
+    Release,
+    RunPlan,
+    Submit,
+)
+from helper_functions.tip_inventory import Pickup, tip_pickups
+
+from rapid350.hso_functions import render_hso
+
+
+@lru_cache(maxsize=None)
+def workflow_steps(workflow_path) -> Tuple[Tuple[str, str, str], ...]:
+    """(name, node, action) of every step of a workflow YAML."""
+    with open(workflow_path, "r") as workflow_file:
+        workflow = yaml.load(workflow_file, Loader=YAML_LOADER)
+    return tuple(
+        (step.get("name", ""), step["node"], step.get("action", ""))
+        for step in workflow.get("steps") or []
+        if step.get("node")
+    )
+
+
+class ActionDurations:
+    """Time taken by each node action, in seconds."""
+
+    def __init__(self, durations: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            durations (dict): "default" duration and per node action durations under "nodes",
+                as in simulation.yaml
+        """
+        durations = durations or {}
+        self.default = float(durations.get("default", 60))
+        self.nodes: Dict[str, Dict[str, Any]] = durations.get("nodes") or {}
+        self._protocols: Dict[tuple, Tuple[int, List[Pickup]]] = {}
+
+    @classmethod
+    def from_yaml(cls, path) -> "ActionDurations":
+        """Loads action durations from a YAML file."""
+        with open(Path(path), "r") as durations_file:
+            return cls(yaml.load(durations_file, Loader=YAML_LOADER))
+
+    def _protocol(self, submit: Submit) -> Tuple[int, List[Pickup]]:
+        key = (
+            submit.protocol.__module__,
+            submit.protocol.__qualname__,
+            json.dumps(submit.payload, sort_keys=True, default=str),
+        )
+        if key not in self._protocols:
+            solo_soft = submit.protocol(payload=submit.payload, temp_file_path=None)
+            self._protocols[key] = (len(solo_soft.pipeline), tip_pickups(render_hso(solo_soft)))
+        return self._protocols[key]
+
+    def protocol_steps(self, submit: Submit) -> int:
+        """Number of steps of the SOLO protocol of a Submit."""
+        return self._protocol(submit)[0]
+
+    def protocol_pickups(self, submit: Submit) -> List[Pickup]:
+        """Tips taken by the SOLO protocol of a Submit."""
+        return self._protocol(submit)[1]
+
+    def duration(self, node: str, action: str, submit: Optional[Submit] = None) -> float:
+        """Time taken by an action of a node, for the given Submit (used by per_step durations)."""
+        actions = self.nodes.get(node) or {}
+        spec = actions.get(action, actions.get("default", self.default))
+        if isinstance(spec, dict):
+            steps = self.protocol_steps(submit) if submit is not None and submit.protocol is not None else 0
+            return float(spec.get("base", 0)) + float(spec.get("per_step", 0)) * steps
+        return float(spec)
+
+
+@dataclass
+class Activity:
+    """A workflow or an incubation of a simulated run."""
+
+    run_id: str
+    name: str
+    kind: str  # "workflow" or "incubation"
+    start: float  # seconds from the start of the simulation
+    end: float
+    nodes: FrozenSet[str] = frozenset()
+    ready: float = 0.0  # when the run was ready to start it, start - ready was spent waiting on resources
+    cause: Optional["Activity"] = field(default=None, repr=False)  # activity whose end let this one start
+
+
+@dataclass
+class StepRecord:
+    """A node action of a simulated workflow."""
+
+    run_id: str
+    workflow: str
+    name: str
+    node: str
+    action: str
+    start: float
+    end: float
+
+
+def _format(seconds: float) -> str:
+    return str(datetime.timedelta(seconds=round(seconds)))
+
+
+@dataclass
+class SimulationReport:
+    """Outcome of a simulation."""
+
+    makespan: float
+    activities: List[Activity]
+    steps: List[StepRecord]
+    run_ends: Dict[str, float]
+    run_waits: Dict[str, float]  # seconds each run spent waiting on nodes and deck positions
+    overruns: Dict[str, float] = field(default_factory=dict)  # deadline -> seconds from due to the workflow acting on it
+
+    def node_busy(self) -> Dict[str, float]:
+        """Seconds each node spends running actions."""
+        busy: Dict[str, float] = {}
+        for step in self.steps:
+            busy[step.node] = busy.get(step.node, 0.0) + step.end - step.start
+        return busy
+
+    def node_held(self) -> Dict[str, float]:
+        """Seconds each node is held by a workflow, busy or not."""
+        held: Dict[str, float] = {}
+        for activity in self.activities:
+            for node in activity.nodes:
+                held[node] = held.get(node, 0.0) + activity.end - activity.start
+        return held
+
+    def utilization(self) -> Dict[str, float]:
+        """Fraction of the makespan each node spends running actions."""
+        return {
+            node: busy / self.makespan if self.makespan else 0.0
+            for node, busy in self.node_busy().items()
+        }
+
+    def critical_path(self) -> List[Activity]:
+        """Activities, in order, that determine the makespan: each one started when the previous one ended."""
+        if not self.activities:
+            return []
+        activity = max(self.activities, key=lambda a: a.end)
+        path = []
+        while activity is not None:
+            path.append(activity)
+            activity = activity.cause
+        return path[::-1]
+
+    def __str__(self) -> str:
+        """Makespan, node utilization and critical path as a text report."""
+        busy, held, utilization = self.node_busy(), self.node_held(), self.utilization()
+        lines = [f"Makespan: {_format(self.makespan)}", ""]
+        lines.append(f"{'Node':<20}{'busy':>16}{'held':>16}{'utilization':>13}")
+        for node in sorted(busy, key=lambda n: -busy[n]):
+            lines.append(
+                f"{node:<20}{_format(busy[node]):>16}{_format(held.get(node, 0.0)):>16}{utilization[node]:>12.1%}"
+            )
+        lines += ["", "Runs:"]
+        for run_id, end in self.run_ends.items():
+            lines.append(
+                f"  {run_id}: done at {_format(end)}, {_format(self.run_waits[run_id])} waiting on resources"
+            )
+        late = {name: seconds for name, seconds in self.overruns.items() if seconds >= 1}
+        if late:
+            lines += ["", "Incubations overrun:"]
+            for name, seconds in late.items():
+                lines.append(f"  {name}: acted on {_format(seconds)} after it was due")
+        lines += ["", "Critical path:"]
+        for activity in self.critical_path():
+            nodes = f" ({', '.join(sorted(activity.nodes))})" if activity.nodes else ""
+            lines.append(
+                f"  {_format(activity.start):>15} - {_format(activity.end):<15} {activity.run_id} {activity.name}{nodes}"
+            )
+        return "\n".join(lines)
+
+
+class _Run:
+    def __init__(self, plan: RunPlan):
+        self.plan = plan
+        self.priority = PRIORITY_PREPARATION
+        self.last: Optional[Activity] = None  # latest activity of the run
+        self.blocker: Optional[Activity] = None  # activity the run last waited on, if any
+        self.waited = 0.0  # seconds spent waiting on resources
+        self.awaited: List[Activity] = []  # incubations awaited since the last workflow of the run
+        self.background: Dict[str, "_Run"] = {}  # name of a background Submit -> the run of its workflow
+        self.done = False
+        self.joiners: List[tuple] = []  # (run, process) waiting for this background run to be done
+
+
+class WorkcellSimulator:
+    """Replays RunPlans on a model of the workcell, in simulated time."""
+
+    retry_interval = 30.0  # seconds between two tries of a refill done during an incubation, as the scheduler's poll_interval
+
+    def __init__(self, durations: ActionDurations, tips=None, refill=None):
+        """
+        Args:
+            durations (ActionDurations): time taken by each node action
+            tips (TipInventory): tips left on the SOLO deck, as for RunPipeline (default: not counted)
+            refill (callable): returns the Submit refilling the tip box at a deck position; needed with tips
+        """
+        if tips is not None and refill is None:
+            raise ValueError("Counting tips needs a refill workflow")
+        self.durations = durations
+        self.tips = tips
+        self.refill = refill
+
+    def simulate(self, plans: List[RunPlan]) -> SimulationReport:
+        """simulate
+
+        Description:
+            Runs the plans concurrently, as RunPipeline would, in simulated time
+
+        Args:
+            plans (list of RunPlan): the runs to simulate
+
+        Returns:
+            SimulationReport: makespan, activities and node actions of the simulation
+
+        Raises:
+            RuntimeError: if the runs deadlock on resources
+        """
+        self.now = 0.0
+        self._events: List[tuple] = []  # (time, sequence, run, process)
+        self._sequence = count()
+        self._held: Dict[str, _Run] = {}
+        self._waiting: List[tuple] = []  # (priority, arrival, resources, run, process)
+        self._arrivals = count()
+        self._deadlines: Dict[str, Activity] = {}
+        self._activities: List[Activity] = []
+        self._steps: List[StepRecord] = []
+        self._side_runs: List[_Run] = []  # background Submits, and refills done while runs wait on incubations
+        self._refills_queued = set()
+        self._admissions = AdmissionControl()
+        self._admitting: List[tuple] = []  # (run, process, Admit) waiting to be admitted, in order
+        self._overruns: Dict[str, float] = {}
+        run_ends: Dict[str, float] = {}
+        runs: List[_Run] = []
+
+        for plan in plans:
+            run = _Run(plan)
+            runs.append(run)
+            self._schedule(0.0, run, self._process(run))
+        while self._events:
+            self.now, _, run, process = heapq.heappop(self._events)
+            try:
+                command = next(process)
+            except StopIteration:
+                self._release(list(self._held_by(run)), run)
+                run.done = True
+                for joiner, joiner_process in run.joiners:
+                    joiner.blocker = run.last
+                    self._schedule(self.now, joiner, joiner_process)
+                if run not in self._side_runs:
+                    run_ends[run.plan.run_id] = self.now
+                if self._admissions.cancel(run):
+                    self._admit_next()
+                continue
+            self._handle(command, run, process)
+        if self._waiting or self._admitting:
+            blocked = sorted(
+                {request[3].plan.run_id for request in self._waiting}
+                | {request[0].plan.run_id for request in self._admitting}
+            )
+            raise RuntimeError(f"Simulation deadlocked: runs {blocked} wait on resources that are never released")
+
+        return SimulationReport(
+            makespan=max(run_ends.values(), default=0.0),
+            activities=self._activities,
+            steps=self._steps,
+            run_ends=run_ends,
+            run_waits={run.plan.run_id: run.waited for run in runs},
+            overruns=self._overruns,
+        )
+
+    def _schedule(self, time: float, run: _Run, process) -> None:
+        heapq.heappush(self._events, (time, next(self._sequence), run, process))
+
+    def _handle(self, command, run: _Run, process) -> None:
+        kind = command[0]
+        if kind == "delay":
+            self._schedule(self.now + command[1], run, process)
+        elif kind == "until":
+            deadline = command[1]
+            if deadline.end > self.now:
+                run.blocker = deadline
+            self._schedule(max(self.now, deadline.end), run, process)
+        elif kind == "join":
+            background = command[1]
+            if background.done:
+                self._schedule(self.now, run, process)
+            else:
+                background.joiners.append((run, process))
+        elif kind == "admit":
+            wait = self._admissions.reserve(command[1], run, self.now)
+            if wait is None:
+                self._admitting.append((run, process, command[1]))
+            else:
+                self._schedule(self.now + wait, run, process)
+        else:  # acquire
+            _, resources, priority = command
+            new = frozenset(r for r in resources if self._held.get(r) is not run)
+            self._waiting.append((priority, next(self._arrivals), new, run, process))
+            self._dispatch(None)
+
+    def _admit_next(self) -> None:
+        if self._admitting:
+            run, process, stage = self._admitting.pop(0)
+            self._handle(("admit", stage), run, process)
+
+    def _held_by(self, run: _Run) -> Iterable[str]:
+        return [resource for resource, holder in self._held.items() if holder is run]
+
+    def _grantable(self, request) -> bool:
+        resources, run = request[2], request[3]
+        if any(self._held.get(r, run) is not run for r in resources):
+            return False
+        return not any(
+            other[:2] < request[:2] and other[2] & resources for other in self._waiting
+        )
+
+    def _dispatch(self, releaser: Optional[_Run]) -> None:
+        for request in sorted(self._waiting, key=lambda r: r[:2]):
+            if self._grantable(request):
+                self._waiting.remove(request)
+                _, _, resources, run, process = request
+                for resource in resources:
+                    self._held[resource] = run
+                if releaser is not None and releaser is not run and releaser.last is not None:
+                    run.blocker = releaser.last
+                self._schedule(self.now, run, process)
+
+    def _release(self, resources: Iterable[str], run: _Run) -> None:
+        for resource in resources:
+            if self._held.get(resource) is run:
+                del self._held[resource]
+        self._dispatch(run)
+
+    def _cause(self, run: _Run) -> Optional[Activity]:
+        cause = run.blocker or run.last
+        run.blocker = None
+        return cause
+
+    def _process(self, run: _Run):
+        """The stages of a run, as a generator of ("delay", seconds), ("until", deadline),
+        ("join", background run), ("admit", Admit) and ("acquire", resources, priority) commands."""
+        run_id = run.plan.run_id
+        for index, stage in enumerate(run.plan.stages):
+            if isinstance(stage, Acquire):
+                run.priority = stage.priority
+                requested = self.now
+                yield ("acquire", frozenset(stage.resources), stage.priority)
+                run.waited += self.now - requested
+            elif isinstance(stage, Release):
+                self._release(stage.resources, run)
+            elif isinstance(stage, Admit):
+                yield ("admit", stage)
+            elif isinstance(stage, Prompt):
+                yield ("delay", self.durations.duration("operator", "prompt"))
+            elif isinstance(stage, Incubate):
+                incubation = Activity(
+                    run_id, stage.name, "incubation", self.now, self.now + stage.seconds,
+                    ready=self.now, cause=self._cause(run),
+                )
+                self._deadlines[stage.name] = incubation
+                self._activities.append(incubation)
+                if self._admissions.fix(stage.name, incubation.end, run):
+                    self._admit_next()
+            elif isinstance(stage, Await):
+                if self.tips is not None:
+                    self._defer_refills(run, self._deadlines[stage.name], run.plan.stages[index + 1:])
+                yield ("until", self._deadlines[stage.name])
+                run.awaited.append(self._deadlines[stage.name])
+                run.priority = PRIORITY_TIME_CRITICAL
+            elif isinstance(stage, Join):
+                yield ("join", run.background.pop(stage.name))
+            elif stage.background:
+                background = _Run(RunPlan(run_id, []))
+                background.priority, background.last = run.priority, run.last
+                background.awaited, run.awaited = run.awaited, []
+                self._side_runs.append(background)
+                run.background[stage.name] = background
+                self._schedule(self.now, background, self._workflow(background, stage))
+            else:
+                yield from self._workflow(run, stage)
+        for background in list(run.background.values()):
+            yield ("join", background)
+
+    def _workflow(self, run: _Run, stage: Submit):
+        """A workflow of a run, holding its nodes, after refilling the tips its protocol needs."""
+        run_id = run.plan.run_id
+        steps = workflow_steps(stage.workflow)
+        nodes = frozenset(node for _, node, _ in steps)
+        ready = self.now
+        awaited, run.awaited = run.awaited, []  # not the refills below, the deadlines end with this workflow
+        new = frozenset(node for node in nodes if self._held.get(node) is not run)
+        yield ("acquire", new, run.priority)
+        run.waited += self.now - ready
+        if self.tips is not None and stage.protocol is not None:
+            pickups = self.durations.protocol_pickups(stage)
+            for position in self.tips.short(pickups):
+                yield from self._workflow(run, self.refill(position))
+                self.tips.refill(position)
+            self.tips.consume(pickups)
+        start, cause = self.now, self._cause(run)
+        for deadline in awaited:
+            self._overruns[deadline.name] = start - deadline.end
+        for name, node, action in steps:
+            duration = self.durations.duration(node, action, stage)
+            self._steps.append(
+                StepRecord(run_id, stage.name, name, node, action, self.now, self.now + duration)
+            )
+            yield ("delay", duration)
+        activity = Activity(run_id, stage.name, "workflow", start, self.now, nodes, ready, cause)
+        self._activities.append(activity)
+        run.last = activity
+        self._release(new, run)
+
+    def _defer_refills(self, run: _Run, deadline: Activity, stages: List) -> None:
+        """Starts, next to a run waiting on an incubation, the refills the stages after it need."""
+        pickups: List[Pickup] = []
+        for stage in stages:
+            if isinstance(stage, Await):
+                break
+            if isinstance(stage, Submit) and stage.protocol is not None:
+                pickups += self.durations.protocol_pickups(stage)
+        for position in self.tips.short(pickups):
+            refill = self.refill(position)
+            duration = sum(
+                self.durations.duration(node, action, refill) for _, node, action in workflow_steps(refill.workflow)
+            )
+            if position in self._refills_queued or deadline.end - self.now < duration:
+                continue
+            self._refills_queued.add(position)
+            refill_run = _Run(RunPlan(run.plan.run_id, []))
+            refill_run.last = run.last
+            self._side_runs.append(refill_run)
+            self._schedule(self.now, refill_run, self._refill(refill_run, position, pickups, deadline, duration))
+
+    def _refill(self, run: _Run, position: str, pickups: List[Pickup], deadline: Activity, duration: float):
+        """A refill done while a run waits on an incubation, unless the tips were refilled since. As in
+        RunPipeline, it does not wait on nodes held by other runs: it tries again every retry_interval
+        seconds, and gives up once the incubation leaves it no time."""
+        refill = self.refill(position)
+        nodes = frozenset(node for _, node, _ in workflow_steps(refill.workflow))
+        while position in self.tips.short(pickups) and deadline.end - self.now >= duration:
+            if not any(node in self._held or any(node in request[2] for request in self._waiting) for node in nodes):
+                self._refills_queued.discard(position)
+                yield from self._workflow(run, refill)
+                self.tips.refill(position)
+                return
+            yield ("delay", self.retry_interval)
+        self._refills_queued.discard(position)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Simulates workflow YAMLs run one after the other on the RAPID350 workcell."
+    )
+    parser.add_argument("workflows", nargs="+", type=Path, help="workflow YAML files, in run order")
+    parser.add_argument(
+        "--durations",
+        type=Path,
+        default=Path(__file__).resolve().parents[1] / "simulation.yaml",
+        help="action durations YAML (default: simulation.yaml of the AMES_TEST application)",
+    )
+    args = parser.parse_args()
+
+    plan = RunPlan("run_1", [Submit(workflow.stem, workflow) for workflow in args.workflows])
+    print(WorkcellSimulator(ActionDurations.from_yaml(args.durations)).simulate([plan]))
@@ -0,0 +1,238 @@
+"""
+Static analysis of workflow YAMLs: which steps could run at the same time.
+
+Each step of a workflow is placed in a dependency graph. A step depends on an
+earlier step when both use the same node, or when both use the same place of
+the workcell: the source and target locations of a crane step, or the nest of
+an instrument (e.g. "Hidex.Nest" for every hidex_howard action). A crane move
+(e.g. to Safe) clears the way for the other instruments, so it depends on
+every earlier step and every later step depends on it; so do the steps of
+nodes whose places are unknown. Steps with no path between them could
+overlap, e.g. opening the Hidex door while the Liconic unloads a plate.
+
+For every workflow the analysis reports the steps that could overlap, crane
+transfers that could be merged into one (a plate moved from A to B then from
+B to C with nothing done at B), crane moves directly followed by another
+crane step, and an ordering of the steps that starts every step as early as
+its dependencies allow. Durations come from simulation.yaml, as for the
+workcell simulator. MADSci runs the steps of a workflow one after the other,
+so the time saved by overlapping steps is only gained by splitting them into
+workflows submitted side by side.
+
+Usage:
+
+    python -m helper_functions.workflow_analyzer workflows/*.yaml
+    python -m helper_functions.workflow_analyzer ../DEMO/workflows/demo_wf.yaml
+"""
+
+import argparse
+import datetime
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+import yaml
+from helper_functions.run_pipeline import YAML_LOADER
+from helper_functions.workcell_simulator import ActionDurations
+
+# places used by the actions of each instrument node; a place ending with "." stands for
+# every location starting with it, e.g. "Solo." for the positions of the SOLO deck
+NODE_PLACES: Dict[str, FrozenSet[str]] = {
+    "liconic_lisa": frozenset({"Liconic.Nest"}),
+    "hidex_howard": frozenset({"Hidex.Nest"}),
+    "peeler_potato": frozenset({"Peeler.Nest"}),
+    "sealer_harp": frozenset({"Sealer."}),
+    "solo_sam": frozenset({"Solo."}),
+}
+
+
+def _same_place(place: str, other: str) -> bool:
+    if place == other:
+        return True
+    return (place.endswith(".") and other.startswith(place)) or (other.endswith(".") and place.startswith(other))
+
+
+@dataclass
+class WorkflowStep:
+    """A step of a workflow and the earlier steps it depends on."""
+
+    index: int  # position of the step in the workflow, from 0
+    name: str
+    node: str
+    action: str
+    places: FrozenSet[str]
+    barrier: bool  # depends on every earlier step, every later step depends on it
+    duration: float
+    locations: Dict[str, str] = field(default_factory=dict)  # source and target of a crane step
+    depends: FrozenSet[int] = frozenset()  # direct dependencies
+    after: FrozenSet[int] = frozenset()  # every step this one has to wait for, directly or not
+
+
+def _conflict(step: WorkflowStep, other: WorkflowStep) -> bool:
+    if step.barrier or other.barrier or step.node == other.node:
+        return True
+    return any(_same_place(place, other_place) for place in step.places for other_place in other.places)
+
+
+@dataclass
+class WorkflowAnalysis:
+    """Dependency graph of the steps of a workflow, and what it allows."""
+
+    path: Path
+    steps: List[WorkflowStep]
+
+    def schedule(self) -> Dict[int, Tuple[float, float]]:
+        """Start and end of every step when each one starts as soon as its dependencies have ended."""
+        times: Dict[int, Tuple[float, float]] = {}
+        for step in self.steps:
+            start = max((times[index][1] for index in step.depends), default=0.0)
+            times[step.index] = (start, start + step.duration)
+        return times
+
+    def ordering(self) -> List[WorkflowStep]:
+        """The steps in the order they start in schedule, ties kept in workflow order."""
+        times = self.schedule()
+        return sorted(self.steps, key=lambda step: (times[step.index][0], step.index))
+
+    def sequential_duration(self) -> float:
+        """Time taken by the steps run one after the other, as MADSci runs them."""
+        return sum(step.duration for step in self.steps)
+
+    def overlapped_duration(self) -> float:
+        """Time taken by the steps in schedule, the longest chain of dependent steps."""
+        return max((end for _, end in self.schedule().values()), default=0.0)
+
+    def overlaps(self) -> List[Tuple[WorkflowStep, WorkflowStep]]:
+        """Pairs of independent steps that run at the same time in schedule."""
+        times = self.schedule()
+        pairs = []
+        for step in self.steps:
+            for other in self.steps[step.index + 1:]:
+                if step.index in other.after:
+                    continue
+                (start, end), (other_start, other_end) = times[step.index], times[other.index]
+                if start < other_end and other_start < end:
+                    pairs.append((step, other))
+        return pairs
+
+    def merges(self) -> List[Tuple[WorkflowStep, WorkflowStep]]:
+        """Crane transfers A to B followed by B to C, with nothing done at B in between."""
+        pairs = []
+        for step in self.steps:
+            target = step.locations.get("target")
+            if step.action != "transfer" or target is None:
+                continue
+            # the next step using B is the one taking the plate away
+            following = next(
+                (
+                    other
+                    for other in self.steps[step.index + 1:]
+                    if any(_same_place(target, place) for place in other.places)
+                ),
+                None,
+            )
+            if (
+                following is not None
+                and following.node == step.node
+                and following.action == "transfer"
+                and following.locations.get("source") == target
+            ):
+                pairs.append((step, following))
+        return pairs
+
+    def idle_moves(self) -> List[WorkflowStep]:
+        """Crane moves directly followed by another step of the same crane."""
+        return [
+            step
+            for step, following in zip(self.steps, self.steps[1:])
+            if step.action == "move" and following.node == step.node
+        ]
+
+    def __str__(self) -> str:
+        """Overlapping steps, merges and the overlapped ordering as a text report."""
+        times = self.schedule()
+        sequential, overlapped = self.sequential_duration(), self.overlapped_duration()
+        lines = [
+            f"{self.path.name}: {len(self.steps)} steps, {_format(sequential)} run in order, "
+            f"{_format(overlapped)} with independent steps overlapped"
+        ]
+        overlaps = self.overlaps()
+        if overlaps:
+            lines.append("  Steps that can overlap:")
+            for step, other in overlaps:
+                lines.append(f"    {_label(step)}  ||  {_label(other)}")
+        for step, other in self.merges():
+            lines.append(
+                f"  Transfers that can be merged: {_label(step)} and {_label(other)} "
+                f"({step.locations['source']} -> {step.locations['target']} -> {other.locations['target']})"
+            )
+        for step in self.idle_moves():
+            lines.append(f"  Crane move directly followed by another step of the crane: {_label(step)}")
+        if overlaps:
+            lines.append("  Overlapped ordering:")
+            for step in self.ordering():
+                start, end = times[step.index]
+                lines.append(f"    {_format(start):>8} - {_format(end):<8} {_label(step)}")
+        return "\n".join(lines)
+
+
+def _format(seconds: float) -> str:
+    return str(datetime.timedelta(seconds=round(seconds)))
+
+
+def _label(step: WorkflowStep) -> str:
+    return f"{step.index + 1}. {step.name.strip()} ({step.node} {step.action})"
+
+
+def analyze_workflow(workflow_path, durations: Optional[ActionDurations] = None) -> WorkflowAnalysis:
+    """analyze_workflow
+
+    Description: Builds the dependency graph of the steps of a workflow YAML
+
+    Args:
+        workflow_path (str | Path): the workflow YAML
+        durations (ActionDurations): time taken by each node action (default: 60 seconds each)
+
+    Returns:
+        WorkflowAnalysis: the steps, their dependencies and what they allow
+    """
+    durations = durations or ActionDurations()
+    with open(workflow_path, "r") as workflow_file:
+        workflow = yaml.load(workflow_file, Loader=YAML_LOADER)
+
+    steps: List[WorkflowStep] = []
+    for definition in workflow.get("steps") or []:
+        node, action = definition.get("node", ""), definition.get("action", "")
+        locations = {key: value for key, value in (definition.get("locations") or {}).items() if value}
+        places = frozenset(locations.values()) or NODE_PLACES.get(node, frozenset())
+        step = WorkflowStep(
+            index=len(steps),
+            name=definition.get("name", ""),
+            node=node,
+            action=action,
+            places=places,
+            barrier=action == "move" or not places,
+            duration=durations.duration(node, action),
+            locations=locations,
+        )
+        step.depends = frozenset(other.index for other in steps if _conflict(step, other))
+        step.after = step.depends.union(*(steps[index].after for index in step.depends))
+        steps.append(step)
+    return WorkflowAnalysis(Path(workflow_path), steps)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Finds the steps of workflow YAMLs that could overlap or be merged."
+    )
+    parser.add_argument("workflows", nargs="+", type=Path, help="workflow YAML files")
+    parser.add_argument(
+        "--durations",
+        type=Path,
+        default=Path(__file__).resolve().parents[1] / "simulation.yaml",
+        help="action durations YAML (default: simulation.yaml of the AMES_TEST application)",
+    )
+    args = parser.parse_args()
+
+    durations = ActionDurations.from_yaml(args.durations)
+    print("\n\n".join(str(analyze_workflow(workflow, durations)) for workflow in args.workflows))
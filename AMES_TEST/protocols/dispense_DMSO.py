@@ -1,39 +1,27 @@
 """
 Generates SOLO .hso instruction file.
 """
-from liquidhandling import SoloSoft
-from liquidhandling import DeepBlock_96VWR_75870_792_sterile
+from helper_functions.plan_optimizer import optimize
+from helper_functions.plate_layout import dilution_columns
+from helper_functions.transfer_plan import TransferPlan
+from helper_functions.well_maps import DEEPWELL_96, cell_volumes
 
+from rapid350.solo_protocol import generate_from_plan
 
-# SOLO PROTOCOL STEPS
-def generate_hso_file(
-        payload,
-        temp_file_path,
-):
-    """generate_hso_file
+
+def transfer_plan(payload):
+    """transfer_plan
 
     Description:
         Dispenses DMSO into dilution column wells of a substrate replicate plate using SOLO liquid handler.
 
     Args:
-        payload (dict): input variables from the wei workflow (not used in demo)
-        temp_file_path (str): file path to temporarily save hso file to
-    """
-    # * Initialize soloSoft deck layout
-    soloSoft = SoloSoft(
-        filename=temp_file_path,
-        plateList=[
-            "48well_deepwell",
-            "Biorad_384_well_HSP3905",       # assay plate
-            "DeepBlock.96.VWR-75870-792.sterile",  # dilution plate
-            "DeepBlock.96.VWR-75870-792.sterile",       # stock plate: DMSO, control, and test compounds
-            "TipBox.180uL.Axygen-EVF-180-R-S.bluebox",       # 180uL tip box
-            "DeepBlock.96.VWR-75870-792.sterile",       # cells stock plate
-            "Empty",
-            "Empty",
-        ],
-    )
+        payload (dict): input variables from the wei workflow, uses "samples" or "dilution_column" (default 1)
+            and "optimize_transfers" (default True)
 
+    Returns:
+        TransferPlan: the steps of the protocol
+    """
     flat_bottom_z_shift = 2  # Note: 1 is not high enough (tested)
 
     dmso_stock_location = "Position4"  # Location of the DMSO stock plate
@@ -41,48 +29,69 @@ def generate_hso_file(
     dmso_uL_volumes = [0, 0, 136.7, 136.7, 136.7, 136.7, 136.7, 200]  # DMSO volumes for each well in column 1
 
     dilution_plate_location = "Position3"  # Location of the dilution plate
-    dilution_column = 1  # Column in the dilution plate to dispense DMSO
     rows = ["A", "B", "C", "D", "E", "F", "G", "H"]  # Rows in the dilution plate
 
     # ACTIONS
-    # 1. Dispense DMSO into each well of dilution column with single channel transfers
-    soloSoft.getTip("Position5", num_tips=1)  # same tip for all transfers
-    for i in range(len(dmso_uL_volumes)):
-        if dmso_uL_volumes[i] > 0:
-            if dmso_uL_volumes[i] > 180:
-                # do two transfers of half the volume, same tip for both transfers
-                # Note: this is a workaround for the 180 uL tip box limitation
-                transfer_volume = dmso_uL_volumes[i] / 2
-                for j in range(2):
-                    soloSoft.aspirate(
+    plan = TransferPlan()
+    # 1. Dispense DMSO into each well of the dilution columns with single channel transfers
+    plan.getTip("Position5", num_tips=1)  # same tip for all transfers
+    for dilution_column in dilution_columns(payload):
+        for i in range(len(dmso_uL_volumes)):
+            if dmso_uL_volumes[i] > 0:
+                if dmso_uL_volumes[i] > 180:
+                    # do two transfers of half the volume, same tip for both transfers
+                    # Note: this is a workaround for the 180 uL tip box limitation
+                    transfer_volume = dmso_uL_volumes[i] / 2
+                    for _ in range(2):
+                        plan.aspirate(
+                            position=dmso_stock_location,
+                            aspirate_volumes=cell_volumes(
+                                DEEPWELL_96, rows[i], dmso_stock_column, transfer_volume
+                            ),
+                            aspirate_shift=[0, 0, flat_bottom_z_shift],
+                        )
+                        plan.dispense(
+                            position=dilution_plate_location,
+                            dispense_volumes=cell_volumes(
+                                DEEPWELL_96, rows[i], dilution_column, transfer_volume
+                            ),
+                            dispense_shift=[0, 0, flat_bottom_z_shift],
+                        )
+                else:  # transfer all volume in one go
+                    plan.aspirate(
                         position=dmso_stock_location,
-                        aspirate_volumes=DeepBlock_96VWR_75870_792_sterile().setCell(
-                            rows[i], dmso_stock_column, transfer_volume
+                        aspirate_volumes=cell_volumes(
+                            DEEPWELL_96, rows[i], dmso_stock_column, dmso_uL_volumes[i]
                         ),
                         aspirate_shift=[0, 0, flat_bottom_z_shift],
                     )
-                    soloSoft.dispense(
+                    plan.dispense(
                         position=dilution_plate_location,
-                        dispense_volumes=DeepBlock_96VWR_75870_792_sterile().setCell(
-                            rows[i], dilution_column, transfer_volume
+                        dispense_volumes=cell_volumes(
+                            DEEPWELL_96, rows[i], dilution_column, dmso_uL_volumes[i]
                         ),
                         dispense_shift=[0, 0, flat_bottom_z_shift],
                     )
-            else:  # transfer all volume in one go
-                soloSoft.aspirate(
-                    position=dmso_stock_location,
-                    aspirate_volumes=DeepBlock_96VWR_75870_792_sterile().setCell(
-                        rows[i], dmso_stock_column, dmso_uL_volumes[i]
-                    ),
-                    aspirate_shift=[0, 0, flat_bottom_z_shift],
-                )
-                soloSoft.dispense(
-                    position=dilution_plate_location,
-                    dispense_volumes=DeepBlock_96VWR_75870_792_sterile().setCell(
-                        rows[i], dilution_column, dmso_uL_volumes[i]
-                    ),
-                    dispense_shift=[0, 0, flat_bottom_z_shift],
-                )
 
-    soloSoft.shuckTip()
-    soloSoft.savePipeline()
+    plan.shuckTip()
+    return optimize(plan) if payload.get("optimize_transfers", True) else plan
+
+
+# SOLO PROTOCOL STEPS
+def generate_hso_file(
+        payload,
+        temp_file_path=None,
+):
+    """generate_hso_file
+
+    Description:
+        Dispenses DMSO into dilution column wells of a substrate replicate plate using SOLO liquid handler.
+
+    Args:
+        payload (dict): input variables from the wei workflow, uses "samples" or "dilution_column" (default 1)
+        temp_file_path (str): optional file path to save the hso file to
+
+    Returns:
+        SoloSoft: the generated protocol
+    """
+    return generate_from_plan(transfer_plan(payload), "ames", temp_file_path)
@@ -2,59 +2,30 @@
 Generates SOLO .hso instruction file.
 
 """
-from liquidhandling import SoloSoft
-from liquidhandling import DeepBlock_96VWR_75870_792_sterile, PlateDefinition
-
-
-### helper plate definition class
-class Plate_48well_deepwell(PlateDefinition):
-    def __new__(cls, plate=None):
-        return PlateDefinition(
-            name="48well_deepwell",
-            plate=plate,
-            plate_height=44.1,
-            well_depth=39.7,
-            rows=8,
-            columns=6,
-            x_offset=4.5,
-            y_offset=0,
-            row_spacing=9,
-            column_spacing=18,
-            comments="Deep 48-well plate",
-        )
+from helper_functions.plan_optimizer import optimize
+from helper_functions.plate_layout import run_samples
+from helper_functions.transfer_plan import TransferPlan
+from helper_functions.well_maps import DEEPWELL_48, DEEPWELL_96, column_volumes
+
+from rapid350.solo_protocol import generate_from_plan
 
-# SOLO PROTOCOL STEPS
-def generate_hso_file(
-        payload,
-        temp_file_path,
-):
-    """generate_hso_file
+
+def transfer_plan(payload):
+    """transfer_plan
 
     Description:
          Dispenses cells from cell stock plate into exposure wells using SOLO liquid handler.
 
     Args:
-        payload (dict): input variables from the wei workflow (not used in demo)
-        temp_file_path (str): file path to temporarily save hso file to
+        payload (dict): input variables from the wei workflow, uses "samples" or "dilution_column" (default 1)
+            and "optimize_transfers" (default True)
+
+    Returns:
+        TransferPlan: the steps of the protocol
     """
     # general SOLO variables
     flat_bottom_z_shift = 2  # Note: 1 is not high enough (tested)
 
-    # * Initialize soloSoft deck layout
-    soloSoft = SoloSoft(
-        filename=temp_file_path,
-        plateList=[
-            "48well_deepwell",  # exposure/indicator plate
-            "Biorad_384_well_HSP3905",       # assay plate
-            "DeepBlock.96.VWR-75870-792.sterile",  # dilution plate
-            "DeepBlock.96.VWR-75870-792.sterile",       # stock plate: DMSO, control, and test compounds
-            "TipBox.180uL.Axygen-EVF-180-R-S.bluebox",       # 180uL tip box
-            "DeepBlock.96.VWR-75870-792.sterile",       # cells stock plate
-            "Empty",
-            "Empty",
-        ],
-    )
-
     # stock cells plate details
     cells_stock_location = "Position6"
     cells_stock_column = 1    # Cell stock needs to be in each well of column 1, at least 800uL+ per well
@@ -66,22 +37,25 @@ def generate_hso_file(
 
     # compound serial dilution plate details
     dilution_plate_location = "Position3"  # Location of the dilution plate
-    dilution_column = 1  # Column in the dilution plate to dispense DMSO
     dilution_transfer_volume = 10   # 10uL
 
+    # exposure column and dilution column of each sample of this run
+    samples = run_samples(payload)
+
     # mix variables
     mix_cycles = 10
     mix_volume = 150
 
     # ACTIONS
-    # 1. Dispense 240 ul cells into each well of exposure columns 1,2, and 3
-    soloSoft.getTip("Position5")  # 8-channel transfer, same tips for all transfers
-    for i in range(3): # three destination columns (1,2,3)
-        for j in range(2):  # two transfers needed, 120ul each time
-            soloSoft.aspirate(
+    plan = TransferPlan()
+    # 1. Dispense 240 ul cells into each well of the exposure columns (1, 2, and 3 by default)
+    plan.getTip("Position5")  # 8-channel transfer, same tips for all transfers
+    for sample in samples:
+        for _ in range(2):  # two transfers needed, 120ul each time
+            plan.aspirate(
                 position=cells_stock_location,
-                aspirate_volumes=DeepBlock_96VWR_75870_792_sterile().setColumn(
-                    cells_stock_column, half_cells_transfer_volume
+                aspirate_volumes=column_volumes(
+                    DEEPWELL_96, cells_stock_column, half_cells_transfer_volume
                 ),
                 aspirate_shift=[0, 0, flat_bottom_z_shift],
                 mix_at_start = True,
@@ -89,21 +63,21 @@ def generate_hso_file(
                 mix_volume = mix_volume,
                 dispense_height = flat_bottom_z_shift
             )
-            soloSoft.dispense(
+            plan.dispense(
                 position=exposure_indicator_plate_location,
-                dispense_volumes=Plate_48well_deepwell().setColumn(
-                    (i + 1) , half_cells_transfer_volume
+                dispense_volumes=column_volumes(
+                    DEEPWELL_48, sample["exposure_column"], half_cells_transfer_volume
                 ),
                 dispense_shift=[0, 0, flat_bottom_z_shift],
             )
 
-    # 2. dispense 10ul serial diluted compound into exposure columns 1, 2, and 3
-    for i in range(3):
-        soloSoft.getTip("Position5")
-        soloSoft.aspirate(
+    # 2. dispense 10ul serial diluted compound into each exposure column, from the sample's dilution column
+    for sample in samples:
+        plan.getTip("Position5")
+        plan.aspirate(
             position=dilution_plate_location,
-            aspirate_volumes=DeepBlock_96VWR_75870_792_sterile().setColumn(
-                dilution_column, dilution_transfer_volume
+            aspirate_volumes=column_volumes(
+                DEEPWELL_96, sample["dilution_column"], dilution_transfer_volume
             ),
             aspirate_shift=[0, 0, flat_bottom_z_shift],
             mix_at_start = True,
@@ -111,10 +85,10 @@ def generate_hso_file(
             mix_volume = mix_volume,
             dispense_height = flat_bottom_z_shift
         )
-        soloSoft.dispense(
+        plan.dispense(
             position=exposure_indicator_plate_location,
-            dispense_volumes=Plate_48well_deepwell().setColumn(
-                (i + 1), dilution_transfer_volume
+            dispense_volumes=column_volumes(
+                DEEPWELL_48, sample["exposure_column"], dilution_transfer_volume
             ),
             dispense_shift=[0, 0, flat_bottom_z_shift],
             mix_at_finish = True,
@@ -123,5 +97,25 @@ def generate_hso_file(
             aspirate_height = flat_bottom_z_shift,
         )
 
-    soloSoft.shuckTip()
-    soloSoft.savePipeline()
+    plan.shuckTip()
+    return optimize(plan) if payload.get("optimize_transfers", True) else plan
+
+
+# SOLO PROTOCOL STEPS
+def generate_hso_file(
+        payload,
+        temp_file_path=None,
+):
+    """generate_hso_file
+
+    Description:
+         Dispenses cells from cell stock plate into exposure wells using SOLO liquid handler.
+
+    Args:
+        payload (dict): input variables from the wei workflow, uses "samples" or "dilution_column" (default 1)
+        temp_file_path (str): optional file path to save the hso file to
+
+    Returns:
+        SoloSoft: the generated protocol
+    """
+    return generate_from_plan(transfer_plan(payload), "ames", temp_file_path)
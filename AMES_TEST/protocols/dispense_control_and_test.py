@@ -1,38 +1,27 @@
 """
 Generates SOLO .hso instruction file.
 """
-from liquidhandling import SoloSoft
-from liquidhandling import DeepBlock_96VWR_75870_792_sterile
+from helper_functions.plan_optimizer import optimize
+from helper_functions.plate_layout import dilutions
+from helper_functions.transfer_plan import TransferPlan
+from helper_functions.well_maps import DEEPWELL_96, cell_volumes
 
-# SOLO PROTOCOL STEPS
-def generate_hso_file(
-        payload,
-        temp_file_path,
-):
-    """generate_hso_file
+from rapid350.solo_protocol import generate_from_plan
+
+
+def transfer_plan(payload):
+    """transfer_plan
 
     Description:
         Dispenses control and test compound into dilution column wells of a substrate replicate plate using SOLO liquid handler.
 
     Args:
-        payload (dict): input variables from the wei workflow (not used in demo)
-        temp_file_path (str): file path to temporarily save hso file to
-    """
-    # * Initialize soloSoft deck layout
-    soloSoft = SoloSoft(
-        filename=temp_file_path,
-        plateList=[
-            "48well_deepwell",
-            "Biorad_384_well_HSP3905",       # assay plate
-            "DeepBlock.96.VWR-75870-792.sterile",  # dilution plate
-            "DeepBlock.96.VWR-75870-792.sterile",       # stock plate: DMSO, control, and test compounds
-            "TipBox.180uL.Axygen-EVF-180-R-S.bluebox",       # 180uL tip box
-            "DeepBlock.96.VWR-75870-792.sterile",       # cells stock plate
-            "Empty",
-            "Empty",
-        ],
-    )
+        payload (dict): input variables from the wei workflow, uses "samples" or "dilution_column" (default 1), "test_stock_row" (default "A") and "test_stock_column" (default 3)
+            and "optimize_transfers" (default True)
 
+    Returns:
+        TransferPlan: the steps of the protocol
+    """
     flat_bottom_z_shift = 2  # Note: 1 is not high enough (tested)
 
     control_stock_location = "Position4"  # Location of the control stock plate
@@ -41,52 +30,74 @@ def generate_hso_file(
     control_transfer_volume = 200  # Volume of control compound to transfer into dilution column wells
 
     test_stock_location = "Position4"  # Location of the test stock plate
-    test_stock_row = "A"  # Row in the test stock plate containing test compound
-    test_stock_column = 3  # Column in the test stock plate containing test compound
     test_compound_volume = 200  # Test compound volumes for each well in column 1
+    # stock well (test_stock_row, test_stock_column) of the test compound of each dilution column of this run
+    run_dilutions = dilutions(payload)
 
     dilution_plate_location = "Position3"  # Location of the dilution plate
-    dilution_column = 1  # Column in the dilution plate to dispense DMSO
 
     rows = ["A", "B", "C", "D", "E", "F", "G", "H"]  # Rows in the dilution plate
 
     # ACTIONS
-    # 1. Dispense control compound into dilution plate, well in row A
-    soloSoft.getTip("Position5", num_tips=1)
-    for i in range(2):
-        soloSoft.aspirate(
-            position=control_stock_location,
-            aspirate_volumes=DeepBlock_96VWR_75870_792_sterile().setCell(
-                control_stock_row, control_stock_column, (control_transfer_volume/2)
-            ),
-            aspirate_shift=[0, 0, flat_bottom_z_shift],
-        )
-        soloSoft.dispense(
-            position=dilution_plate_location,
-            dispense_volumes=DeepBlock_96VWR_75870_792_sterile().setCell(
-                rows[0], dilution_column, (control_transfer_volume/2)
-            ),
-            dispense_shift=[0, 0, flat_bottom_z_shift],
-        )
-    soloSoft.shuckTip()
-
-    # 2. Dispense test compound into dilution plate, well in row B
-    soloSoft.getTip("Position5", num_tips=1)
-    for i in range(2):
-        soloSoft.aspirate(
-            position=test_stock_location,
-            aspirate_volumes=DeepBlock_96VWR_75870_792_sterile().setCell(
-                test_stock_row, test_stock_column, (test_compound_volume/2)
-            ),
-            aspirate_shift=[0, 0, flat_bottom_z_shift],
-        )
-        soloSoft.dispense(
-            position=dilution_plate_location,
-            dispense_volumes=DeepBlock_96VWR_75870_792_sterile().setCell(
-                rows[1], dilution_column, (test_compound_volume/2)
-            ),
-            dispense_shift=[0, 0, flat_bottom_z_shift],
-        )
-
-    soloSoft.shuckTip()
-    soloSoft.savePipeline()
+    plan = TransferPlan()
+    # 1. Dispense control compound into dilution plate, well in row A of each dilution column
+    plan.getTip("Position5", num_tips=1)
+    for dilution in run_dilutions:
+        for _ in range(2):
+            plan.aspirate(
+                position=control_stock_location,
+                aspirate_volumes=cell_volumes(
+                    DEEPWELL_96, control_stock_row, control_stock_column, (control_transfer_volume/2)
+                ),
+                aspirate_shift=[0, 0, flat_bottom_z_shift],
+            )
+            plan.dispense(
+                position=dilution_plate_location,
+                dispense_volumes=cell_volumes(
+                    DEEPWELL_96, rows[0], dilution["dilution_column"], (control_transfer_volume/2)
+                ),
+                dispense_shift=[0, 0, flat_bottom_z_shift],
+            )
+    plan.shuckTip()
+
+    # 2. Dispense each test compound into dilution plate, well in row B of its dilution column, new tip per compound
+    for dilution in run_dilutions:
+        plan.getTip("Position5", num_tips=1)
+        for _ in range(2):
+            plan.aspirate(
+                position=test_stock_location,
+                aspirate_volumes=cell_volumes(
+                    DEEPWELL_96, dilution["test_stock_row"], dilution["test_stock_column"], (test_compound_volume/2)
+                ),
+                aspirate_shift=[0, 0, flat_bottom_z_shift],
+            )
+            plan.dispense(
+                position=dilution_plate_location,
+                dispense_volumes=cell_volumes(
+                    DEEPWELL_96, rows[1], dilution["dilution_column"], (test_compound_volume/2)
+                ),
+                dispense_shift=[0, 0, flat_bottom_z_shift],
+            )
+
+        plan.shuckTip()
+    return optimize(plan) if payload.get("optimize_transfers", True) else plan
+
+
+# SOLO PROTOCOL STEPS
+def generate_hso_file(
+        payload,
+        temp_file_path=None,
+):
+    """generate_hso_file
+
+    Description:
+        Dispenses control and test compound into dilution column wells of a substrate replicate plate using SOLO liquid handler.
+
+    Args:
+        payload (dict): input variables from the wei workflow, uses "samples" or "dilution_column" (default 1), "test_stock_row" (default "A") and "test_stock_column" (default 3)
+        temp_file_path (str): optional file path to save the hso file to
+
+    Returns:
+        SoloSoft: the generated protocol
+    """
+    return generate_from_plan(transfer_plan(payload), "ames", temp_file_path)
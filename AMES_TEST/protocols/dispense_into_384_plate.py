@@ -1,40 +1,31 @@
 """
 Generates SOLO .hso instruction file.
 """
-from liquidhandling import SoloSoft
-from liquidhandling import Plate_384_Corning_3540_BlackwClearBottomAssay, DeepBlock_96VWR_75870_792_sterile
+from helper_functions.plan_optimizer import optimize
+from helper_functions.transfer_plan import MAX_SOLO_STEPS, TransferPlan
+from helper_functions.well_maps import DEEPWELL_96, PLATE_384, column_volumes
 
+from rapid350.solo_protocol import generate_from_plan
 
-# SOLO PROTOCOL STEPS
-def generate_hso_file(
-        payload,
-        temp_file_path,
-):
-    """generate_hso_file
+# 384 well plate columns filled by default: 1-12, then every other column of 13-24
+FILLED_COLUMNS = list(range(1, 13)) + list(range(13, 25, 2))
+
+
+def transfer_plan(payload):
+    """transfer_plan
 
     Description:
-        Dispenses 50uL from each well in a 96 well plate into a 384 well plate,
-        dispensing into every other well (i.e. A1, A3, A5...B1, B3, B5... etc)
+        All the steps filling a 384 well plate from one indicator column, before
+        they are split into SOLO-safe protocol files
 
     Args:
-        payload (dict): input variables from the wei workflow (not used in demo)
-        temp_file_path (str): file path to temporarily save hso file to
-    """
-    # * Initialize soloSoft deck layout
-    soloSoft = SoloSoft(
-        filename=temp_file_path,
-        plateList=[
-            "48well_deepwell",
-            "Biorad_384_well_HSP3905",       # assay plate
-            "DeepBlock.96.VWR-75870-792.sterile",  # dilution plate
-            "DeepBlock.96.VWR-75870-792.sterile",       # stock plate: DMSO, control, and test compounds
-            "TipBox.180uL.Axygen-EVF-180-R-S.bluebox",       # 180uL tip box
-            "DeepBlock.96.VWR-75870-792.sterile",       # cells stock plate
-            "Empty",
-            "Empty",
-        ],
-    )
+        payload (dict): input variables from the wei workflow, uses "current_indicator_column",
+            "plate_columns" (384 well plate columns to fill, default FILLED_COLUMNS)
+            and "optimize_transfers" (default True)
 
+    Returns:
+        TransferPlan: the steps of the whole fill
+    """
     # variables
     z_shift = 2
     transfer_volume = 50
@@ -43,86 +34,87 @@ def generate_hso_file(
     exposure_indicator_plate_location = "Position1"
 
     current_indicator_column = payload["current_indicator_column"]
-    half = payload["half"]  # 'A' or 'B' half of the 96 well plate
-    plate = Plate_384_Corning_3540_BlackwClearBottomAssay()
+    plate_columns = payload.get("plate_columns", FILLED_COLUMNS)
 
     # ACTIONS
-    soloSoft.getTip("Position5")
-
-    # 1. Aspirate and dispense into first half of the 384 well plate
-    # NOTE: SoloSoft will crash if too many steps are included in one file
-    if half == 1:
-        for i in range(1,13):  # first half of the 384 well plate
-            # 1a. Aspirate 100uL from indicator plate column
-            soloSoft.aspirate(
-                position=exposure_indicator_plate_location,
-                aspirate_volumes=DeepBlock_96VWR_75870_792_sterile().setColumn(
-                    current_indicator_column, transfer_volume * 2
-                ),
-                aspirate_shift=[0, 0, z_shift],  # flat bottom z shift works here
-                mix_at_start=True,
-                mix_cycles=mix_cycles,
-                mix_volume=mix_volume_at_start,
-                dispense_height = z_shift,
-            )
-
-            # 1b. Dispense 50uL into each well rows (A,C,E,G,I,K,M,O) of 384 well plate column i
-            soloSoft.dispense(
-                position="Position2",
-                dispense_volumes=Plate_384_Corning_3540_BlackwClearBottomAssay().setColumn(
-                    i, transfer_volume
-                ),
-                dispense_shift=[0, 0, z_shift],
-            )
-
-            # 1c. Dispense 50uL into each well rows (B,D,F,H,J,L,N,P) of 384 well plate column i
-            dispense_volumes_startB = Plate_384_Corning_3540_BlackwClearBottomAssay().setColumn(
-                i, transfer_volume
-            )
-            dispense_volumes_startB[0][i-1] = 0  # edit dispense volumes to start at Row B
-            soloSoft.dispense(
-                position="Position2",
-                dispense_volumes=dispense_volumes_startB,
-                dispense_shift=[0, 0, 2]
-            )
-
-    # 2. Aspirate and dispense into second half of the 384 well plate
-    elif half == 2:
-        for i in range(13,25,2):  # there are 24 columns in 384 well plate,
-            # 2a. Aspirate 100uL from indicator plate column
-            soloSoft.aspirate(
-                position=exposure_indicator_plate_location,
-                aspirate_volumes=DeepBlock_96VWR_75870_792_sterile().setColumn(
-                    current_indicator_column, transfer_volume * 2
-                ),
-                aspirate_shift=[0, 0, z_shift],  
-                mix_at_start=True,
-                mix_cycles=mix_cycles,
-                mix_volume=mix_volume_at_start,
-                dispense_height = z_shift,
-            )
-
-            # 2b. Dispense 50uL into each well rows (A,C,E,G,I,K,M,O) of 384 well plate column i
-            soloSoft.dispense(
-                position="Position2",
-                dispense_volumes=Plate_384_Corning_3540_BlackwClearBottomAssay().setColumn(
-                    i, transfer_volume
-                ),
-                dispense_shift=[0, 0, 2],
-            )
-
-            # 2c. Dispense 50uL into each well rows (B,D,F,H,J,L,N,P) of 384 well plate column i
-            dispense_volumes_startB = Plate_384_Corning_3540_BlackwClearBottomAssay().setColumn(
-                i, transfer_volume
-            )
-            dispense_volumes_startB[0][i-1] = 0  # edit dispense volumes to start at Row B
-            soloSoft.dispense(
-                position="Position2",
-                dispense_volumes=dispense_volumes_startB,
-                dispense_shift=[0, 0, 2]
-            )
-
-    soloSoft.shuckTip()
-    soloSoft.savePipeline()
+    plan = TransferPlan()
+    plan.getTip("Position5")
+
+    # 1. Aspirate and dispense into each column of the 384 well plate
+    for i in plate_columns:
+        # 1a. Aspirate 100uL from indicator plate column
+        plan.aspirate(
+            position=exposure_indicator_plate_location,
+            aspirate_volumes=column_volumes(
+                DEEPWELL_96, current_indicator_column, transfer_volume * 2
+            ),
+            aspirate_shift=[0, 0, z_shift],  # flat bottom z shift works here
+            mix_at_start=True,
+            mix_cycles=mix_cycles,
+            mix_volume=mix_volume_at_start,
+            dispense_height = z_shift,
+        )
+
+        # 1b. Dispense 50uL into each well rows (A,C,E,G,I,K,M,O) of 384 well plate column i
+        plan.dispense(
+            position="Position2",
+            dispense_volumes=column_volumes(
+                PLATE_384, i, transfer_volume
+            ),
+            dispense_shift=[0, 0, z_shift],
+        )
+
+        # 1c. Dispense 50uL into each well rows (B,D,F,H,J,L,N,P) of 384 well plate column i
+        plan.dispense(
+            position="Position2",
+            dispense_volumes=column_volumes(
+                PLATE_384, i, transfer_volume, first_row="B"  # dispense volumes start at Row B
+            ),
+            dispense_shift=[0, 0, z_shift]
+        )
+
+    plan.shuckTip()
+    return optimize(plan) if payload.get("optimize_transfers", True) else plan
+
+
+def count_chunks(payload):
+    """count_chunks
+
+    Description:
+        Number of SOLO protocol files the 384 well plate fill is split into
+
+    Args:
+        payload (dict): input variables from the wei workflow, uses "current_indicator_column",
+            "plate_columns" and "max_solo_steps" (default MAX_SOLO_STEPS)
 
+    Returns:
+        int: number of chunks, each one run by its own generate_hso_file call
+    """
+    return len(transfer_plan(payload).chunks(payload.get("max_solo_steps", MAX_SOLO_STEPS)))
+
+
+# SOLO PROTOCOL STEPS
+def generate_hso_file(
+        payload,
+        temp_file_path=None,
+):
+    """generate_hso_file
+
+    Description:
+        Dispenses 50uL from each well in a 96 well plate into a 384 well plate,
+        dispensing into every other well (i.e. A1, A3, A5...B1, B3, B5... etc).
+        SoloSoft will crash if too many steps are included in one file, so the
+        fill is split into count_chunks(payload) files and this generates one of them.
 
+    Args:
+        payload (dict): input variables from the wei workflow, uses "current_indicator_column",
+            "plate_columns", "chunk" (0 based index of the file to generate, default 0) and "max_solo_steps"
+            (default MAX_SOLO_STEPS)
+        temp_file_path (str): optional file path to save the hso file to
+
+    Returns:
+        SoloSoft: the generated protocol
+    """
+    plan = transfer_plan(payload)
+    chunks = plan.chunks(payload.get("max_solo_steps", MAX_SOLO_STEPS))
+    return generate_from_plan(plan, "ames", temp_file_path, chunks[payload.get("chunk", 0)])
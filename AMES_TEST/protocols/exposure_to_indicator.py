@@ -1,66 +1,36 @@
 """
 Generates SOLO .hso instruction file.
 
-TODO: 
-- After contents from expose wells dispensed into indicator wells, 
+TODO:
+- After contents from expose wells dispensed into indicator wells,
 complete 15 aspirate dispense cycles within the same indicator column
 aspirating 180uL from the bottom and dispensing at the top of the wells.
 """
-from liquidhandling import SoloSoft
-from liquidhandling import PlateDefinition
-
-
-# Helper plate definition class
-class Plate_48well_deepwell(PlateDefinition):
-    def __new__(cls, plate=None):
-        return PlateDefinition(
-            name="48well_deepwell",
-            plate=plate,
-            plate_height=44.1,
-            well_depth=39.7,
-            rows=8,
-            columns=6,
-            x_offset=4.5,
-            y_offset=0,
-            row_spacing=9,
-            column_spacing=18,
-            comments="Deep 48-well plate",
-        )
+from helper_functions.plan_optimizer import optimize
+from helper_functions.plate_layout import exposure_groups
+from helper_functions.transfer_plan import TransferPlan
+from helper_functions.well_maps import DEEPWELL_48, column_volumes
+
+from rapid350.solo_protocol import generate_from_plan
 
-# SOLO PROTOCOL STEPS
-def generate_hso_file(
-        payload,
-        temp_file_path,
-):
-    """generate_hso_file
+
+def transfer_plan(payload):
+    """transfer_plan
 
     Description:
         Dispenses contents of exposure wells into indicator wells.
 
     Args:
-        payload (dict): input variables from the wei workflow (not used in demo)
-        temp_file_path (str): file path to temporarily save hso file to
-    """
-    # * Initialize soloSoft deck layout
-    soloSoft = SoloSoft(
-        filename=temp_file_path,
-        plateList=[
-            "48well_deepwell",
-            "Biorad_384_well_HSP3905",       # assay plate
-            "DeepBlock.96.VWR-75870-792.sterile",  # dilution plate
-            "DeepBlock.96.VWR-75870-792.sterile",       # stock plate: DMSO, control, and test compounds
-            "TipBox.180uL.Axygen-EVF-180-R-S.bluebox",       # 180uL tip box
-            "DeepBlock.96.VWR-75870-792.sterile",       # cells stock plate
-            "Empty",
-            "Empty",
-        ],
-    )
+        payload (dict): input variables from the wei workflow, uses "samples" (default: exposure
+            columns 1, 2, 3 into indicator columns 4, 5, 6) and "optimize_transfers" (default True)
 
+    Returns:
+        TransferPlan: the steps of the protocol
+    """
     flat_bottom_z_shift = 2  # Note: 1 is not high enough (tested)
 
     exposure_indicator_plate_location = "Position1"
-    exposure_columns = [1,2,3]
-    indicator_columns = [4,5,6]
+    groups = exposure_groups(payload)  # (exposure column, indicator column) of each sample
     total_transfer_volume = 240
     half_total_transfer_volume = total_transfer_volume / 2
 
@@ -68,14 +38,15 @@ def generate_hso_file(
     mix_volume = 80
 
     # ACTIONS
-    # 1. Dispense all contents of exposure columns (1,2, and 3) into each well of indicator columns (1,2, and 3)
-    soloSoft.getTip("Position5")  # 8-channel transfer, same tips for all transfers
-    for i in range(3): # three destination columns (1,2,3)
-        for j in range(2):  # two transfers needed, 120ul each time
-            soloSoft.aspirate(
+    plan = TransferPlan()
+    # 1. Dispense all contents of exposure columns (1,2, and 3) into each well of indicator columns (4,5, and 6)
+    plan.getTip("Position5")  # 8-channel transfer, same tips for all transfers
+    for exposure_column, indicator_column in groups:
+        for _ in range(2):  # two transfers needed, 120ul each time
+            plan.aspirate(
                 position=exposure_indicator_plate_location,
-                aspirate_volumes=Plate_48well_deepwell().setColumn(
-                    exposure_columns[i], int(half_total_transfer_volume)
+                aspirate_volumes=column_volumes(
+                    DEEPWELL_48, exposure_column, int(half_total_transfer_volume)
                 ),
                 aspirate_shift=[0, 0, flat_bottom_z_shift],
                 mix_at_start = True,
@@ -86,10 +57,10 @@ def generate_hso_file(
                 move_while_pipetting=False,
                 move_distance=[0,0,0,]
             )
-            soloSoft.dispense(
+            plan.dispense(
                 position=exposure_indicator_plate_location,
-                dispense_volumes=Plate_48well_deepwell().setColumn(
-                    indicator_columns[i], int(half_total_transfer_volume)
+                dispense_volumes=column_volumes(
+                    DEEPWELL_48, indicator_column, int(half_total_transfer_volume)
                 ),
                 dispense_shift=[0, 0, flat_bottom_z_shift],
                 mix_at_finish = True,
@@ -98,5 +69,25 @@ def generate_hso_file(
                 aspirate_height = flat_bottom_z_shift,
             )
 
-    soloSoft.shuckTip()
-    soloSoft.savePipeline()
+    plan.shuckTip()
+    return optimize(plan) if payload.get("optimize_transfers", True) else plan
+
+
+# SOLO PROTOCOL STEPS
+def generate_hso_file(
+        payload,
+        temp_file_path=None,
+):
+    """generate_hso_file
+
+    Description:
+        Dispenses contents of exposure wells into indicator wells.
+
+    Args:
+        payload (dict): input variables from the wei workflow, uses "samples"
+        temp_file_path (str): optional file path to save the hso file to
+
+    Returns:
+        SoloSoft: the generated protocol
+    """
+    return generate_from_plan(transfer_plan(payload), "ames", temp_file_path)
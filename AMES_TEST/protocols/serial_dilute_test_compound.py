@@ -1,44 +1,30 @@
 """
 Generates SOLO .hso instruction file.
 """
-from liquidhandling import SoloSoft
-from liquidhandling import DeepBlock_96VWR_75870_792_sterile
+from helper_functions.plan_optimizer import optimize
+from helper_functions.plate_layout import dilution_columns
+from helper_functions.transfer_plan import TransferPlan
+from helper_functions.well_maps import DEEPWELL_96, cell_volumes
 
+from rapid350.solo_protocol import generate_from_plan
 
-# SOLO PROTOCOL STEPS
-def generate_hso_file(
-        payload,
-        temp_file_path,
-):
-    """generate_hso_file
+
+def transfer_plan(payload):
+    """transfer_plan
 
     Description:
         Serial dilutes test compound into dilution column wells of a substrate replicate plate using SOLO liquid handler single transfers.
 
     Args:
-        payload (dict): input variables from the wei workflow (not used in demo)
-        temp_file_path (str): file path to temporarily save hso file to
-    """
+        payload (dict): input variables from the wei workflow, uses "samples" or "dilution_column" (default 1)
+            and "optimize_transfers" (default True)
 
-    # * Initialize soloSoft deck layout
-    soloSoft = SoloSoft(
-        filename=temp_file_path,
-        plateList=[
-            "48well_deepwell",
-            "Biorad_384_well_HSP3905",       # assay plate
-            "DeepBlock.96.VWR-75870-792.sterile",  # dilution plate
-            "DeepBlock.96.VWR-75870-792.sterile",       # stock plate: DMSO, control, and test compounds
-            "TipBox.180uL.Axygen-EVF-180-R-S.bluebox",       # 180uL tip box
-            "DeepBlock.96.VWR-75870-792.sterile",       # cells stock plate
-            "Empty",
-            "Empty",
-        ],
-    )
-
-    flat_bottom_z_shift = 2  
+    Returns:
+        TransferPlan: the steps of the protocol
+    """
+    flat_bottom_z_shift = 2
 
     dilution_plate_location = "Position3"  # Location of the dilution plate
-    dilution_column = 1  # Column in the dilution plate to dispense DMSO
     serial_transfer_volume = 63.3
 
     mix_volume = 150
@@ -47,27 +33,50 @@ def generate_hso_file(
     rows = ["A", "B", "C", "D", "E", "F", "G", "H"]  # Rows in the dilution plate
 
     # ACTIONS
-    # 1. Serial dilute test compound into dilution plate, wells in row B->G, using same tip, and mix
-    soloSoft.getTip("Position5", num_tips=1)
-    for i in range(1, 6):
-        soloSoft.aspirate(
-            position=dilution_plate_location,
-            aspirate_volumes=DeepBlock_96VWR_75870_792_sterile().setCell(
-                rows[i], dilution_column, serial_transfer_volume
-            ),
-            aspirate_shift=[0, 0, flat_bottom_z_shift],
-            mix_at_start= True,
-            mix_cycles=num_mixes,
-            mix_volume=mix_volume,
-            dispense_height = flat_bottom_z_shift
-        )
-        soloSoft.dispense(
-            position=dilution_plate_location,
-            dispense_volumes=DeepBlock_96VWR_75870_792_sterile().setCell(
-                rows[i + 1], dilution_column, serial_transfer_volume
-            ),
-            dispense_shift=[0, 0, flat_bottom_z_shift],
-        )
-
-    soloSoft.shuckTip()
-    soloSoft.savePipeline()
+    plan = TransferPlan()
+    # 1. Serial dilute test compound into dilution plate, wells in row B->G, using same tip, and mix,
+    # with a new tip for each dilution column of this run
+    for dilution_column in dilution_columns(payload):
+        plan.getTip("Position5", num_tips=1)
+        for i in range(1, 6):
+            plan.aspirate(
+                position=dilution_plate_location,
+                aspirate_volumes=cell_volumes(
+                    DEEPWELL_96, rows[i], dilution_column, serial_transfer_volume
+                ),
+                aspirate_shift=[0, 0, flat_bottom_z_shift],
+                mix_at_start= True,
+                mix_cycles=num_mixes,
+                mix_volume=mix_volume,
+                dispense_height = flat_bottom_z_shift
+            )
+            plan.dispense(
+                position=dilution_plate_location,
+                dispense_volumes=cell_volumes(
+                    DEEPWELL_96, rows[i + 1], dilution_column, serial_transfer_volume
+                ),
+                dispense_shift=[0, 0, flat_bottom_z_shift],
+            )
+
+        plan.shuckTip()
+    return optimize(plan) if payload.get("optimize_transfers", True) else plan
+
+
+# SOLO PROTOCOL STEPS
+def generate_hso_file(
+        payload,
+        temp_file_path=None,
+):
+    """generate_hso_file
+
+    Description:
+        Serial dilutes test compound into dilution column wells of a substrate replicate plate using SOLO liquid handler single transfers.
+
+    Args:
+        payload (dict): input variables from the wei workflow, uses "samples" or "dilution_column" (default 1)
+        temp_file_path (str): optional file path to save the hso file to
+
+    Returns:
+        SoloSoft: the generated protocol
+    """
+    return generate_from_plan(transfer_plan(payload), "ames", temp_file_path)
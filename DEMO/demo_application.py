@@ -0,0 +1,135 @@
+"""
+MADSci Experiment Application for the RAPID 350 Demo, shared by the Demo
+entry points, which only differ by the workflow they run:
+
+    python demo_exp_app_seal.py      # demo_with_seal_wf.yaml
+    python demo_exp_app_no_seal.py   # demo_wf.yaml
+"""
+
+import asyncio
+import datetime
+from pathlib import Path
+
+from madsci.experiment_application import (
+    ExperimentApplication,
+    ExperimentApplicationConfig,
+)
+from protocols import solo_transfer1
+from pydantic import AnyUrl
+
+from rapid350.async_workcell import AsyncWorkcell
+from rapid350.deck_layout import DeckLayout
+from rapid350.hso_functions import package_hso, staged_hso
+from rapid350.workflow_timeline import WorkflowTimeline
+
+
+class DemoApplication(ExperimentApplication):
+    """Experiment application of the RAPID 350 Demo, running demo_workflow"""
+
+    workflow_directory = Path("./workflows").resolve()
+    protocol_directory = Path("./protocols").resolve()
+
+    experiment_design = Path("./experiment_design.yaml")
+    deck_layout = Path("./deck_layout.yaml")
+    # the MADSci clients (experiment, workcell, ...) are created on first use
+    config = ExperimentApplicationConfig(node_url=AnyUrl("http://localhost:6000"))
+
+
+    url = "http://hudson01:8000"
+
+    # workflow of workflow_directory run by run_app, set by each entry point
+    demo_workflow = "demo_wf.yaml"
+
+    # Chrome trace timelines of the workflows and their steps, one file per run
+    timeline_directory = Path("./timelines").resolve()
+    timeline = None
+
+    def define_starting_resources(self):
+        """
+        Creates and places MADSci labware resources at the correct locations
+        at the start of the experiment application, as described in deck_layout.yaml.
+        Only labware missing from the resource server is created.
+
+        Starting resources layout:
+            Stack1: 3 empty microplates with lid
+                - Uses labware definition compatible with the PlateCrane module.
+        """
+        changes = DeckLayout.from_yaml(self.deck_layout).apply(self.location_client, self.resource_client)
+        for change in changes:
+            print(f"Starting resources: {change}")
+
+    async def run_protocol_workflow(self, workflow_path, parameters, hso_basename):
+        """
+        Generates the SOLO protocol, then submits the workflow and waits for it
+        to finish. The workflow and its steps are recorded on the timeline.
+
+        Args:
+            workflow_path (Path): workflow YAML running the SOLO protocol
+            parameters (dict): payload of the SOLO protocol, also providing the json inputs
+            hso_basename (str): file name of the uploaded SOLO protocol
+
+        Returns:
+            Workflow: the finished workflow
+        """
+        hso_contents, _, _ = await asyncio.to_thread(package_hso, solo_transfer1.generate_hso_file, parameters)
+
+        with staged_hso(hso_contents, hso_basename) as protocol_file:
+            return await AsyncWorkcell(self.workcell_client, timeline=self.timeline).run(
+                workflow_path,
+                file_inputs={
+                    "protocol_file": protocol_file,
+                },
+                json_inputs={
+                    "tip_box_position": parameters["tip_box_position"],
+                    "shaker_speed": parameters["shaker_speed"]
+                }
+            )
+
+    def run_app(self):
+        """
+        Creates the starting resources, then runs demo_workflow once, and
+        writes its timeline.
+        """
+        # Workflow path(s)
+        demo_wf = self.workflow_directory / self.demo_workflow
+
+        # Initial payload
+        parameters = {
+            "shaker_speed": 20, # an integer value setting the shaker speed of the Liconic Incubator
+            "tip_box_position": "5", # string of an integer 1-8 that identifies the position of the tip box when it is being refilled
+        }
+
+        # Create starting resources
+        self.define_starting_resources()
+
+        # Prep the SOLO protocol file, then run the Demo Workflow (Ctrl-C cancels it on the workcell)
+        self.timeline = WorkflowTimeline()
+        try:
+            asyncio.run(self.run_protocol_workflow(demo_wf, parameters, "demo_solo_temp1.hso"))
+        finally:
+            self.export_timeline()
+
+    def export_timeline(self):
+        """
+        Writes the timeline of the run to timeline_directory and prints the
+        time taken by each node action.
+        """
+        if self.timeline is None or not self.timeline.spans:
+            return
+        trace = self.timeline.export(
+            self.timeline_directory / f"{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+        )
+        print(f"Timeline written to {trace}, open it in https://ui.perfetto.dev")
+        print(self.timeline.format_summary("step", ("node", "action")))
+
+
+def main(experiment_app):
+    """Runs the Demo once with experiment_app, inside a MADSci experiment."""
+    current_time = datetime.datetime.now()
+
+    with experiment_app.manage_experiment(
+        run_name=f"Demo experiment app {current_time}",
+        run_description=f"Demo experiment application, started at ~{current_time}",
+    ):
+
+        experiment_app.run_app()
@@ -4,30 +4,25 @@
 MADSci Experiment Application to validate that all instruments on RAPID 350 function correctly.
 """
 
+import asyncio
 import datetime
 from pathlib import Path
 
-from helper_functions.hso_functions import package_hso
-from madsci.common.types.step_types import StepDefinition
-from madsci.common.types.workflow_types import WorkflowDefinition
 from madsci.experiment_application import (
     ExperimentApplication,
     ExperimentApplicationConfig,
 )
-from madsci.common.types.resource_types import Slot, Stack, Resource, Collection, Grid
-
-
-from madsci.client import (
-    ExperimentClient,
-    LocationClient,
-    ResourceClient,
-    WorkcellClient,
-)
-from protocols import (
-    solo_transfer1
-)
+from protocols import solo_transfer1
 from pydantic import AnyUrl
 
+from rapid350.async_workcell import AsyncWorkcell
+from rapid350.clock import WallClock
+from rapid350.datapoint_cache import CachedDataClient
+from rapid350.deck_layout import DeckLayout
+from rapid350.hidex_readings import ReadingsStore, parse_hidex_reading
+from rapid350.hso_functions import package_hso, staged_hso
+from rapid350.workflow_timeline import WorkflowTimeline
+
 
 class WorkcellValidationApplication(ExperimentApplication):
     """Experiment application AMES Test LDRD experiment"""
@@ -36,60 +31,70 @@ class WorkcellValidationApplication(ExperimentApplication):
     protocol_directory = Path("./protocols").resolve()
 
     experiment_design = Path("./experiment_design.yaml")
+    deck_layout = Path("./deck_layout.yaml")
+    # the MADSci clients (experiment, workcell, ...) are created on first use
     config = ExperimentApplicationConfig(node_url=AnyUrl("http://localhost:6000"))
-    experiment_client = ExperimentClient()
 
 
     url = "http://hudson01:8000"
 
-    def define_starting_resources(self): 
+    # Chrome trace timelines of the workflows and their steps, one file per run
+    timeline_directory = Path("./timelines").resolve()
+    timeline = None
+
+    # time of the app, a VirtualClock replaces it in tests
+    clock = WallClock()
+    # raw readings of every validation run, shared with the other applications for trend analysis
+    readings_store = ReadingsStore(Path("~/.local/share/rapid350_applications/hidex_readings").expanduser())
+    # datapoint values fetched from the data server, kept for re-analysis without network
+    datapoint_cache_directory = Path("~/.cache/rapid350_applications/datapoints").expanduser()
+
+    def define_starting_resources(self):
         """
-        Creates and places MADSci labware resources at the correct locations 
-        at the start of the experiment application.
+        Creates and places MADSci labware resources at the correct locations
+        at the start of the experiment application, as described in deck_layout.yaml.
+        Only labware missing from the resource server is created.
 
-        Starting resources layout: 
-            SOLO nest 1: deepwell plate
-            Stack1: 3 empty microplates with lid
+        Starting resources layout:
+            Stack1: 1 empty microplate with lid
                 - Uses labware definition compatible with the PlateCrane module.
         """
+        changes = DeckLayout.from_yaml(self.deck_layout).apply(self.location_client, self.resource_client)
+        for change in changes:
+            print(f"Starting resources: {change}")
 
-        # Create and place the three microplate resources.
-        microplates = []
-        for i in range(1):   # ONLY MAKE ONE 96-WELL PLATE RESOURCE FOR WC VALIDATION
-            # Create microplate lid resource.
-            current_lid_resource = Resource(
-                resource_name = f"microplate_lid_{i+1}",
-                resource_description="microplate lid",
-                attributes={
-                    "lid": True
-                }
-            )
+    async def run_protocol_workflow(self, workflow_path, parameters, hso_basename):
+        """
+        Generates the SOLO protocol, then submits the workflow and waits for it
+        to finish. The workflow and its steps are recorded on the timeline.
 
-            # Create 384-well microplate resource.
-            current_microplate_resource = Collection(
-                resource_name = f"microplate_96well_{i+1}", 
-                resource_description="96-well microplate resource used in the Demo experiment application.",
-                capacity=2,
-                children={
-                    "lid_slot": Slot(
-                        resource_name = "microplate_lid_slot",
-                        children=[current_lid_resource]
-                    )
+        Args:
+            workflow_path (Path): workflow YAML running the SOLO protocol
+            parameters (dict): payload of the SOLO protocol, also providing the json inputs
+            hso_basename (str): file name of the uploaded SOLO protocol
+
+        Returns:
+            Workflow: the finished workflow
+        """
+        hso_contents, _, _ = await asyncio.to_thread(package_hso, solo_transfer1.generate_hso_file, parameters)
+
+        with staged_hso(hso_contents, hso_basename) as protocol_file:
+            return await AsyncWorkcell(self.workcell_client, timeline=self.timeline, clock=self.clock).run(
+                workflow_path,
+                file_inputs={
+                    "protocol_file": protocol_file,
+                },
+                json_inputs={
+                    "tip_box_position": parameters["tip_box_position"],
+                    "shaker_speed": parameters["shaker_speed"]
                 }
             )
-            microplates.append(current_microplate_resource)
-
-        stack_1_resource_id = self.location_client.get_location_by_name(location_name="Stack1").resource_id
-        stack_1_resource = self.resource_client.get_resource(stack_1_resource_id)
-        
-        # FOR TESTING (remove from if block for real run!)
-        if not len(stack_1_resource.children) == 1: 
-            stack_1_resource.children = microplates   # NOTE: deletes any existing resource in the stack... a complete reset,
-            # TODO: it might work better to just push the plate resource onto the stack...
-            self.resource_client.update_resource(stack_1_resource)
 
     def run_app(self):
-
+        """
+        Creates the starting resources, runs the validation workflow once,
+        writes its timeline and stores the readings of its two Hidex reads.
+        """
         # Workflow path(s)
         validation_wf = self.workflow_directory / "validation_wf.yaml"
 
@@ -102,29 +107,59 @@ class WorkcellValidationApplication(ExperimentApplication):
         # Create starting resources
         self.define_starting_resources()
 
+        # Prep the SOLO protocol file, then run the Workcell Validation Workflow (Ctrl-C cancels it on the workcell)
+        self.timeline = WorkflowTimeline()
+        try:
+            workflow = asyncio.run(self.run_protocol_workflow(validation_wf, parameters, "validation_solo_temp1.hso"))
+        finally:
+            self.export_timeline()
 
-        # Prep SOLO protocol files
-        package_hso(solo_transfer1.generate_hso_file, parameters, "/home/rpl/workspace/madsci_temp/validation_solo_temp1.hso")
-        parameters["protocol_file"] = "/home/rpl/workspace/madsci_temp/validation_solo_temp1.hso"
-
-        # Run the Workcell Validation Workflow
-        workflow = self.workcell_client.submit_workflow(
-            workflow_definition = validation_wf,
-            file_inputs={
-                "protocol_file": parameters["protocol_file"],
-            },
-            json_inputs={
-                "tip_box_position": parameters["tip_box_position"],
-                "shaker_speed": parameters["shaker_speed"]
-            }
-        )
-
-        # Collect resulting 2 hidex data files 
+        # Collect resulting 2 hidex data files
         hidex_datapoint_1_id = workflow.get_datapoint_id(step_key="hidex_data_1", label="json_result")
         print(f"{hidex_datapoint_1_id=}")
         hidex_datapoint_2_id = workflow.get_datapoint_id(step_key="hidex_data_2", label="json_result")
         print(f"{hidex_datapoint_2_id=}")
+        self.store_hidex_readings(workflow, {"hidex_data_1": hidex_datapoint_1_id, "hidex_data_2": hidex_datapoint_2_id})
+
+    def store_hidex_readings(self, workflow, datapoint_ids):
+        """
+        Fetches the Hidex readings of a validation run and appends them to the
+        readings store, keyed by the workflow ID.
 
+        Args:
+            workflow (Workflow): the finished validation workflow
+            datapoint_ids (dict): datapoint ID of each hidex step key
+        """
+        data_client = CachedDataClient(self.data_client, self.datapoint_cache_directory)
+        for label, datapoint_id in datapoint_ids.items():
+            try:
+                readings = parse_hidex_reading(data_client.get_datapoint_value(datapoint_id), shape=(8, 12))
+            except Exception as error_msg:
+                # the datapoint stays on the data server, a failed copy does not fail the validation
+                print(f"Could not store Hidex readings {label}: {error_msg!r}")
+                continue
+            self.readings_store.append(
+                readings,
+                workflow.workflow_id,
+                "microplate_96well_1",
+                read_time=workflow.end_time or self.clock.now(),
+                datapoint_id=datapoint_id,
+                label=label,
+                source="workcell_validation",
+            )
+
+    def export_timeline(self):
+        """
+        Writes the timeline of the run to timeline_directory and prints the
+        time taken by each node action.
+        """
+        if self.timeline is None or not self.timeline.spans:
+            return
+        trace = self.timeline.export(
+            self.timeline_directory / f"{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+        )
+        print(f"Timeline written to {trace}, open it in https://ui.perfetto.dev")
+        print(self.timeline.format_summary("step", ("node", "action")))
 
 
 if __name__ == "__main__":
@@ -138,4 +173,4 @@ if __name__ == "__main__":
         run_description=f"Workcell validation experiment application, started at ~{current_time}",
     ):
 
-        experiment_app.run_app()
\ No newline at end of file
+        experiment_app.run_app()
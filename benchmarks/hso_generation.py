@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+
+"""
+Benchmarks of the SOLO protocol (.hso) generation of every experiment application.
+
+Each case generates one protocol for one payload variant, the way package_hso
+does without a cache (generate_hso_file, then render_hso), and measures:
+    - time: min and median over --repeat generations, after a warm-up
+    - peak memory: tracemalloc peak of one generation
+    - output: size of the .hso file, its lines and its SOLO steps
+
+Each application is benchmarked in its own process, started from its own
+directory like the application itself. The cold start of the entry points of
+each application (its protocols, the AMES plan command line and the
+experiment application module) is timed too, as the wall time of a new
+interpreter running them, min and median over --startup-repeat starts. An
+entry point that cannot start (e.g. MADSci is not installed) is reported and
+skipped. Results are compared with the
+baselines stored in hso_baselines.json, and a case is a regression when its
+min time, peak memory or output size grows beyond the thresholds. Timings
+depend on the machine: store baselines (--save) on the machine the
+benchmarks are compared on.
+
+Usage:
+    python benchmarks/hso_generation.py                 # compare with the stored baselines
+    python benchmarks/hso_generation.py -k 384          # only the cases matching "384"
+    python benchmarks/hso_generation.py -k startup      # only the cold starts
+    python benchmarks/hso_generation.py --save          # store the results as the new baselines
+"""
+
+import argparse
+import copy
+import importlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+REPOSITORY = Path(__file__).resolve().parent.parent
+BASELINES = Path(__file__).resolve().parent / "hso_baselines.json"
+
+# default payload of the first AMES run, as built by DionExperimentApplication.run_parameters
+AMES_PAYLOAD = {
+    "temp": 37.0,
+    "humidity": 95.0,
+    "shaker_speed": 20,
+    "stacker": 1,
+    "slot": 2,
+    "tip_box_position": "5",
+    "seal_time": 3,
+    "run_id": "run_1",
+    "dilution_column": 1,
+    "deepwell_id": "1",
+    "microplate_ids": ["2", "3", "4"],
+}
+AMES_VARIANTS = {
+    "run_1": {},
+    "run_12": {"run_id": "run_12", "dilution_column": 12, "test_stock_row": "B", "test_stock_column": 4},
+    "unoptimized": {"optimize_transfers": False},
+}
+AMES_384_VARIANTS = {
+    "column_4": {"microplate_id": "2", "current_indicator_column": 4},
+    "column_6": {"microplate_id": "4", "current_indicator_column": 6},
+    "column_4_unoptimized": {"microplate_id": "2", "current_indicator_column": 4, "optimize_transfers": False},
+    "column_4_single_file": {"microplate_id": "2", "current_indicator_column": 4, "max_solo_steps": 60},
+}
+SOLO_TRANSFER_PAYLOAD = {"shaker_speed": 20, "tip_box_position": "5"}
+
+# application -> protocol -> variant -> payload
+CASES = {
+    "AMES_TEST": {
+        **{
+            protocol: {name: {**AMES_PAYLOAD, **variant} for name, variant in AMES_VARIANTS.items()}
+            for protocol in [
+                "dispense_DMSO",
+                "dispense_control_and_test",
+                "serial_dilute_test_compound",
+                "dispense_cells_then_compound",
+                "exposure_to_indicator",
+            ]
+        },
+        # one case per protocol file the 384-well plate fill is split into (see count_chunks)
+        "dispense_into_384_plate": {
+            name: {**AMES_PAYLOAD, **variant} for name, variant in AMES_384_VARIANTS.items()
+        },
+    },
+    "DEMO": {"solo_transfer1": {"default": SOLO_TRANSFER_PAYLOAD}},
+    "WORKCELL_VALIDATION": {"solo_transfer1": {"default": SOLO_TRANSFER_PAYLOAD}},
+}
+
+# application -> entry point -> command line started cold, from the application directory
+STARTUP = {
+    "AMES_TEST": {
+        "protocols": ["-c", "import " + ", ".join(f"protocols.{protocol}" for protocol in CASES["AMES_TEST"])],
+        "plan": ["ames_runs.py", "--plan", "--runs", "3"],
+        "exp_app": ["-c", "import exp_app"],
+    },
+    "DEMO": {
+        "protocols": ["-c", "import protocols.solo_transfer1"],
+        "exp_app": ["-c", "import demo_exp_app_seal"],
+    },
+    "WORKCELL_VALIDATION": {
+        "protocols": ["-c", "import protocols.solo_transfer1"],
+        "exp_app": ["-c", "import workcell_validation_exp_app"],
+    },
+}
+
+
+def expand_chunks(module, variants):
+    """Splits the variants of a chunked protocol into one variant per protocol file."""
+    if not hasattr(module, "count_chunks"):
+        return variants
+    expanded = {}
+    for name, payload in variants.items():
+        for chunk in range(module.count_chunks(payload)):
+            expanded[f"{name}_chunk_{chunk + 1}"] = {**payload, "chunk": chunk}
+    return expanded
+
+
+def benchmark_case(generate, render, payload, repeat):
+    """benchmark_case
+
+    Description: Times one protocol and payload, then measures its peak memory and output
+
+    Args:
+        generate (callable): protocol generate_hso_file method
+        render (callable): render_hso, turning its SoloSoft object into .hso contents
+        payload (dict): payload of the protocol
+        repeat (int): number of timed generations
+
+    Returns:
+        result: (dict) min_s, median_s, peak_bytes, size_bytes, lines and steps
+    """
+    payloads = [copy.deepcopy(payload) for _ in range(repeat + 1)]
+    render(generate(payload=payloads.pop(), temp_file_path=None))  # warm-up (imports, caches)
+
+    times = []
+    for case_payload in payloads:
+        start = time.perf_counter()
+        render(generate(payload=case_payload, temp_file_path=None))
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        solo_soft = generate(payload=copy.deepcopy(payload), temp_file_path=None)
+        hso_contents = render(solo_soft)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "min_s": min(times),
+        "median_s": statistics.median(times),
+        "peak_bytes": peak,
+        "size_bytes": len(hso_contents.encode()),
+        "lines": len(hso_contents.splitlines()),
+        "steps": len(solo_soft.pipeline),
+    }
+
+
+def measure_startup(application, command, repeat):
+    """measure_startup
+
+    Description: Times cold starts of an application entry point, each in a new interpreter
+
+    Args:
+        application (str): directory of the application, started from
+        command (list of str): python arguments, e.g. ["-c", "import exp_app"]
+        repeat (int): number of timed starts
+
+    Returns:
+        result: (dict) min_s and median_s, or None if the entry point failed
+    """
+    environment = dict(os.environ)
+    # rapid350, when the repository is not installed
+    environment["PYTHONPATH"] = os.pathsep.join(filter(None, [str(REPOSITORY), environment.get("PYTHONPATH")]))
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, *command],
+            cwd=REPOSITORY / application,
+            env=environment,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        times.append(time.perf_counter() - start)
+        if process.returncode != 0:
+            error = process.stderr.strip().splitlines()[-1:] or [f"exit status {process.returncode}"]
+            print(f"{application} {' '.join(command)} failed: {error[0]}", file=sys.stderr)
+            return None
+    return {"min_s": min(times), "median_s": statistics.median(times)}
+
+
+def run_startup(repeat, pattern):
+    """Times the cold start of every entry point and returns the results by case."""
+    results = {}
+    for application, entry_points in STARTUP.items():
+        for entry_point, command in entry_points.items():
+            case = f"{application}/startup[{entry_point}]"
+            if pattern and pattern not in case:
+                continue
+            result = measure_startup(application, command, repeat)
+            if result is not None:
+                results[case] = result
+    return results
+
+
+def run_worker(application, repeat, pattern, output):
+    """Benchmarks the cases of one application, from its directory, and writes the results to output."""
+    application_directory = REPOSITORY / application
+    os.chdir(application_directory)
+    sys.path.insert(0, str(application_directory))
+    sys.path.insert(1, str(REPOSITORY))  # rapid350, when the repository is not installed
+    render = importlib.import_module("rapid350.hso_functions").render_hso
+
+    results = {}
+    for protocol, variants in CASES[application].items():
+        module = importlib.import_module(f"protocols.{protocol}")
+        for variant, payload in expand_chunks(module, variants).items():
+            case = f"{application}/{protocol}[{variant}]"
+            if pattern and pattern not in case:
+                continue
+            results[case] = benchmark_case(module.generate_hso_file, render, payload, repeat)
+    with open(output, "w") as output_file:
+        json.dump(results, output_file)
+
+
+def run_all(repeat, pattern):
+    """Benchmarks every application, each in its own process, and returns the results by case."""
+    results = {}
+    for application in CASES:
+        with tempfile.TemporaryDirectory() as directory:
+            output = Path(directory) / "results.json"
+            subprocess.run(
+                [
+                    sys.executable,
+                    str(Path(__file__).resolve()),
+                    "--worker",
+                    application,
+                    "--repeat",
+                    str(repeat),
+                    "-k",
+                    pattern or "",
+                    "--output",
+                    str(output),
+                ],
+                cwd=REPOSITORY / application,
+                check=True,
+                stdout=subprocess.DEVNULL,  # protocols print while they generate
+            )
+            with open(output, "r") as output_file:
+                results.update(json.load(output_file))
+    return results
+
+
+def _change(value, baseline):
+    return None if value is None or not baseline else value / baseline - 1
+
+
+def compare(results, baselines, time_threshold, memory_threshold, size_threshold):
+    """compare
+
+    Description: Compares results with their baselines
+
+    Args:
+        results (dict): benchmark results by case
+        baselines (dict): stored results by case
+        time_threshold (float): largest accepted growth of the min time, e.g. 0.25 for +25%
+        memory_threshold (float): largest accepted growth of the peak memory
+        size_threshold (float): largest accepted growth of the .hso size
+
+    Returns:
+        rows: (list of dict) case, measures, their changes and the regressed measures
+    """
+    rows = []
+    for case, result in results.items():
+        baseline = baselines.get(case, {})
+        changes = {
+            "time": _change(result["min_s"], baseline.get("min_s")),
+            "memory": _change(result.get("peak_bytes"), baseline.get("peak_bytes")),
+            "size": _change(result.get("size_bytes"), baseline.get("size_bytes")),
+        }
+        thresholds = {"time": time_threshold, "memory": memory_threshold, "size": size_threshold}
+        regressions = [
+            measure
+            for measure, change in changes.items()
+            if change is not None and change > thresholds[measure]
+        ]
+        rows.append({"case": case, **result, "changes": changes, "regressions": regressions, "new": not baseline})
+    return rows
+
+
+def _percent(change):
+    return "" if change is None else f"{change:+.0%}"
+
+
+def _measure(row, key, format_value):
+    return "" if row.get(key) is None else format_value(row[key])
+
+
+def format_rows(rows) -> str:
+    """The comparison as a text table."""
+    table = [["case", "min ms", "median ms", "", "peak KiB", "", "size KiB", "lines", "steps", "", "status"]]
+    for row in rows:
+        status = "new" if row["new"] else "REGRESSION " + ",".join(row["regressions"]) if row["regressions"] else "ok"
+        table.append(
+            [
+                row["case"],
+                f"{row['min_s'] * 1000:.2f}",
+                f"{row['median_s'] * 1000:.2f}",
+                _percent(row["changes"]["time"]),
+                _measure(row, "peak_bytes", lambda value: f"{value / 1024:.0f}"),
+                _percent(row["changes"]["memory"]),
+                _measure(row, "size_bytes", lambda value: f"{value / 1024:.1f}"),
+                _measure(row, "lines", str),
+                _measure(row, "steps", str),
+                _percent(row["changes"]["size"]),
+                status,
+            ]
+        )
+    widths = [max(len(line[column]) for line in table) for column in range(len(table[0]))]
+    return "\n".join("  ".join(cell.ljust(width) for cell, width in zip(line, widths)).rstrip() for line in table)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", dest="pattern", default="", help="only run the cases containing this text")
+    parser.add_argument("--repeat", type=int, default=30, help="timed generations per case (default: 30)")
+    parser.add_argument(
+        "--startup-repeat", type=int, default=10, help="timed cold starts per entry point (default: 10)"
+    )
+    parser.add_argument("--save", action="store_true", help="store the results as the new baselines")
+    parser.add_argument("--baselines", type=Path, default=BASELINES, help="baselines file (default: %(default)s)")
+    parser.add_argument("--time-threshold", type=float, default=0.25, help="accepted min time growth (default: 0.25)")
+    parser.add_argument("--memory-threshold", type=float, default=0.10, help="accepted peak memory growth (default: 0.10)")
+    parser.add_argument("--size-threshold", type=float, default=0.0, help="accepted .hso size growth (default: 0)")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.repeat, args.pattern, args.output)
+        sys.exit(0)
+
+    results = {**run_all(args.repeat, args.pattern), **run_startup(args.startup_repeat, args.pattern)}
+    stored = {}
+    if args.baselines.exists():
+        with open(args.baselines, "r") as baselines_file:
+            stored = json.load(baselines_file)
+    rows = compare(
+        results, stored.get("cases", {}), args.time_threshold, args.memory_threshold, args.size_threshold
+    )
+    print(format_rows(rows))
+
+    if args.save:
+        cases = {**stored.get("cases", {}), **results}
+        with open(args.baselines, "w") as baselines_file:
+            json.dump(
+                {
+                    "machine": platform.node(),
+                    "python": platform.python_version(),
+                    "repeat": args.repeat,
+                    "saved": time.strftime("%Y-%m-%d %H:%M:%S"),
+                    "cases": dict(sorted(cases.items())),
+                },
+                baselines_file,
+                indent=2,
+            )
+            baselines_file.write("\n")
+        print(f"Baselines saved to {args.baselines}")
+    elif any(row["regressions"] for row in rows):
+        sys.exit(1)
@@ -0,0 +1,5 @@
+"""
+Code shared by the RAPID350 experiment applications: workflow submission,
+clocks, timelines, deck layouts, SOLO protocol generation and the Hidex
+reading and datapoint stores.
+"""
@@ -0,0 +1,248 @@
+"""
+Asyncio layer over the MADSci WorkcellClient.
+
+WorkcellClient.submit_workflow blocks until the workflow is done. Here a
+submission returns as soon as the workcell has accepted the workflow (and its
+file inputs have been uploaded), with an awaitable handle. A single poller
+queries every in-flight workflow through the client's pooled HTTP session, so
+several workflows (and local work such as generating the next SOLO protocol)
+can progress together. Given a WorkflowTimeline, every finished workflow and
+its steps are recorded on it. A failed or cancelled workflow can be retried
+from one of its steps, as with WorkcellClient.retry_workflow.
+"""
+
+import asyncio
+from typing import Any, Dict, Optional
+
+from madsci.common.exceptions import WorkflowFailedError
+
+from rapid350.clock import Clock, WallClock
+
+
+class WorkflowHandle:
+    """An in-flight workflow. Await it for the finished Workflow."""
+
+    def __init__(
+        self,
+        async_workcell,
+        workflow,
+        raise_on_failed=True,
+        raise_on_cancelled=True,
+        submitted: Optional[float] = None,
+        run_id: Optional[str] = None,
+        label: Optional[str] = None,
+    ):
+        """
+        Args:
+            async_workcell (AsyncWorkcell): the submitting workcell, which polls the workflow
+            workflow (Workflow): the workflow as returned on submission
+            raise_on_failed (bool): awaiting raises WorkflowFailedError if the workflow fails
+            raise_on_cancelled (bool): awaiting raises WorkflowFailedError if the workflow is cancelled
+            submitted (float): when the workflow was submitted, in epoch seconds (default: now)
+            run_id (str): run the workflow belongs to, for the timeline
+            label (str): name of the submission, for the timeline
+        """
+        self.async_workcell = async_workcell
+        self.workflow = workflow  # latest known state
+        self.raise_on_failed = raise_on_failed
+        self.raise_on_cancelled = raise_on_cancelled
+        self.submitted = async_workcell.clock.time() if submitted is None else submitted
+        self.finished: Optional[float] = None
+        self.step_starts: Dict[int, float] = {}  # step index -> when it was first seen running
+        self.run_id = run_id
+        self.label = label
+        self._finished = asyncio.get_running_loop().create_future()
+        self._query_errors = 0
+
+    @property
+    def workflow_id(self) -> str:
+        """ID of the workflow on the workcell."""
+        return self.workflow.workflow_id
+
+    def done(self) -> bool:
+        """True once the workflow has reached a terminal status."""
+        return self._finished.done()
+
+    def __await__(self):
+        """Waits for the workflow to finish and returns it."""
+        return asyncio.shield(self._finished).__await__()
+
+    async def cancel(self):
+        """Asks the workcell to cancel the workflow, then waits for it to stop."""
+        if not self.done():
+            await asyncio.to_thread(
+                self.async_workcell.workcell_client.cancel_workflow, self.workflow_id
+            )
+            await asyncio.wait([self._finished])
+
+    def _update(self, workflow) -> None:
+        self.workflow = workflow
+        self._query_errors = 0
+        if self.done():
+            return
+        now = self.async_workcell.clock.time()
+        if workflow.status.has_started or workflow.status.terminal:
+            self.step_starts.setdefault(workflow.status.current_step_index, now)
+        if not workflow.status.terminal:
+            return
+        self.finished = now
+        if self.async_workcell.timeline is not None:
+            self.async_workcell.timeline.record_workflow(
+                workflow, self.submitted, now, self.step_starts, self.run_id, self.label
+            )
+        if (workflow.status.failed and self.raise_on_failed) or (
+            workflow.status.cancelled and self.raise_on_cancelled
+        ):
+            step_index = workflow.status.current_step_index
+            self._finished.set_exception(
+                WorkflowFailedError(
+                    f"Workflow {workflow.name} ({workflow.workflow_id}) "
+                    f"{'failed' if workflow.status.failed else 'was cancelled'} on step {step_index}"
+                    + (f": '{workflow.steps[step_index].name}'" if step_index < len(workflow.steps) else "")
+                )
+            )
+        else:
+            self._finished.set_result(workflow)
+
+    def _query_failed(self, error: BaseException, max_query_errors: int) -> None:
+        self._query_errors += 1
+        if self._query_errors >= max_query_errors and not self.done():
+            self._finished.set_exception(error)
+
+
+class AsyncWorkcell:
+    """Submits workflows without blocking and tracks them all with one poller.
+
+    Must be used from within a running event loop.
+    """
+
+    def __init__(
+        self,
+        workcell_client,
+        poll_interval: float = 2.0,
+        max_query_errors: int = 5,
+        timeline=None,
+        clock: Optional[Clock] = None,
+    ):
+        """
+        Args:
+            workcell_client (WorkcellClient): client whose pooled session is used for every request
+            poll_interval (float): seconds between two status queries of the in-flight workflows
+            max_query_errors (int): consecutive failed status queries after which a handle
+                raises the last error instead of retrying
+            timeline (WorkflowTimeline): records every finished workflow (default: none)
+            clock (Clock): clock of the recorded times (default: the wall clock)
+        """
+        self.workcell_client = workcell_client
+        self.poll_interval = poll_interval
+        self.max_query_errors = max_query_errors
+        self.timeline = timeline
+        self.clock = clock or WallClock()
+        self._in_flight: Dict[str, WorkflowHandle] = {}
+        self._poller: Optional[asyncio.Task] = None
+
+    async def submit(
+        self,
+        workflow_definition,
+        json_inputs: Optional[Dict[str, Any]] = None,
+        file_inputs: Optional[Dict[str, Any]] = None,
+        raise_on_failed: bool = True,
+        raise_on_cancelled: bool = True,
+        run_id: Optional[str] = None,
+        label: Optional[str] = None,
+    ) -> WorkflowHandle:
+        """submit
+
+        Description:
+            Submits a workflow and returns once the workcell has accepted it. File
+            inputs have been uploaded by then, so they can be deleted right away.
+
+        Args:
+            workflow_definition (str | Path | WorkflowDefinition): workflow YAML path or definition
+            json_inputs (dict): json inputs of the workflow
+            file_inputs (dict): file inputs of the workflow, as paths
+            raise_on_failed (bool): awaiting the handle raises if the workflow fails
+            raise_on_cancelled (bool): awaiting the handle raises if the workflow is cancelled
+            run_id (str): run the workflow belongs to, for the timeline
+            label (str): name of the submission, for the timeline (default: the workflow name)
+
+        Returns:
+            WorkflowHandle: awaitable handle of the submitted workflow
+        """
+        submitted = self.clock.time()
+        workflow = await asyncio.to_thread(
+            self.workcell_client.submit_workflow,
+            workflow_definition=workflow_definition,
+            json_inputs=json_inputs,
+            file_inputs=file_inputs,
+            await_completion=False,
+        )
+        return self._track(
+            WorkflowHandle(self, workflow, raise_on_failed, raise_on_cancelled, submitted, run_id, label)
+        )
+
+    async def retry(self, handle: WorkflowHandle, index: int) -> WorkflowHandle:
+        """retry
+
+        Description:
+            Restarts a failed or cancelled workflow from one of its steps, and returns
+            once the workcell has accepted it
+
+        Args:
+            handle (WorkflowHandle): handle of the finished workflow
+            index (int): index of the step to restart from
+
+        Returns:
+            WorkflowHandle: awaitable handle of the restarted workflow
+        """
+        submitted = self.clock.time()
+        workflow = await asyncio.to_thread(
+            self.workcell_client.retry_workflow, handle.workflow_id, index, await_completion=False
+        )
+        return self._track(
+            WorkflowHandle(
+                self, workflow, handle.raise_on_failed, handle.raise_on_cancelled, submitted, handle.run_id, handle.label
+            )
+        )
+
+    def _track(self, handle: WorkflowHandle) -> WorkflowHandle:
+        self._in_flight[handle.workflow_id] = handle
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.create_task(self._poll())
+        return handle
+
+    async def run(self, workflow_definition, **kwargs) -> Any:
+        """Submits a workflow and waits for it to finish, cancelling it on the workcell if
+        the waiting task is cancelled (e.g. by Ctrl-C). Takes the arguments of submit."""
+        handle = await self.submit(workflow_definition, **kwargs)
+        try:
+            return await handle
+        except asyncio.CancelledError:
+            await asyncio.shield(handle.cancel())
+            raise
+
+    async def cancel_all(self) -> None:
+        """Cancels every in-flight workflow."""
+        await asyncio.gather(
+            *(handle.cancel() for handle in list(self._in_flight.values())),
+            return_exceptions=True,
+        )
+
+    async def _poll(self) -> None:
+        while self._in_flight:
+            await asyncio.sleep(self.poll_interval)
+            handles = list(self._in_flight.values())
+            results = await asyncio.gather(
+                *(
+                    asyncio.to_thread(self.workcell_client.query_workflow, handle.workflow_id)
+                    for handle in handles
+                ),
+                return_exceptions=True,
+            )
+            for handle, result in zip(handles, results):
+                if isinstance(result, BaseException):
+                    handle._query_failed(result, self.max_query_errors)
+                else:
+                    handle._update(result)
+                if handle.done():
+                    self._in_flight.pop(handle.workflow_id, None)
@@ -0,0 +1,143 @@
+"""
+Clocks of the experiment applications.
+
+Every wait of an application (incubation deadlines, retries...) goes through
+a Clock, which also keeps a record of each wait. Production runs use the
+WallClock. Tests and runs on the fake workcell use a VirtualClock, which runs
+time_compression times faster than the wall clock, so a 48 hour incubation
+can be waited out in a couple of seconds.
+"""
+
+import datetime
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+
+@dataclass
+class Wait:
+    """A wait on a clock, in epoch seconds of that clock."""
+
+    reason: str
+    start: float
+    due: float
+    end: Optional[float] = None  # None until the wait is over
+
+    @property
+    def seconds(self) -> float:
+        """Time waited so far (the scheduled time once the wait is over)."""
+        return (self.end if self.end is not None else self.due) - self.start
+
+
+class Clock(ABC):
+    """Current time and waits, the base of every clock. Safe to share between threads."""
+
+    def __init__(self):
+        """Creates a clock with no waits recorded."""
+        self.waits: List[Wait] = []  # every wait, in start order
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def time(self) -> float:
+        """Current time, in epoch seconds."""
+
+    @abstractmethod
+    def _sleep(self, seconds: float, stop: Optional[threading.Event] = None) -> None:
+        """Blocks for the given number of seconds, or until stop is set."""
+
+    def now(self) -> datetime.datetime:
+        """Current time, as a timezone aware datetime."""
+        return datetime.datetime.fromtimestamp(self.time(), tz=datetime.timezone.utc)
+
+    def deadline(self, seconds: float) -> float:
+        """Epoch time seconds from now."""
+        return self.time() + seconds
+
+    def remaining(self, due: float) -> float:
+        """Seconds left until due (never negative)."""
+        return max(0.0, due - self.time())
+
+    def wait_until(
+        self,
+        due: float,
+        reason: str = "",
+        max_sleep: float = float("inf"),
+        idle: Optional[Callable[[float], bool]] = None,
+        stop: Optional[threading.Event] = None,
+    ) -> Wait:
+        """wait_until
+
+        Description:
+            Blocks until the due time, or until stop is set, and records the wait.
+            Sleeps at most max_sleep seconds at a time, and calls idle first if
+            given, so work can be done while waiting.
+
+        Args:
+            due (float): epoch time to wait for
+            reason (str): what is waited on, e.g. the name of an incubation deadline
+            max_sleep (float): longest single sleep, in seconds
+            idle (callable): called with the remaining seconds, returns True if it did some
+                work (the clock then checks the time again instead of sleeping)
+            stop (threading.Event): ends the wait early once set, e.g. when the app is interrupted
+
+        Returns:
+            Wait: the record of the wait, ending before its due time if stopped
+        """
+        wait = Wait(reason=reason, start=self.time(), due=due)
+        with self._lock:
+            self.waits.append(wait)
+        while stop is None or not stop.is_set():
+            remaining = self.remaining(due)
+            if remaining <= 0:
+                break
+            if idle is None or not idle(remaining):
+                self._sleep(min(max_sleep, remaining), stop)
+        wait.end = self.time()
+        return wait
+
+    def sleep(self, seconds: float, reason: str = "", stop: Optional[threading.Event] = None) -> Wait:
+        """Blocks for the given number of seconds, or until stop is set, and records the wait."""
+        return self.wait_until(self.deadline(seconds), reason, stop=stop)
+
+
+class WallClock(Clock):
+    """The real time."""
+
+    def time(self) -> float:
+        """Current time, in epoch seconds."""
+        return time.time()
+
+    def _sleep(self, seconds: float, stop: Optional[threading.Event] = None) -> None:
+        if stop is None:
+            time.sleep(seconds)
+        else:
+            stop.wait(seconds)
+
+
+class VirtualClock(Clock):
+    """Epoch time running time_compression times faster than the wall clock."""
+
+    def __init__(self, time_compression: float = 100000.0, start: Optional[float] = None):
+        """
+        Args:
+            time_compression (float): virtual seconds per wall clock second
+            start (float): virtual epoch time of the clock creation (default: the wall clock time)
+        """
+        super().__init__()
+        if time_compression <= 0:
+            raise ValueError(f"time_compression must be positive, got {time_compression}")
+        self.time_compression = time_compression
+        self._start = time.time() if start is None else start
+        self._wall_start = time.monotonic()
+
+    def time(self) -> float:
+        """Current virtual time, in epoch seconds."""
+        return self._start + (time.monotonic() - self._wall_start) * self.time_compression
+
+    def _sleep(self, seconds: float, stop: Optional[threading.Event] = None) -> None:
+        if stop is None:
+            time.sleep(seconds / self.time_compression)
+        else:
+            stop.wait(seconds / self.time_compression)
@@ -0,0 +1,150 @@
+"""
+Local cache of datapoint values in front of the MADSci data client.
+
+Datapoints never change once submitted, so their values can be kept on disk
+and analyses rerun without the data server. Values are stored content
+addressed, so identical readings are kept once: a small reference entry maps
+a datapoint ID to the sha256 of its value, and the value itself is stored
+under that hash. Both live in a size-bounded, LRU evicted DiskCache whose
+entries are integrity checked on read.
+"""
+
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List
+
+from rapid350.disk_cache import DiskCache
+
+
+def workflow_datapoint_ids(workflow) -> List[str]:
+    """IDs of every datapoint produced by the steps of a workflow."""
+    datapoint_ids = []
+    for step in workflow.steps or []:
+        datapoints = getattr(step.result, "datapoints", None) if step.result is not None else None
+        if datapoints:
+            datapoint_ids.extend(str(value) for value in datapoints.model_dump().values() if value)
+    return datapoint_ids
+
+
+class CachedDataClient:
+    """Serves get_datapoint_value from the local cache, fetching misses from the data client.
+
+    Every other attribute is the wrapped data client's, so it can be passed
+    wherever a DataClient is expected.
+    """
+
+    def __init__(
+        self,
+        data_client,
+        directory,
+        max_bytes: int = 2 * 2**30,
+        max_entries: int = 65536,
+        offline: bool = False,
+    ):
+        """
+        Args:
+            data_client (DataClient): client of the data server (may be None when offline)
+            directory (str | Path): where datapoint values are cached
+            max_bytes (int): disk space the cache is evicted down to
+            max_entries (int): number of entries the cache is evicted down to
+            offline (bool): never contact the data server, a datapoint missing from the cache raises KeyError
+        """
+        self.data_client = data_client
+        self.store = DiskCache(Path(directory), max_bytes=max_bytes, max_entries=max_entries)
+        self.offline = offline
+
+    def __getattr__(self, name):
+        """Everything but the cached calls goes to the data client."""
+        if name == "data_client":
+            raise AttributeError(name)
+        return getattr(self.data_client, name)
+
+    def cached(self, datapoint_id) -> bool:
+        """Whether the value of a datapoint is in the cache."""
+        return self._read(str(datapoint_id)) is not None
+
+    def _read(self, datapoint_id: str):
+        reference = self.store.get(f"ref-{datapoint_id}")
+        if reference is None:
+            return None
+        reference = json.loads(reference)
+        data = self.store.get(f"blob-{reference['sha256']}")
+        if data is None:
+            return None  # the value was evicted before its reference
+        return (json.loads(data),) if reference["kind"] == "json" else (data,)
+
+    def _write(self, datapoint_id: str, value) -> None:
+        kind = "bytes" if isinstance(value, (bytes, bytearray)) else "json"
+        data = bytes(value) if kind == "bytes" else json.dumps(value).encode()
+        digest = hashlib.sha256(data).hexdigest()
+        if self.store.get(f"blob-{digest}") is None:
+            self.store.put(f"blob-{digest}", data)
+        self.store.put(f"ref-{datapoint_id}", json.dumps({"sha256": digest, "kind": kind}).encode())
+
+    def get_datapoint_value(self, datapoint_id, timeout=None) -> Any:
+        """get_datapoint_value
+
+        Description: Same as DataClient.get_datapoint_value, served from the cache when possible
+
+        Args:
+            datapoint_id (str | ULID): datapoint to get the value of
+            timeout (float): data server timeout, for cache misses
+
+        Returns:
+            value: JSON data of a JSON datapoint, bytes otherwise
+        """
+        datapoint_id = str(datapoint_id)
+        cached = self._read(datapoint_id)
+        if cached is not None:
+            return cached[0]
+        if self.offline or self.data_client is None:
+            raise KeyError(f"Datapoint {datapoint_id} is not cached and the data server is not used")
+        value = self.data_client.get_datapoint_value(datapoint_id, timeout=timeout)
+        self._write(datapoint_id, value)
+        return value
+
+    def prefetch_datapoints(self, datapoint_ids: Iterable[str], max_workers: int = 8) -> List[str]:
+        """prefetch_datapoints
+
+        Description: Fetches the values of the datapoints missing from the cache, concurrently
+
+        Args:
+            datapoint_ids (list of str): datapoints to have in the cache
+            max_workers (int): concurrent requests to the data server
+
+        Returns:
+            fetched: (list of str) the datapoints that were not cached yet
+        """
+        missing = list(dict.fromkeys(str(i) for i in datapoint_ids if not self.cached(i)))
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as executor:
+                list(executor.map(self.get_datapoint_value, missing))
+        return missing
+
+    def prefetch(self, workcell_client, workflow_ids: Iterable[str], max_workers: int = 8) -> Dict[str, List[str]]:
+        """prefetch
+
+        Description: Caches every datapoint of a list of workflow runs, e.g. before
+            analyzing them offline
+
+        Args:
+            workcell_client (WorkcellClient): client the workflows were run with
+            workflow_ids (list of str): workflow runs to cache the datapoints of
+            max_workers (int): concurrent requests to the workcell and data servers
+
+        Returns:
+            datapoint_ids: (dict) IDs of the datapoints of each workflow run
+        """
+        workflow_ids = list(workflow_ids)
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(workflow_ids)))) as executor:
+            workflows = list(executor.map(workcell_client.query_workflow, workflow_ids))
+        datapoint_ids = {
+            workflow_id: workflow_datapoint_ids(workflow)
+            for workflow_id, workflow in zip(workflow_ids, workflows)
+        }
+        self.prefetch_datapoints(
+            [i for ids in datapoint_ids.values() for i in ids], max_workers=max_workers
+        )
+        return datapoint_ids
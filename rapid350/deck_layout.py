@@ -0,0 +1,231 @@
+"""
+Declarative starting labware of an experiment application.
+
+A deck layout YAML lists, per workcell location, the labware it must hold at
+the start of the experiment:
+
+    locations:
+      Stack1:
+        exclusive: true  # remove any other labware found at the location
+        labware:
+          - name: microplate_{index}  # {index} counts from 1 when repeat is given
+            repeat: 3
+            description: 384-well microplate
+            lid: microplate_lid_{index}  # optional lid, placed in the plate's lid slot
+            lid_description: microplate lid
+            lid_slot: microplate_lid_slot
+
+A repeat count can also be a "{variable}", given when the layout is loaded
+(e.g. the number of plates a batch of runs uses), with its default under a
+top-level "variables" key:
+
+    variables:
+      microplates: 3
+    locations:
+      Stack1:
+        labware:
+          - name: microplate_{index}
+            repeat: "{microplates}"
+
+The layout is diffed against the resource server, and only the locations whose
+contents differ are written back, each in a single update. This takes three
+phases, one after the other: a get_locations call, the get_resource of every
+location, issued concurrently, then the update_resource of every location that
+differs, also concurrent. An up to date deck costs the first two phases. The
+updates are not atomic: if one of them fails, the locations already written
+keep their new contents, and applying the layout again finishes the others.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import yaml
+from madsci.common.types.resource_types import Collection, Resource, Slot
+
+
+@dataclass
+class LocationLayout:
+    """Labware expected at one workcell location."""
+
+    location_name: str
+    labware: List[Dict[str, Any]] = field(default_factory=list)  # one spec per labware, bottom first
+    exclusive: bool = False
+
+    def labware_names(self) -> List[str]:
+        """Names of the expected labware, bottom first."""
+        return [spec["name"] for spec in self.labware]
+
+
+@dataclass
+class DeckChange:
+    """Changes made (or to be made) to the contents of one location."""
+
+    location_name: str
+    container: Any  # the location's resource, with its new children
+    added: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+
+    def __str__(self) -> str:
+        """Human readable summary."""
+        return f"{self.location_name}: added {self.added or 'nothing'}, removed {self.removed or 'nothing'}"
+
+
+def _expand(labware_specs, variables: Dict[str, Any]) -> List[Dict[str, Any]]:
+    expanded = []
+    for spec in labware_specs:
+        repeat = spec.get("repeat")
+        if isinstance(repeat, str):
+            repeat = int(repeat.format(**variables))
+        for index in range(1, (repeat or 1) + 1):
+            expanded.append(
+                {
+                    key: value.format(index=index) if isinstance(value, str) and repeat else value
+                    for key, value in spec.items()
+                    if key != "repeat"
+                }
+            )
+    return expanded
+
+
+def build_labware(spec: Dict[str, Any]):
+    """build_labware
+
+    Description: Creates the MADSci resource of one labware spec of a deck layout
+
+    Args:
+        spec (dict): labware spec, with name, description and optionally lid, lid_description,
+            lid_slot and capacity
+
+    Returns:
+        labware: (Resource | Collection) the new resource, not yet on the resource server
+    """
+    if not spec.get("lid"):
+        return Resource(resource_name=spec["name"], resource_description=spec.get("description"))
+    lid = Resource(
+        resource_name=spec["lid"],
+        resource_description=spec.get("lid_description", "lid"),
+        attributes={"lid": True},
+    )
+    return Collection(
+        resource_name=spec["name"],
+        resource_description=spec.get("description"),
+        capacity=spec.get("capacity", 2),
+        children={
+            "lid_slot": Slot(resource_name=spec.get("lid_slot", "lid_slot"), children=[lid])
+        },
+    )
+
+
+class DeckLayout:
+    """Starting labware of an experiment application, applied to the resource server."""
+
+    def __init__(self, locations: List[LocationLayout]):
+        """
+        Args:
+            locations (list of LocationLayout): expected contents of each location
+        """
+        self.locations = locations
+
+    @classmethod
+    def from_yaml(cls, path, variables: Optional[Dict[str, Any]] = None) -> "DeckLayout":
+        """Loads a deck layout YAML file, with variables overriding the defaults of its "variables"."""
+        with open(Path(path), "r") as layout_file:
+            layout = yaml.safe_load(layout_file) or {}
+        variables = {**(layout.get("variables") or {}), **(variables or {})}
+        return cls(
+            [
+                LocationLayout(
+                    location_name=name,
+                    labware=_expand(spec.get("labware") or [], variables),
+                    exclusive=spec.get("exclusive", False),
+                )
+                for name, spec in (layout.get("locations") or {}).items()
+            ]
+        )
+
+    def _diff(self, layout: LocationLayout, container) -> List[DeckChange]:
+        children = list(container.children or [])
+        current = {child.resource_name: child for child in children}
+        missing = [spec for spec in layout.labware if spec["name"] not in current]
+        if layout.exclusive:
+            wanted = set(layout.labware_names())
+            removed = [child.resource_name for child in children if child.resource_name not in wanted]
+            new_children = [
+                current[spec["name"]] if spec["name"] in current else build_labware(spec)
+                for spec in layout.labware
+            ]
+            if [child.resource_name for child in children] == layout.labware_names():
+                return []
+        else:
+            removed = []
+            new_children = children + [build_labware(spec) for spec in missing]
+            if not missing:
+                return []
+        capacity = getattr(container, "capacity", None)
+        if capacity is not None and len(new_children) > capacity:
+            raise ValueError(
+                f"Location {layout.location_name} holds at most {capacity} labware, "
+                f"cannot add {[spec['name'] for spec in missing]}"
+            )
+        container.children = new_children
+        return [
+            DeckChange(
+                layout.location_name, container, [spec["name"] for spec in missing], removed
+            )
+        ]
+
+    def plan(self, location_client, resource_client) -> List[DeckChange]:
+        """plan
+
+        Description: Compares the layout with the resource server, without changing anything
+
+        Args:
+            location_client (LocationClient): client of the workcell locations
+            resource_client (ResourceClient): client of the resource server
+
+        Returns:
+            changes: (list of DeckChange) one per location whose contents differ
+
+        Raises:
+            ValueError: if a location has no resource, or cannot hold its labware
+        """
+        locations = {location.location_name: location for location in location_client.get_locations()}
+        for layout in self.locations:
+            if layout.location_name not in locations or locations[layout.location_name].resource_id is None:
+                raise ValueError(f"Location {layout.location_name} has no resource to hold labware")
+
+        with ThreadPoolExecutor(max_workers=max(1, len(self.locations))) as executor:
+            containers = list(
+                executor.map(
+                    lambda layout: resource_client.get_resource(locations[layout.location_name].resource_id),
+                    self.locations,
+                )
+            )
+        changes = []
+        for layout, container in zip(self.locations, containers):
+            changes.extend(self._diff(layout, container))
+        return changes
+
+    def apply(self, location_client, resource_client) -> List[DeckChange]:
+        """apply
+
+        Description: Brings the resource server in line with the layout, writing only the
+            locations whose contents differ, concurrently and not atomically (see the module docstring)
+
+        Args:
+            location_client (LocationClient): client of the workcell locations
+            resource_client (ResourceClient): client of the resource server
+
+        Returns:
+            changes: (list of DeckChange) the changes made
+
+        Raises:
+            ValueError: as plan, before any location is written
+        """
+        changes = self.plan(location_client, resource_client)
+        if changes:
+            with ThreadPoolExecutor(max_workers=len(changes)) as executor:
+                list(executor.map(lambda change: resource_client.update_resource(change.container), changes))
+        return changes
@@ -0,0 +1,118 @@
+"""
+Size-bounded, least-recently-used cache of byte blobs on local disk.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+
+class DiskCache:
+    """Stores blobs under content keys, evicting the least recently used ones.
+
+    Every entry starts with the sha256 of its data, which is checked on read; a
+    corrupted entry is dropped and reported as a miss. Recency is tracked with
+    the file modification time, so the cache survives restarts and can be
+    shared by several processes.
+
+    The size and recency of the entries are read from the directory once, when
+    the cache is opened, and kept up to date in memory, so a put costs no scan
+    of the directory. Entries written by other processes since are counted
+    once they are read, or at the next open. Safe to share between threads.
+    """
+
+    def __init__(self, directory, max_bytes: int = 256 * 2**20, max_entries: int = 4096):
+        """
+        Args:
+            directory (str | Path): where entries are stored, created if missing
+            max_bytes (int): total size the cache is evicted down to
+            max_entries (int): number of entries the cache is evicted down to
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._sizes: "OrderedDict[str, int]" = OrderedDict()  # key -> size on disk, least recently used first
+        self._total_bytes = 0
+        self._scan()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key
+
+    def _scan(self) -> None:
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.startswith(".tmp-"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+        with self._lock:
+            self._sizes = OrderedDict((name, size) for _, name, size in sorted(entries))
+            self._total_bytes = sum(self._sizes.values())
+
+    def _used(self, key: str, size: int) -> None:
+        """Records key as the most recently used entry, of the given size on disk. Needs the lock."""
+        self._total_bytes += size - self._sizes.pop(key, 0)
+        self._sizes[key] = size
+
+    def _forget(self, key: str) -> None:
+        """Drops key from the index. Needs the lock."""
+        self._total_bytes -= self._sizes.pop(key, 0)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Returns the data stored under key, or None on a miss."""
+        path = self._path(key)
+        try:
+            os.utime(path)  # mark as recently used
+            with open(path, "rb") as entry:
+                digest = entry.readline().strip().decode()
+                data = entry.read()
+        except FileNotFoundError:
+            with self._lock:
+                self._forget(key)  # evicted by another process
+            return None
+        if hashlib.sha256(data).hexdigest() != digest:
+            path.unlink(missing_ok=True)
+            with self._lock:
+                self._forget(key)
+            return None
+        with self._lock:
+            self._used(key, len(digest) + 1 + len(data))
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """Stores data under key, then evicts old entries if the cache is over its limits."""
+        handle, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        header = hashlib.sha256(data).hexdigest().encode() + b"\n"
+        with os.fdopen(handle, "wb") as entry:
+            entry.write(header)
+            entry.write(data)
+        os.replace(temp_path, self._path(key))
+        with self._lock:
+            self._used(key, len(header) + len(data))
+        self.evict()
+
+    def evict(self) -> None:
+        """Removes least recently used entries until the cache is within its limits."""
+        while True:
+            with self._lock:
+                if not self._sizes or (
+                    self._total_bytes <= self.max_bytes and len(self._sizes) <= self.max_entries
+                ):
+                    return
+                key = next(iter(self._sizes))
+                self._forget(key)
+            self._path(key).unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        """Removes every entry."""
+        for entry in os.scandir(self.directory):
+            if entry.is_file():
+                Path(entry.path).unlink(missing_ok=True)
+        with self._lock:
+            self._sizes.clear()
+            self._total_bytes = 0
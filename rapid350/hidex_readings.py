@@ -0,0 +1,331 @@
+"""
+Hidex plate readings: parsing of hidex_data datapoints and a local columnar
+store of every reading, across runs and experiment applications.
+
+The store is a directory of Arrow IPC files, one per plate reading, written
+once and never modified, and partitioned by run:
+
+    <directory>/run_id=<run_id>/<read time>-<plate_id>-<unique id>.arrow
+
+Each file holds one row per well (source, run_id, plate_id, label,
+datapoint_id, read_time, well, row, column, reading). The files are
+uncompressed, so queries memory-map them instead of reading them, and only
+the runs and columns a query selects are touched. Trends over months of runs
+are computed from the local store, without fetching the datapoints from the
+data server again. Other tables are stored the same way by subclassing
+RunPartitionedStore, e.g. the AMES plate results.
+"""
+
+import json
+import os
+import re
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import quote
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from pyarrow import fs
+
+SCHEMA = pa.schema(
+    [
+        ("source", pa.string()),  # experiment application, e.g. "ames_test"
+        ("run_id", pa.string()),
+        ("plate_id", pa.string()),
+        ("label", pa.string()),  # workflow step key of the reading, e.g. "hidex_data_1"
+        ("datapoint_id", pa.string()),
+        ("read_time", pa.timestamp("ms", tz="UTC")),
+        ("well", pa.string()),
+        ("row", pa.int8()),  # 0 based
+        ("column", pa.int8()),  # 0 based
+        ("reading", pa.float64()),
+    ]
+)
+
+_WELL = re.compile(r"^([A-Za-z])0*([0-9]{1,2})$")
+_WELL_KEYS = ("well", "well_name", "wellname", "well position", "well_position", "position")
+
+
+def _well_index(name, shape):
+    """(row, column) index of a well name such as "A1" or "P024", or None if name is not a well."""
+    match = _WELL.match(str(name).strip())
+    if match is None:
+        return None
+    row, column = ord(match.group(1).upper()) - ord("A"), int(match.group(2)) - 1
+    if row >= shape[0] or column >= shape[1]:
+        return None
+    return row, column
+
+
+def _from_wells(values: Dict[Any, Any], shape) -> np.ndarray:
+    readings = np.full(shape, np.nan)
+    for name, value in values.items():
+        index = _well_index(name, shape)
+        if index is not None and value is not None:
+            readings[index] = float(value)
+    return readings
+
+
+def _from_records(records: List[Dict[str, Any]], shape, value_key=None) -> np.ndarray:
+    well_key = next((key for key in records[0] if str(key).strip().lower() in _WELL_KEYS), None)
+    if well_key is None:
+        raise ValueError(f"Hidex records have no well column: {list(records[0])}")
+    if value_key is None:
+        value_key = next(
+            (
+                key
+                for key in records[0]
+                if key != well_key
+                and all(isinstance(record.get(key), (int, float)) for record in records)
+            ),
+            None,
+        )
+        if value_key is None:
+            raise ValueError(f"Hidex records have no numeric column: {list(records[0])}")
+    return _from_wells({record[well_key]: record.get(value_key) for record in records}, shape)
+
+
+def parse_hidex_reading(value, shape=(16, 24), value_key=None) -> np.ndarray:
+    """parse_hidex_reading
+
+    Description:
+        Converts the value of a hidex_data datapoint into a plate shaped array of
+        readings. Accepts a JSON string or bytes, a {well: reading} mapping, a
+        list of records with a well column (e.g. pandas orient="records"), a
+        table of columns (pandas orient="columns") or rows of readings.
+
+    Args:
+        value (str | bytes | dict | list): the datapoint value
+        shape (tuple): (rows, columns) of the plate read
+        value_key (str): column holding the reading in records (default: the first numeric one)
+
+    Returns:
+        readings: (np.ndarray) reading of every well, NaN for wells missing from the data
+    """
+    if isinstance(value, bytes):
+        value = value.decode()
+    if isinstance(value, str):
+        value = json.loads(value)
+
+    if isinstance(value, dict):
+        if any(_well_index(key, shape) is not None for key in value):
+            return _from_wells(value, shape)
+        if value and all(isinstance(column, dict) for column in value.values()):
+            # table of columns: {column name: {row index: value}}
+            index = list(next(iter(value.values())))
+            records = [{name: column.get(i) for name, column in value.items()} for i in index]
+            return _from_records(records, shape, value_key)
+    elif isinstance(value, list) and value:
+        if all(isinstance(record, dict) for record in value):
+            return _from_records(value, shape, value_key)
+        readings = np.asarray(value, dtype=float)
+        if readings.shape == shape:
+            return readings
+    raise ValueError(f"Unrecognized Hidex data, expected readings of a {shape[0]}x{shape[1]} plate")
+
+
+def _timestamp(value) -> datetime:
+    if isinstance(value, datetime):
+        return value if value.tzinfo is not None else value.astimezone(timezone.utc)
+    return datetime.fromtimestamp(value, tz=timezone.utc)
+
+
+def _isin(name, values):
+    return pc.field(name).isin(pa.array([str(value) for value in values], pa.string()))
+
+
+class RunPartitionedStore:
+    """Append only, memory-mapped directory of Arrow IPC files of one schema, partitioned by run_id."""
+
+    schema: pa.Schema = None  # columns of the stored tables, run_id included
+
+    def __init__(self, directory):
+        """
+        Args:
+            directory (str | Path): where the files are stored, shared by every application using it
+        """
+        self.directory = Path(directory)
+        self._filesystem = fs.LocalFileSystem(use_mmap=True)
+        self._partitioning = ds.partitioning(pa.schema([("run_id", pa.string())]), flavor="hive")
+
+    def _write(self, table: pa.Table, run_id: str, name: str) -> Path:
+        """Stores table in a new file of the partition of run_id, named after name."""
+        partition = self.directory / f"run_id={quote(str(run_id), safe='')}"
+        partition.mkdir(parents=True, exist_ok=True)
+        basename = f"{quote(name, safe='')}-{uuid.uuid4().hex[:8]}.arrow"
+        # write then rename, so a query never sees a partial file
+        file_descriptor, temp_path = tempfile.mkstemp(dir=partition, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(file_descriptor, "wb") as sink:
+                with pa.ipc.new_file(sink, self.schema) as writer:
+                    writer.write_table(table)
+            os.replace(temp_path, partition / basename)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        return partition / basename
+
+    def dataset(self) -> ds.Dataset:
+        """All stored rows as a (lazy, memory-mapped) pyarrow dataset."""
+        return ds.dataset(
+            str(self.directory),
+            schema=self.schema,
+            format="ipc",
+            partitioning=self._partitioning,
+            filesystem=self._filesystem,
+        )
+
+    def _select(self, values: Dict[str, Optional[Iterable]], conditions=(), columns=None) -> pa.Table:
+        """Rows having one of the given values in each column (None matches every value) and
+        matching every condition expression, filtered in the scan."""
+        if not self.directory.exists():
+            return self.schema.empty_table() if columns is None else self.schema.empty_table().select(columns)
+        conditions = [_isin(name, selected) for name, selected in values.items() if selected is not None] + list(conditions)
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        return self.dataset().to_table(columns=columns, filter=expression)
+
+
+class ReadingsStore(RunPartitionedStore):
+    """Append only, memory-mapped columnar store of Hidex plate readings."""
+
+    schema = SCHEMA
+
+    def append(
+        self,
+        readings: np.ndarray,
+        run_id: str,
+        plate_id: str,
+        read_time=None,
+        datapoint_id: str = "",
+        label: str = "",
+        source: str = "",
+    ) -> Path:
+        """append
+
+        Description: Stores the reading of one plate in a new file. Wells without a
+            reading (NaN) are left out.
+
+        Args:
+            readings (np.ndarray): plate shaped readings, as returned by parse_hidex_reading
+            run_id (str): run the plate belongs to
+            plate_id (str): plate read, e.g. its Liconic plate ID
+            read_time (float | datetime): when the plate was read (default: now)
+            datapoint_id (str): datapoint the readings come from
+            label (str): workflow step key of the reading
+            source (str): experiment application that read the plate
+
+        Returns:
+            path: (Path) the new reading file
+        """
+        read_time = _timestamp(time.time() if read_time is None else read_time)
+        rows, columns = np.nonzero(~np.isnan(readings))
+        count = len(rows)
+        table = pa.table(
+            {
+                "source": [source] * count,
+                "run_id": [str(run_id)] * count,
+                "plate_id": [str(plate_id)] * count,
+                "label": [label] * count,
+                "datapoint_id": [datapoint_id] * count,
+                "read_time": [read_time] * count,
+                "well": [f"{chr(ord('A') + row)}{column + 1}" for row, column in zip(rows, columns)],
+                "row": rows.astype(np.int8),
+                "column": columns.astype(np.int8),
+                "reading": readings[rows, columns],
+            },
+            schema=SCHEMA,
+        )
+        return self._write(table, run_id, f"{int(read_time.timestamp() * 1000)}-{plate_id}")
+
+    def query(
+        self,
+        run_ids: Optional[Iterable[str]] = None,
+        plate_ids: Optional[Iterable[str]] = None,
+        wells: Optional[Iterable[str]] = None,
+        labels: Optional[Iterable[str]] = None,
+        sources: Optional[Iterable[str]] = None,
+        since=None,
+        until=None,
+        columns: Optional[List[str]] = None,
+    ) -> pa.Table:
+        """query
+
+        Description: Selects readings, every filter left to None matches everything
+
+        Args:
+            run_ids (list of str): runs to select
+            plate_ids (list of str): plates to select
+            wells (list of str): wells to select, e.g. ["A1", "P24"]
+            labels (list of str): step keys to select, e.g. ["hidex_data_1"]
+            sources (list of str): experiment applications to select
+            since (float | datetime): earliest read time
+            until (float | datetime): latest read time (excluded)
+            columns (list of str): columns to return (default: all)
+
+        Returns:
+            readings: (pyarrow.Table) the selected readings
+        """
+        conditions = []
+        if since is not None:
+            conditions.append(pc.field("read_time") >= pa.scalar(_timestamp(since), SCHEMA.field("read_time").type))
+        if until is not None:
+            conditions.append(pc.field("read_time") < pa.scalar(_timestamp(until), SCHEMA.field("read_time").type))
+        return self._select(
+            {"run_id": run_ids, "plate_id": plate_ids, "well": wells, "label": labels, "source": sources},
+            conditions,
+            columns,
+        )
+
+    def has_datapoint(self, datapoint_id: str) -> bool:
+        """Whether the readings of a datapoint are already stored. The scan stops at the first match."""
+        if not self.directory.exists():
+            return False
+        return self.dataset().head(
+            1, columns=["datapoint_id"], filter=pc.field("datapoint_id") == datapoint_id
+        ).num_rows > 0
+
+    def plate(self, run_id: str, plate_id: str, label: Optional[str] = None, shape=(16, 24)) -> np.ndarray:
+        """Readings of one plate as a plate shaped array (the latest reading if it was read several times)."""
+        table = self.query(
+            run_ids=[run_id], plate_ids=[plate_id], labels=None if label is None else [label],
+            columns=["read_time", "row", "column", "reading"],
+        )
+        readings = np.full(shape, np.nan)
+        if table.num_rows:
+            table = table.filter(pc.field("read_time") == pc.max(table["read_time"]))
+            readings[table["row"].to_numpy(), table["column"].to_numpy()] = table["reading"].to_numpy()
+        return readings
+
+    def summary(self, by=("source", "run_id", "plate_id", "label"), **filters) -> pa.Table:
+        """summary
+
+        Description: Statistics of the readings, per group, for cross-run comparisons
+            (e.g. by=("run_id", "well") to follow each well over the runs)
+
+        Args:
+            by (tuple of str): columns defining the groups
+            **filters: selection, as for query
+
+        Returns:
+            statistics: (pyarrow.Table) one row per group with the reading count, mean, stddev,
+                min, max and the first read time
+        """
+        table = self.query(**filters)
+        return table.group_by(list(by)).aggregate(
+            [
+                ("reading", "count"),
+                ("reading", "mean"),
+                ("reading", "stddev"),
+                ("reading", "min"),
+                ("reading", "max"),
+                ("read_time", "min"),
+            ]
+        ).sort_by([(name, "ascending") for name in by])
@@ -0,0 +1,130 @@
+"""
+SOLOSoft .hso protocol files: rendering of the generated protocols in memory,
+their caching, and writing or staging them on disk for the workflows.
+"""
+
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from io import StringIO
+
+
+def render_hso(solo_soft):
+    """render_hso
+
+    Description: Renders a SoloSoft pipeline to .hso text in memory, line for line
+        what SoloSoft.savePipeline writes to disk (which then uses CRLF line endings)
+
+    Args:
+        solo_soft (SoloSoft): protocol with its plate list and pipeline set
+
+    Returns:
+        hso_contents: (str) contents of the hso file, with "\\n" line endings
+    """
+    hso = StringIO()
+    for plate in solo_soft.plateList:
+        hso.write(str(plate) + "\n")
+    for step in solo_soft.pipeline:
+        for item in step:
+            if isinstance(item, list):
+                if len(item) > 0 and isinstance(item[0], list):
+                    for line in item:
+                        hso.write(",".join(str(number) for number in line) + "\n")
+                else:
+                    for number in item:
+                        hso.write(str(number) + "\n")
+            else:
+                hso.write(str(item) + "\n")
+    return hso.getvalue()
+
+
+def write_hso(hso_contents, file_path):
+    """write_hso
+
+    Description: Writes hso contents to disk with the CRLF line endings SOLOSoft expects
+
+    Args:
+        hso_contents (str): contents of an hso file, as returned by package_hso
+        file_path (str): where to write the file
+    """
+    with open(file_path, "w", newline="\r\n") as hso:
+        hso.write(hso_contents)
+
+
+@contextmanager
+def staged_hso(hso_contents, basename, directory=None):
+    """staged_hso
+
+    Description: Context manager that writes hso contents to a temporary file for as long
+        as a file path is needed (e.g. as a submit_workflow file input), then deletes it
+
+    Args:
+        hso_contents (str): contents of an hso file, as returned by package_hso
+        basename (str): file name of the staged hso file
+        directory (str): parent directory for the temporary file (default: system temp dir)
+
+    Yields:
+        temp_file_path: (str) path of the staged hso file
+    """
+    temp_dir = tempfile.mkdtemp(dir=directory)
+    try:
+        temp_file_path = os.path.join(temp_dir, basename)
+        write_hso(hso_contents, temp_file_path)
+        yield temp_file_path
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def package_hso(
+        create_hso_method,
+        payload,
+        temp_file_path=None,
+        cache=None,
+):
+    """package_hso
+
+    Description: Calls method to create hso in memory then counts num lines.
+        The hso is only written to disk if temp_file_path is given. With a cache
+        (e.g. an HsoCache), a protocol already generated for the same payload is
+        reused instead of running the protocol again.
+
+    Args:
+        create_hso_method (callable): protocol generate_hso_file method, returning its SoloSoft object
+        payload (dict): input variables passed to the protocol
+        temp_file_path (str): optional file path to also save the hso file to
+        cache (HsoCache): optional cache of previously generated protocols
+
+    Returns:
+        hso_contents: (str) contents of new hso file produced
+        hso_num_lines: (int) number of lines in new hso file produced
+        hso_basename: (str) file name of the hso file
+    """
+
+    hso_contents = None
+    if cache is not None:
+        hso_contents = cache.get(create_hso_method, payload)
+
+    if hso_contents is None:
+        if cache is not None:
+            payload = cache.track(payload)
+        try:
+            # generate hso in memory
+            solo_soft = create_hso_method(payload=payload, temp_file_path=None)
+        except Exception as error_msg:
+            print("Could not create hso")
+            raise error_msg
+
+        hso_contents = render_hso(solo_soft)
+        if cache is not None:
+            cache.put(create_hso_method, payload, hso_contents)
+
+    hso_num_lines = hso_contents.count("\n")
+
+    if temp_file_path is not None:
+        hso_basename = os.path.basename(temp_file_path)
+        write_hso(hso_contents, temp_file_path)
+    else:
+        hso_basename = create_hso_method.__module__.split(".")[-1] + ".hso"
+
+    return hso_contents, hso_num_lines, hso_basename
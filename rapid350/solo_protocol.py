@@ -0,0 +1,78 @@
+"""
+SOLO deck layouts and the setup shared by every SOLO protocol.
+
+Each deck lists the labware of SOLO Positions 1 to 8, by SOLOSoft plate name.
+Protocols name their deck instead of repeating its plate list, so a labware
+change is made once, here. liquidhandling is only imported when a protocol is
+generated, so the applications and the planning tools start without it.
+"""
+
+from typing import Dict, List
+
+DECKS: Dict[str, List[str]] = {
+    # AMES test: exposure, dilution and 384-well assay plates
+    "ames": [
+        "48well_deepwell",  # exposure/indicator plate
+        "Biorad_384_well_HSP3905",  # assay plate
+        "DeepBlock.96.VWR-75870-792.sterile",  # dilution plate
+        "DeepBlock.96.VWR-75870-792.sterile",  # stock plate: DMSO, control, and test compounds
+        "TipBox.180uL.Axygen-EVF-180-R-S.bluebox",  # 180uL tip box
+        "DeepBlock.96.VWR-75870-792.sterile",  # cells stock plate
+        "Empty",
+        "Empty",
+    ],
+    # substrate transfer of the Demo and Workcell Validation applications
+    "substrate_transfer": [
+        "Plate.96.Corning-3635.ClearUVAssay",  # ACTUAL DEMO PLATE
+        "Plate.96.Corning-3635.ClearUVAssay",  # substrate stock plate
+        "DeepBlock.96.VWR-75870-792.sterile",  # deepwell
+        "Plate.96.Corning-3635.ClearUVAssay",  # substrate replicate plate
+        "TipBox.180uL.Axygen-EVF-180-R-S.bluebox",  # 180 uL tip box
+        "Plate.96.Corning-3635.ClearUVAssay",  # substrate replicate plate
+        "Plate.96.Corning-3635.ClearUVAssay",  # substrate replicate plate
+        "Plate.96.Corning-3635.ClearUVAssay",  # substrate replicate plate
+    ],
+}
+
+
+def solo_soft(deck, temp_file_path=None):
+    """solo_soft
+
+    Description: Creates an empty SOLO protocol on a registered deck
+
+    Args:
+        deck (str): name of the deck in DECKS, e.g. "ames"
+        temp_file_path (str): optional file path savePipeline writes the hso file to
+
+    Returns:
+        SoloSoft: the protocol, without steps
+    """
+    if deck not in DECKS:
+        raise ValueError(f"Unknown SOLO deck {deck!r}, expected one of {sorted(DECKS)}")
+    from liquidhandling import (
+        SoloSoft,  # loads every plate definition, only when generating
+    )
+
+    return SoloSoft(filename=temp_file_path, plateList=list(DECKS[deck]))
+
+
+def generate_from_plan(plan, deck, temp_file_path=None, steps=None):
+    """generate_from_plan
+
+    Description: Generates a SOLO protocol from a TransferPlan, the body of generate_hso_file
+        for the protocols that build one
+
+    Args:
+        plan (TransferPlan): the steps of the protocol
+        deck (str): name of the deck in DECKS
+        temp_file_path (str): optional file path to save the hso file to
+        steps (list of Step): steps of the plan to generate (default: the whole plan)
+
+    Returns:
+        SoloSoft: the generated protocol
+    """
+    soloSoft = solo_soft(deck, temp_file_path)
+    plan.emit(soloSoft, steps)
+    if temp_file_path is not None:
+        soloSoft.savePipeline()
+    return soloSoft
@@ -0,0 +1,94 @@
+"""
+Generates SOLO .hso instruction file for first set of steps for substrate transfer experiment,
+shared by the Demo and Workcell Validation applications.
+"""
+from rapid350.solo_protocol import solo_soft
+
+
+# SOLO PROTOCOL STEPS
+def generate_hso_file(
+        payload,
+        temp_file_path=None,
+        columns=4,
+):
+    """generate_hso_file
+
+    Description:
+        Generates a SOLOSoft .hso file
+
+        Steps:
+            - Dispenses 150 uL from the first columns of deepwell into the same columns of 96-well plate
+            - Dispenses 75uL from each of these columns in the 96-well plate to columns 5 and up of the 96-well plate
+                - with mixing at start
+
+    Args:
+        payload (dict): input variables from the wei workflow
+        temp_file_path (str): optional file path to save the hso file to
+        columns (int): number of deepwell columns transferred (the Demo transfers 4)
+
+    Returns:
+        SoloSoft: the generated protocol
+    """
+    from liquidhandling import (
+        DeepBlock_96VWR_75870_792_sterile,
+        Plate_96_Corning_3635_ClearUVAssay,
+    )
+
+# * Other program variables
+    # general SOLO variables
+    reservoir_z_shift = 0.5  # z shift for deep blocks (Deck Positions 3 and 5)
+    flat_bottom_z_shift = 2  # Note: 1 is not high enough (tested)
+
+    # protocol specific variables
+    substrate_transfer_volume = 150
+
+    """
+    SOLO STEP 1: TRANSFER SUBSTRATE STOCK INTO REPLICATE PLATES 1 AND 2  -----------------------------------------------------------------
+    """
+    # * Initialize soloSoft deck layout
+    soloSoft = solo_soft("substrate_transfer", temp_file_path)
+
+    for i in range(columns):
+        soloSoft.getTip("Position5")
+        soloSoft.aspirate(
+            position="Position3",
+            aspirate_volumes=DeepBlock_96VWR_75870_792_sterile().setColumn(
+                i+1, substrate_transfer_volume
+            ),
+            aspirate_shift=[0, 0, reservoir_z_shift],
+        )
+        soloSoft.dispense(
+            position="Position1",
+            dispense_volumes=Plate_96_Corning_3635_ClearUVAssay().setColumn(
+                i+1, substrate_transfer_volume
+            ),
+            dispense_shift=[0, 0, flat_bottom_z_shift],
+        )
+
+    soloSoft.getTip("Position5")
+    for i in range(columns):
+        soloSoft.aspirate(
+            position="Position1",
+            aspirate_volumes=Plate_96_Corning_3635_ClearUVAssay().setColumn(
+                i+1, substrate_transfer_volume/2
+            ),
+            aspirate_shift=[0, 0, flat_bottom_z_shift],
+            mix_at_start=True,
+            mix_cycles=3,
+            mix_volume=75,
+            dispense_height=flat_bottom_z_shift,
+
+        )
+        soloSoft.dispense(
+            position="Position1",
+            dispense_volumes=Plate_96_Corning_3635_ClearUVAssay().setColumn(
+                i+5, substrate_transfer_volume/2
+            ),
+            dispense_shift=[0, 0, flat_bottom_z_shift],
+        )
+
+    # * Dispense tips at end of protocol and process these instructions into a .hso file
+    soloSoft.shuckTip()
+    if temp_file_path is not None:
+        soloSoft.savePipeline()
+    return soloSoft
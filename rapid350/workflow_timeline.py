@@ -0,0 +1,242 @@
+"""
+Timeline of the workflows run by an experiment application.
+
+An AsyncWorkcell given a WorkflowTimeline records, for every workflow it
+runs, when the workflow was submitted, started and finished, and when each
+of its steps started and ended. Step times come from the workcell when it
+reports them, otherwise from the status polls (to the poll interval). A
+RunPipeline also records the incubations of its runs.
+
+The timeline is exported as Chrome trace JSON, to open in Perfetto
+(https://ui.perfetto.dev) or chrome://tracing: one track per run with its
+workflows and incubations, and one track per node with its actions. A
+summary table shows which node actions and workflows take the most time.
+"""
+
+import datetime
+import json
+import threading
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+RUN_TRACKS = 1  # Chrome trace process of the run tracks
+NODE_TRACKS = 2  # Chrome trace process of the node tracks
+
+
+@dataclass
+class Span:
+    """Something that took time on the workcell."""
+
+    name: str
+    category: str  # "workflow", "queued", "step" or "incubation"
+    track: str  # run ID for workflows, queueing and incubations, node for steps
+    start: float  # epoch seconds
+    end: float
+    args: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration(self) -> float:
+        """Length of the span, in seconds."""
+        return self.end - self.start
+
+
+def _epoch(value) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.timestamp()
+    return float(value)
+
+
+def _format(seconds: float) -> str:
+    return str(datetime.timedelta(seconds=round(seconds)))
+
+
+class WorkflowTimeline:
+    """Spans of the workflows, steps and incubations of an application run. Safe to share between threads."""
+
+    def __init__(self):
+        """Creates an empty timeline."""
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        """Adds a span to the timeline."""
+        with self._lock:
+            self.spans.append(span)
+
+    def record_workflow(
+        self,
+        workflow,
+        submitted: float,
+        finished: float,
+        step_starts: Optional[Dict[int, float]] = None,
+        run_id: Optional[str] = None,
+        label: Optional[str] = None,
+    ) -> None:
+        """record_workflow
+
+        Description: Adds a finished workflow and its steps to the timeline
+
+        Args:
+            workflow (Workflow): the finished workflow
+            submitted (float): when the workflow was submitted, in epoch seconds
+            finished (float): when the workflow was seen finished, in epoch seconds
+            step_starts (dict): when each step index was first seen running, for steps
+                the workcell reports no times for
+            run_id (str): run the workflow belongs to (default: the label)
+            label (str): name of the submission, e.g. "solo_temp1" (default: the workflow name)
+        """
+        step_starts = step_starts or {}
+        label = label or workflow.name
+        run_id = run_id or label
+        steps = list(workflow.steps or [])
+        start = _epoch(workflow.start_time) or min(step_starts.values(), default=submitted)
+        end = _epoch(workflow.end_time) or finished
+        status = "failed" if workflow.status.failed else "cancelled" if workflow.status.cancelled else "completed"
+        common = {"run_id": run_id, "workflow": label, "workflow_id": str(workflow.workflow_id)}
+
+        if start > submitted:
+            self.add(Span(label, "queued", run_id, submitted, start, dict(common)))
+        self.add(
+            Span(label, "workflow", run_id, start, end, {**common, "name": workflow.name, "status": status})
+        )
+        for index, step in enumerate(steps):
+            step_start = _epoch(step.start_time) or step_starts.get(index)
+            step_end = _epoch(step.end_time) or step_starts.get(index + 1)
+            if step_end is None and index == len(steps) - 1:
+                step_end = end
+            if step_start is None or step_end is None or not step.node:
+                continue  # the step was never seen running
+            self.add(
+                Span(
+                    step.name or step.action,
+                    "step",
+                    step.node,
+                    step_start,
+                    step_end,
+                    {**common, "node": step.node, "action": step.action, "status": str(step.status.value)},
+                )
+            )
+
+    def record_incubation(self, run_id: str, name: str, start: float, end: float) -> None:
+        """Adds an incubation of a run to the timeline."""
+        self.add(Span(name, "incubation", run_id, start, end, {"run_id": run_id}))
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """to_chrome_trace
+
+        Description: The timeline in the Chrome trace event format, one complete event per span
+
+        Returns:
+            trace: (dict) JSON serializable trace, with times in microseconds from the first span
+        """
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span.start)
+        origin = spans[0].start if spans else 0.0
+        thread_ids: Dict[tuple, int] = {}
+        events = [
+            {"ph": "M", "name": "process_name", "pid": RUN_TRACKS, "args": {"name": "Runs"}},
+            {"ph": "M", "name": "process_name", "pid": NODE_TRACKS, "args": {"name": "Nodes"}},
+        ]
+        for span in spans:
+            process = NODE_TRACKS if span.category == "step" else RUN_TRACKS
+            if (process, span.track) not in thread_ids:
+                thread_ids[(process, span.track)] = len(thread_ids) + 1
+                events.append(
+                    {
+                        "ph": "M",
+                        "name": "thread_name",
+                        "pid": process,
+                        "tid": thread_ids[(process, span.track)],
+                        "args": {"name": span.track},
+                    }
+                )
+            events.append(
+                {
+                    "name": span.name,
+                    "cat": span.category,
+                    "ph": "X",
+                    "ts": round((span.start - origin) * 1e6),
+                    "dur": round(span.duration * 1e6),
+                    "pid": process,
+                    "tid": thread_ids[(process, span.track)],
+                    "args": span.args,
+                }
+            )
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {"start": datetime.datetime.fromtimestamp(origin, datetime.timezone.utc).isoformat()},
+        }
+
+    def export(self, path) -> Path:
+        """Writes the Chrome trace JSON of the timeline to path."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as trace_file:
+            json.dump(self.to_chrome_trace(), trace_file)
+        return path
+
+    def summary(
+        self, category: str = "step", by: Iterable[str] = ("node", "action"), **where
+    ) -> List[Dict[str, Any]]:
+        """summary
+
+        Description: Total time per group of spans, longest first, e.g. category="workflow"
+            and by=("name",) for the time taken by each workflow YAML, or by=("workflow",)
+            and action="run_protocol" for the time taken by each SOLO protocol run
+
+        Args:
+            category (str): spans to summarize
+            by (tuple of str): span args defining the groups
+            **where: span arg values the summarized spans must have
+
+        Returns:
+            rows: (list of dict) the group values, count, total, mean and max seconds and
+                share of the total time of the category
+        """
+        by = tuple(by)
+        groups: Dict[tuple, List[float]] = defaultdict(list)
+        with self._lock:
+            for span in self.spans:
+                if span.category == category and all(span.args.get(k) == v for k, v in where.items()):
+                    groups[tuple(span.args.get(key, "") for key in by)].append(span.duration)
+        overall = sum(sum(durations) for durations in groups.values()) or 1.0
+        rows = [
+            {
+                **dict(zip(by, key)),
+                "count": len(durations),
+                "total": sum(durations),
+                "mean": sum(durations) / len(durations),
+                "max": max(durations),
+                "share": sum(durations) / overall,
+            }
+            for key, durations in groups.items()
+        ]
+        return sorted(rows, key=lambda row: row["total"], reverse=True)
+
+    def format_summary(
+        self, category: str = "step", by: Iterable[str] = ("node", "action"), limit: int = 20, **where
+    ) -> str:
+        """The summary as a text table, limited to its first rows."""
+        by = tuple(by)
+        rows = self.summary(category, by, **where)
+        table = [list(by) + ["count", "total", "mean", "max", "share"]]
+        for row in rows[:limit]:
+            table.append(
+                [str(row[key]) for key in by]
+                + [
+                    str(row["count"]),
+                    _format(row["total"]),
+                    _format(row["mean"]),
+                    _format(row["max"]),
+                    f"{row['share']:.1%}",
+                ]
+            )
+        widths = [max(len(line[column]) for line in table) for column in range(len(table[0]))]
+        return "\n".join(
+            "  ".join(cell.ljust(width) for cell, width in zip(line, widths)).rstrip() for line in table
+        )